@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+# Responses smaller than this aren't worth compressing.
+MIN_COMPRESS_SIZE = 1024
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json")
+# Codings we can produce, best first.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def accepted_encodings(accept_encoding):
+    """
+    Content codings from an Accept-Encoding header, ignoring q=0 entries.
+    """
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding, available=ENCODINGS):
+    """
+    Best coding both sides support: brotli, then gzip, else None (identity).
+    """
+    accepted = accepted_encodings(accept_encoding)
+    for coding in ENCODINGS:
+        if coding in available and coding in accepted:
+            return coding
+    return None
+
+
+def compress(data, coding, level=None):
+    if coding == "br":
+        return brotli.compress(data, quality=11 if level is None else level)
+    return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+class Asset:
+    """
+    One static file held in memory, with its precompressed variants.
+    """
+
+    def __init__(self, filename, body, mimetype, mtime=None):
+        self.filename = filename
+        self.mtime = mtime
+        self.body = body
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.version = self.digest[:12]
+        self.encoded = {}
+        if is_compressible(mimetype) and len(body) >= MIN_COMPRESS_SIZE:
+            for coding in ENCODINGS:
+                self.encoded[coding] = compress(body, coding)
+
+    def etag(self, coding=None):
+        # Each encoding is a different byte stream, so each gets its own tag.
+        return f"{self.version}-{coding}" if coding else self.version
+
+
+class StaticAssets:
+    """
+    The static folder, read and compressed once at startup.
+
+    Asset URLs carry a content hash (?v=<version>). Requests
+    carrying the current hash can be cached by the browser for a year,
+    because any change to the file changes its URL. Unversioned requests
+    are served with no-cache, so the browser revalidates them by ETag.
+
+    With auto_reload set (the Flask debug server), get() re-reads a file
+    whose mtime has changed, so edits show up without a restart.
+    """
+
+    IMMUTABLE = "public, max-age=31536000, immutable"
+    REVALIDATE = "no-cache"
+
+    def __init__(self, folder, auto_reload=False):
+        self.folder = folder
+        self.auto_reload = auto_reload
+        self.assets = {}
+        for root, _dirs, files in os.walk(folder):
+            for name in files:
+                filename = os.path.relpath(os.path.join(root, name), folder).replace(os.sep, "/")
+                self._load(filename)
+
+    def _load(self, filename):
+        path = os.path.join(self.folder, *filename.split("/"))
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError:
+            self.assets.pop(filename, None)
+            return None
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        if mimetype.startswith("text/") or mimetype == "application/javascript":
+            mimetype += "; charset=utf-8"
+        asset = self.assets[filename] = Asset(filename, body, mimetype, mtime)
+        return asset
+
+    def get(self, filename):
+        asset = self.assets.get(filename)
+        if asset is not None and self.auto_reload:
+            try:
+                changed = os.path.getmtime(os.path.join(self.folder, *filename.split("/"))) != asset.mtime
+            except OSError:
+                changed = True
+            if changed:
+                asset = self._load(filename)
+        return asset
+
+    def version(self, filename):
+        asset = self.get(filename)
+        return asset.version if asset is not None else None
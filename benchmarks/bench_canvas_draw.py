@@ -0,0 +1,102 @@
+"""
+Browser-free canvas benchmark: draw calls per frame for the old
+repaint-everything client vs. static/map_renderer.js (offscreen static map
+layer + per-tile entity repaint). Runs the JS under node against a stubbed
+2D context; see canvas_draw_calls.js.
+
+    python benchmarks/bench_canvas_draw.py --moves 200 --sizes 40x15,200x80
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import (
+    WALL_CHAR, DOOR_CHAR, FLOOR_CHAR, CLUE_CHAR, PLAYER_CHAR,
+    victim_data, suspects_data, weapons_data, clues_data,
+    generate_tile_grid, place_entities, is_valid_tile,
+)
+
+DRIVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "canvas_draw_calls.js")
+
+
+def game_data(grid, suspects, weapons, clues):
+    """Same shape as browser_frontend.build_game_data()."""
+    return {
+        "mapWidth": grid.width,
+        "mapHeight": grid.height,
+        "player": {"x": 2, "y": 2},
+        "seq": 0,
+        "victim": {"x": victim_data["x"], "y": victim_data["y"], "emoji": victim_data["emoji"]},
+        "suspects": [{"x": s["x"], "y": s["y"], "emoji": s["emoji"], "name": s["name"]} for s in suspects],
+        "weapons": [{"x": w["x"], "y": w["y"], "emoji": w["emoji"], "name": w["name"], "collected": False}
+                    for w in weapons],
+        "clues": [{"x": c["x"], "y": c["y"], "found": False} for c in clues],
+        "gameMap": grid.to_strings(),
+    }
+
+
+def walk_deltas(grid, index, moves):
+    """Move deltas for a deterministic walk, as /api/move would return them."""
+    x, y = 2, 2
+    directions = [(1, 0)] * 12 + [(0, 1)] * 2 + [(-1, 0)] * 12 + [(0, -1)] * 2
+    for seq in range(1, moves + 1):
+        dx, dy = directions[seq % len(directions)]
+        delta = {"moved": False, "weapon": None, "clue": None, "seq": seq}
+        if is_valid_tile(grid, x + dx, y + dy):
+            delta["from"] = {"x": x, "y": y}
+            delta["moved"] = True
+            x, y = x + dx, y + dy
+            weapon = index.weapon_at(x, y)
+            if weapon:
+                index.collect_weapon(weapon)
+                delta["weapon"] = {"name": weapon["name"], "x": x, "y": y}
+            clue = index.clue_at(x, y)
+            if clue:
+                index.mark_clue_found(clue)
+                delta["clue"] = {"x": x, "y": y}
+        delta["player"] = {"x": x, "y": y}
+        yield delta
+
+
+def run(width, height, moves):
+    grid, rooms, _ = generate_tile_grid(6, width, height)
+    suspects, weapons, clues = (copy.deepcopy(d) for d in (suspects_data, weapons_data, clues_data))
+    index = place_entities(rooms, suspects, weapons, clues)
+    payload = {
+        "data": game_data(grid, suspects, weapons, clues),
+        "chars": {"tileSize": 32, "wallChar": WALL_CHAR, "doorChar": DOOR_CHAR, "floorChar": FLOOR_CHAR,
+                  "clueChar": CLUE_CHAR, "playerChar": PLAYER_CHAR},
+        "moves": list(walk_deltas(grid, index, moves)),
+    }
+    out = subprocess.run(["node", DRIVER], input=json.dumps(payload), capture_output=True,
+                         text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--moves", type=int, default=200)
+    parser.add_argument("--sizes", default="40x15,200x80", help="comma-separated map WIDTHxHEIGHT")
+    args = parser.parse_args()
+
+    if shutil.which("node") is None:
+        sys.exit("node is required to run the canvas renderer benchmark")
+
+    for size in args.sizes.split(","):
+        width, height = (int(v) for v in size.split("x"))
+        result = run(width, height, args.moves)
+        legacy, layered = result["legacy"], result["layered"]
+        print(f"{size:>9} map | full redraw {legacy['per_move']:8.1f} calls/move "
+              f"({legacy['ms']:7.1f} ms) | layered {layered['per_move']:5.1f} calls/move "
+              f"({layered['ms']:5.1f} ms), static layer {layered['static_layer_calls']} calls once, "
+              f"first frame {layered['first_frame']} | x{legacy['per_move'] / layered['per_move']:.0f} fewer")
+
+
+if __name__ == "__main__":
+    main()
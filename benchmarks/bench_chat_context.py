@@ -0,0 +1,75 @@
+"""
+Prompt size and simulated LLM latency over a long interrogation: the old
+send-the-whole-history prompt vs. ChatContext's bounded window + summary.
+
+    python benchmarks/bench_chat_context.py --turns 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_context import ChatContext, estimate_tokens
+
+SYSTEM = ("You are Col. Mustard, a Clue-like murder suspect.\n"
+          "Mr. Boddy has been found murdered.\nYou are not the murderer.\n"
+          "Answer the player's question in a fun, story-driven way, under 50 words.")
+QUESTIONS = ["Where were you when the lights went out?", "Who did you see near the library?",
+             "Why were your boots muddy?", "How long have you known Mr. Boddy?",
+             "Did you hear the gunshot?", "What was in the letter you burned?"]
+REPLY = ("Detective, I was polishing my medals in the billiard room, as any gentleman would. "
+         "I heard nothing but the storm and Mrs. Peacock's dreadful humming, I assure you.")
+
+
+def simulated_latency(prompt_tokens, base=0.35, per_token=0.0004):
+    # Roughly: fixed overhead + prefill cost that grows with the prompt.
+    return base + per_token * prompt_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--keep-turns", type=int, default=4)
+    parser.add_argument("--budget", type=int, default=700)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    full_history = []
+    context = ChatContext("Col. Mustard", keep_turns=args.keep_turns, token_budget=args.budget)
+    checkpoints = {1, 10, 25, 50, 100, 150, args.turns}
+    build_time = 0.0
+    totals = [0, 0]
+
+    print(f"{'turn':>5} | {'full tokens':>11} {'full latency':>12} | "
+          f"{'bounded tokens':>14} {'bounded latency':>15}")
+    for turn in range(1, args.turns + 1):
+        question = rng.choice(QUESTIONS)
+        full_history.append({"role": "user", "content": question})
+        context.append("user", question)
+
+        full_tokens = estimate_tokens(SYSTEM) + sum(estimate_tokens(m["content"]) for m in full_history)
+        start = time.perf_counter()
+        msgs = context.build_messages(SYSTEM)
+        build_time += time.perf_counter() - start
+        bounded_tokens = sum(estimate_tokens(m["content"]) for m in msgs)
+        totals[0] += full_tokens
+        totals[1] += bounded_tokens
+
+        full_history.append({"role": "assistant", "content": REPLY})
+        context.append("assistant", REPLY)
+
+        if turn in checkpoints:
+            print(f"{turn:>5} | {full_tokens:>11} {simulated_latency(full_tokens) * 1000:>10.0f}ms | "
+                  f"{bounded_tokens:>14} {simulated_latency(bounded_tokens) * 1000:>13.0f}ms")
+
+    print(f"total prompt tokens over {args.turns} turns: full {totals[0]:,}, bounded {totals[1]:,} "
+          f"(x{totals[0] / totals[1]:.1f} less)")
+    print(f"build_messages: {build_time / args.turns * 1e6:.1f} us/turn")
+    print(f"summary now: {context.summary[:160]}...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Chat log cost over a long conversation. Browser: the whole transcript
+rendered as HTML on every turn (and every chat reopen) vs. only the
+messages after the client's last id. Curses: re-wrapping the last 10
+messages on every redraw while a reply streams in vs. WrapCache.
+
+    python benchmarks/bench_chat_log.py --turns 500 --redraws 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import textwrap
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_context import ChatContext
+from curses_frontend import WrapCache
+
+QUESTIONS = ["Where were you when the lights went out?", "Who did you see near the library?",
+             "Why were your boots muddy?", "How long have you known Mr. Boddy?"]
+REPLY = ("Detective, I was polishing my medals in the billiard room, as any gentleman would. "
+         "I heard nothing but the storm and Mrs. Peacock's dreadful humming, I assure you.")
+HISTORY_LINES = 10
+
+
+def render_chat_html(history):
+    """What /check_suspect and /chat_ajax returned before: the whole log."""
+    history_txt = []
+    for entry in history:
+        speaker = entry['role'].capitalize()
+        content = entry['content']
+        history_txt.append(f"<b>{speaker}:</b> {content}")
+    return "<br>".join(history_txt)
+
+
+def wrap_all(history, width):
+    lines = []
+    for entry in history.transcript[-HISTORY_LINES:]:
+        lines.extend(textwrap.wrap(f"{entry['role'].capitalize()}: {entry['content']}", width))
+    return lines
+
+
+def wrap_cached(history, cache, width):
+    lines = []
+    for message_id, entry in history.since(history.last_id - HISTORY_LINES):
+        lines.extend(cache.lines(message_id, f"{entry['role'].capitalize()}: {entry['content']}", width))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--redraws", type=int, default=20, help="curses redraws per streamed reply")
+    parser.add_argument("--width", type=int, default=119)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    history = ChatContext("Col. Mustard")
+    cache = WrapCache()
+    checkpoints = {1, 10, 50, 100, 250, args.turns}
+    totals = {"full_bytes": 0, "full_s": 0.0, "delta_bytes": 0, "delta_s": 0.0, "wrap_s": 0.0, "cached_s": 0.0}
+    last_id = 0
+
+    print(f"{'turn':>5} | {'full HTML bytes':>15} {'us':>8} | {'delta JSON bytes':>16} {'us':>6} | "
+          f"{'wrap us/redraw':>14} {'cached':>7}")
+    for turn in range(1, args.turns + 1):
+        history.append("user", rng.choice(QUESTIONS))
+        reply = history.append("assistant", "")
+        words = REPLY.split(" ")
+        step = max(1, len(words) // args.redraws)
+
+        # Curses: one redraw per streamed chunk.
+        wrap_s = cached_s = 0.0
+        for i in range(0, len(words), step):
+            reply["content"] = " ".join(words[:i + step])
+            start = time.perf_counter()
+            expected = wrap_all(history, args.width)
+            wrap_s += time.perf_counter() - start
+            start = time.perf_counter()
+            got = wrap_cached(history, cache, args.width)
+            cached_s += time.perf_counter() - start
+            assert got == expected
+        redraws = (len(words) + step - 1) // step
+        totals["wrap_s"] += wrap_s
+        totals["cached_s"] += cached_s
+
+        # Browser: the chat_ajax response for this turn.
+        start = time.perf_counter()
+        full = json.dumps({"chatHtml": render_chat_html(history)})
+        full_s = time.perf_counter() - start
+        start = time.perf_counter()
+        delta = json.dumps({"messages": history.messages_after(last_id), "lastId": history.last_id})
+        delta_s = time.perf_counter() - start
+        last_id = history.last_id
+        totals["full_bytes"] += len(full)
+        totals["full_s"] += full_s
+        totals["delta_bytes"] += len(delta)
+        totals["delta_s"] += delta_s
+
+        if turn in checkpoints:
+            print(f"{turn:>5} | {len(full):>15,} {full_s * 1e6:>8.1f} | {len(delta):>16,} {delta_s * 1e6:>6.1f} | "
+                  f"{wrap_s / redraws * 1e6:>14.1f} {cached_s / redraws * 1e6:>7.1f}")
+
+    print(f"\nover {args.turns} turns: full HTML {totals['full_bytes']:,} bytes / {totals['full_s'] * 1000:.1f} ms, "
+          f"deltas {totals['delta_bytes']:,} bytes / {totals['delta_s'] * 1000:.1f} ms")
+    print(f"curses wrapping: {totals['wrap_s'] * 1000:.1f} ms re-wrapping vs {totals['cached_s'] * 1000:.1f} ms cached "
+          f"(x{totals['wrap_s'] / totals['cached_s']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
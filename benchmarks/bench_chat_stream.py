@@ -0,0 +1,96 @@
+"""
+Time-to-first-token for streamed suspect replies vs. time-to-full-response
+for the old blocking call, plus how many async streams one event loop can
+serve at once. Runs against openai_standin.py, never the network.
+
+    python benchmarks/bench_chat_stream.py --first-token 0.4 --token-interval 0.03
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Unthrottled: this measures the network path, not the scheduler's rate limits.
+os.environ["ELASTICLUE_LLM_RPM"] = "0"
+os.environ["ELASTICLUE_LLM_TPM"] = "0"
+
+import openai
+
+import llm
+from llm import chat_completion, stream_chat, astream_chat
+from openai_standin import start_standin
+
+MESSAGES = [
+    {"role": "system", "content": "You are Mr. Green, a Clue-like murder suspect."},
+    {"role": "user", "content": "Where were you at midnight?"},
+]
+
+
+def bench_blocking(requests):
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        chat_completion(MESSAGES)
+        times.append(time.perf_counter() - start)
+    return sum(times) / len(times)
+
+
+def bench_streaming(requests):
+    first, full = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        got_first = None
+        for _ in stream_chat(MESSAGES):
+            if got_first is None:
+                got_first = time.perf_counter() - start
+        first.append(got_first)
+        full.append(time.perf_counter() - start)
+    return sum(first) / len(first), sum(full) / len(full)
+
+
+async def bench_async(concurrency):
+    async def one():
+        start = time.perf_counter()
+        first = None
+        async for _ in astream_chat(MESSAGES):
+            if first is None:
+                first = time.perf_counter() - start
+        return first
+
+    start = time.perf_counter()
+    firsts = await asyncio.gather(*(one() for _ in range(concurrency)))
+    return time.perf_counter() - start, sum(firsts) / len(firsts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--first-token", type=float, default=0.4)
+    parser.add_argument("--token-interval", type=float, default=0.03)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    _, api_base = start_standin(first_token=args.first_token, token_interval=args.token_interval)
+    openai.api_base = api_base
+    openai.api_key = "stub"
+    # Measure the network path, not the response cache.
+    llm.cache = None
+
+    full = bench_blocking(args.requests)
+    print(f"blocking create:       full response after {full * 1000:7.1f} ms")
+    first, stream_full = bench_streaming(args.requests)
+    print(f"stream_chat:           first token after   {first * 1000:7.1f} ms "
+          f"(complete after {stream_full * 1000:.1f} ms)")
+    print(f"time-to-first-token is {full / first:.1f}x sooner than time-to-full-response")
+
+    wall, async_first = asyncio.run(bench_async(args.concurrency))
+    print(f"astream_chat x{args.concurrency} on one event loop: all done in {wall * 1000:.1f} ms "
+          f"(mean first token {async_first * 1000:.1f} ms; "
+          f"sequential would take ~{stream_full * args.concurrency:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
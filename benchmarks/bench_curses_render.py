@@ -0,0 +1,151 @@
+"""
+Headless curses benchmark: addstr calls and bytes written per move for the
+old clear-and-redraw-everything loop vs. MapRenderer's dirty-cell updates.
+
+    python benchmarks/bench_curses_render.py --moves 200 --size 50x120
+"""
+import argparse
+import os
+import sys
+import textwrap
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import (
+    PLAYER_CHAR, CLUE_CHAR, FLOOR_CHAR, victim_data, suspects_data, weapons_data, clues_data,
+    generate_game_map, place_entities, is_valid_tile, find_weapon_at, find_clue_at,
+    collect_weapon, mark_clue_found,
+)
+from curses_frontend import MapRenderer
+
+
+class FakeScreen:
+    """Stands in for a curses window and counts what would go to the terminal."""
+
+    def __init__(self, rows, cols):
+        self.rows, self.cols = rows, cols
+        self.addstr_calls = 0
+        self.bytes_written = 0
+        self.clears = 0
+
+    def getmaxyx(self):
+        return self.rows, self.cols
+
+    def addstr(self, y, x, text):
+        self.addstr_calls += 1
+        self.bytes_written += len(text.encode("utf-8"))
+
+    def clear(self):
+        self.clears += 1
+        # clear() makes curses repaint every cell on the next refresh.
+        self.bytes_written += self.rows * self.cols
+
+    def move(self, y, x):
+        pass
+
+    def clrtoeol(self):
+        pass
+
+    def refresh(self):
+        pass
+
+
+def legacy_frame(stdscr, game_map, player_x, player_y, status):
+    """The main loop's drawing code before MapRenderer (minus the try/excepts)."""
+    stdscr.clear()
+    max_y, max_x = stdscr.getmaxyx()
+    map_rows, map_cols = len(game_map), len(game_map[0])
+    tile_height = max(1, (max_y - 8) // map_rows)
+    tile_width = max(1, max_x // map_cols)
+    for row in range(map_rows):
+        for col in range(map_cols):
+            tile = game_map[row][col]
+            stdscr.addstr(row * tile_height, col * tile_width, tile if tile != FLOOR_CHAR else " ")
+    stdscr.addstr(victim_data["y"] * tile_height - 1, victim_data["x"] * tile_width - 1, victim_data["emoji"])
+    for w in weapons_data:
+        if "collected" not in w:
+            stdscr.addstr(w["y"] * tile_height, w["x"] * tile_width, w["emoji"])
+    for c in clues_data:
+        if "found" not in c:
+            stdscr.addstr(c["y"] * tile_height, c["x"] * tile_width, CLUE_CHAR)
+    for s in suspects_data:
+        stdscr.addstr(s["y"] * tile_height, s["x"] * tile_width, s["emoji"])
+    stdscr.addstr(player_y * tile_height, player_x * tile_width, PLAYER_CHAR)
+    ui_start = map_rows * tile_height
+    for i, line in enumerate(status):
+        if ui_start + i < max_y:
+            stdscr.addstr(ui_start + i, 0, line)
+    stdscr.refresh()
+
+
+def walk(game_map, moves):
+    """A deterministic walk that bounces around the first rooms."""
+    x, y = 2, 2
+    directions = [(1, 0)] * 12 + [(0, 1)] * 2 + [(-1, 0)] * 12 + [(0, -1)] * 2
+    for i in range(moves):
+        dx, dy = directions[i % len(directions)]
+        if is_valid_tile(game_map, x + dx, y + dy):
+            x, y = x + dx, y + dy
+        yield x, y
+
+
+def status_for(inventory, message, width):
+    lines = textwrap.wrap("Intro: The storm has cut the lines. Someone in this house is lying.", width - 1)
+    return lines + [f"INVENTORY: {', '.join(inventory) if inventory else '(empty)'}",
+                    f"MESSAGE: {message}", "Press 'Q' or ESC to quit.",
+                    "Use arrow keys to move. Press 'C' to chat, 'A' to accuse, 'L' for clues."]
+
+
+def run(name, game_map, rooms, rows, cols, moves, use_renderer):
+    for w in weapons_data:
+        w.pop("collected", None)
+    for c in clues_data:
+        c.pop("found", None)
+    place_entities(rooms)
+
+    screen = FakeScreen(rows, cols)
+    renderer = MapRenderer(screen, game_map)
+    inventory, message = [], "Use arrow keys to move."
+    first_calls = first_bytes = None
+    for step, (x, y) in enumerate(walk(game_map, moves + 1)):
+        w = find_weapon_at(x, y)
+        if w:
+            collect_weapon(w)
+            inventory.append(w["name"])
+            message = f"You picked up {w['name']}!"
+        c = find_clue_at(x, y)
+        if c:
+            mark_clue_found(c)
+            message = f"You found a clue: \"{c['text']}\""
+        status = status_for(inventory, message, cols)
+        if use_renderer:
+            renderer.fits()
+            renderer.render(renderer.entity_overlays(x, y), status)
+        else:
+            legacy_frame(screen, game_map, x, y, status)
+        if step == 0:
+            first_calls, first_bytes = screen.addstr_calls, screen.bytes_written
+    per_move_calls = (screen.addstr_calls - first_calls) / moves
+    per_move_bytes = (screen.bytes_written - first_bytes) / moves
+    if name:
+        print(f"{name:<14} first frame {first_calls:5d} addstr / {first_bytes:6d} B | "
+              f"per move {per_move_calls:7.1f} addstr / {per_move_bytes:8.1f} B")
+    return {"first_frame_calls": first_calls, "first_frame_bytes": first_bytes,
+            "per_move_calls": per_move_calls, "per_move_bytes": per_move_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--moves", type=int, default=200)
+    parser.add_argument("--size", default="50x120", help="terminal rows x cols")
+    args = parser.parse_args()
+
+    rows, cols = (int(v) for v in args.size.split("x"))
+    game_map, rooms, _ = generate_game_map(6, 40, 15)
+    before = run("full redraw", game_map, rooms, rows, cols, args.moves, use_renderer=False)
+    after = run("MapRenderer", game_map, rooms, rows, cols, args.moves, use_renderer=True)
+    print(f"bytes per move reduced x{before['per_move_bytes'] / after['per_move_bytes']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
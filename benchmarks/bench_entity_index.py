@@ -0,0 +1,89 @@
+"""
+EntityIndex lookups vs. the old linear find_*_at scans as entity counts grow.
+
+    python benchmarks/bench_entity_index.py --counts 6 100 1000 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import EntityIndex
+
+
+def scan_suspect(suspects, x, y):
+    for s in suspects:
+        if s["x"] == x and s["y"] == y:
+            return s
+    return None
+
+
+def scan_weapon(weapons, x, y):
+    for w in weapons:
+        if w["x"] == x and w["y"] == y and "collected" not in w:
+            return w
+    return None
+
+
+def scan_clue(clues, x, y):
+    for c in clues:
+        if c["x"] == x and c["y"] == y and "found" not in c:
+            return c
+    return None
+
+
+def make_entities(count, width, height, rng):
+    cells = rng.sample(range(width * height), count * 3)
+    make = lambda cell: {"x": cell % width, "y": cell // width}
+    return ([make(c) for c in cells[:count]],
+            [make(c) for c in cells[count:2 * count]],
+            [make(c) for c in cells[2 * count:]])
+
+
+def run(count, probes, rng):
+    width = height = max(40, int((count * 12) ** 0.5))
+    suspects, weapons, clues = make_entities(count, width, height, rng)
+    points = [(rng.randrange(width), rng.randrange(height)) for _ in range(probes)]
+
+    start = time.perf_counter()
+    for x, y in points:
+        scan_suspect(suspects, x, y)
+        scan_weapon(weapons, x, y)
+        scan_clue(clues, x, y)
+    scan_time = (time.perf_counter() - start) / probes
+
+    start = time.perf_counter()
+    index = EntityIndex(suspects, weapons, clues)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for x, y in points:
+        index.suspect_at(x, y)
+        index.weapon_at(x, y)
+        index.clue_at(x, y)
+    index_time = (time.perf_counter() - start) / probes
+
+    print(f"{count:>7} per kind | scan {scan_time * 1e6:9.2f} us/move | "
+          f"index {index_time * 1e6:6.2f} us/move | "
+          f"build {build_time * 1000:7.2f} ms | "
+          f"speedup x{scan_time / index_time:,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[6, 100, 1000, 10000])
+    parser.add_argument("--probes", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for count in args.counts:
+        # Keep total scan work roughly constant so large counts stay quick.
+        run(count, max(50, min(args.probes, args.probes * 100 // count)), rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Requests/sec and bytes on the wire for the main page: the HTML for `/`,
+plus the CSS/JS assets it links, on a first visit and on a repeat visit
+(where the browser revalidates with If-None-Match).
+
+    python benchmarks/bench_index_page.py --requests 2000
+"""
+import argparse
+import gzip
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("ELASTICLUE_LLM_CACHE", "off")
+
+from browser_frontend import app
+
+ASSET_RE = re.compile(r'(?:src|href)="(/static/[^"]+)"')
+
+
+def response_bytes(resp):
+    headers = sum(len(k) + len(v) + 4 for k, v in resp.headers.items())
+    return headers + len(resp.get_data())
+
+
+def visit(client, etags, encoding):
+    """Loads / and its assets like a browser would; returns bytes transferred."""
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    page = client.get("/", headers=headers)
+    total = response_bytes(page)
+    html = page.get_data()
+    if page.headers.get("Content-Encoding") == "gzip":
+        html = gzip.decompress(html)
+    elif page.headers.get("Content-Encoding") == "br":
+        import brotli
+        html = brotli.decompress(html)
+    for url in ASSET_RE.findall(html.decode("utf-8")):
+        asset_headers = dict(headers)
+        if url in etags:
+            asset_headers["If-None-Match"] = etags[url]
+        resp = client.get(url, headers=asset_headers)
+        if resp.headers.get("ETag"):
+            etags[url] = resp.headers["ETag"]
+        total += response_bytes(resp)
+        resp.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    client.get("/")
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        client.get("/").get_data()
+    elapsed = time.perf_counter() - start
+    print(f"GET /: {args.requests / elapsed:8.0f} req/s ({elapsed / args.requests * 1e6:.0f} us/request)")
+
+    for encoding in ("", "gzip", "br, gzip"):
+        etags = {}
+        first = visit(client, etags, encoding)
+        repeat = visit(client, etags, encoding)
+        print(f"Accept-Encoding {encoding or '(none)':<9}: first visit {first:6d} B, repeat visit {repeat:6d} B")
+
+
+if __name__ == "__main__":
+    main()
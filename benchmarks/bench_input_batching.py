@@ -0,0 +1,154 @@
+"""
+A 50-step walk typed with key repeat, over a simulated high-latency link:
+one /api/move request per keypress (what the client used to do) vs.
+buffered, numbered batches sent to /api/inputs, one in flight at a time.
+
+Each request waits a random one-way delay before reaching the server and
+again before its response arrives; the per-key client may have up to 6
+requests in flight, like a browser's per-host connection limit.
+
+    python benchmarks/bench_input_batching.py --steps 50 --latency 80 --jitter 0.5
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("ELASTICLUE_LLM_CACHE", "off")
+
+from browser_frontend import app, map_grid, rooms, SESSION_COOKIE
+from navigation import Navigator
+
+
+def walk_inputs(steps):
+    """(dx, dy) for a `steps`-tile walk from room to room, and where it ends."""
+    navigator = Navigator(map_grid)
+    moves, (x, y) = [], (2, 2)
+    while len(moves) < steps:
+        for room in rooms:
+            for nx, ny in navigator.path_to((x, y), (room["center_x"], room["center_y"])):
+                if len(moves) == steps:
+                    return moves, (x, y)
+                moves.append((nx - x, ny - y))
+                x, y = nx, ny
+    return moves, (x, y)
+
+
+class Link:
+    """One-way delays drawn from latency * (1 ± jitter)."""
+
+    def __init__(self, latency_ms, jitter, seed):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self):
+        with self.lock:
+            factor = 1 + self.rng.uniform(-self.jitter, self.jitter)
+        time.sleep(self.latency * factor)
+
+
+def new_session():
+    client = app.test_client()
+    client.get("/")
+    return client.get_cookie(SESSION_COOKIE).value
+
+
+def session_client(session_id):
+    client = app.test_client()
+    client.set_cookie(SESSION_COOKIE, session_id)
+    return client
+
+
+def per_key(moves, link, interval, connections=6):
+    session_id = new_session()
+    slots = threading.Semaphore(connections)
+    results = [None] * len(moves)
+    start = time.perf_counter()
+
+    def press(i, dx, dy):
+        with slots:
+            client = session_client(session_id)
+            link.delay()
+            delta = client.get(f"/api/move?dx={dx}&dy={dy}").get_json()
+            link.delay()
+        results[i] = (delta["seq"], delta["player"], time.perf_counter())
+
+    threads = []
+    for i, (dx, dy) in enumerate(moves):
+        time.sleep(max(0.0, start + i * interval - time.perf_counter()))
+        thread = threading.Thread(target=press, args=(i, dx, dy))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    done = max(r[2] for r in results) - start
+    reordered = sum(1 for a, b in zip(results, results[1:]) if b[0] < a[0])
+    final = max(results)[1]
+    return done, len(moves), reordered, (final["x"], final["y"])
+
+
+def batched(moves, link, interval):
+    session_id = new_session()
+    client = session_client(session_id)
+    pending, cond = [], threading.Condition()
+    typed = [0]
+    start = time.perf_counter()
+
+    def typist():
+        for n, (dx, dy) in enumerate(moves, 1):
+            time.sleep(max(0.0, start + (n - 1) * interval - time.perf_counter()))
+            with cond:
+                pending.append({"n": n, "dx": dx, "dy": dy})
+                typed[0] = n
+                cond.notify()
+
+    thread = threading.Thread(target=typist)
+    thread.start()
+    requests, applied, final = 0, 0, None
+    while applied < len(moves):
+        with cond:
+            while not pending:
+                cond.wait()
+            batch = pending[:]
+            del pending[:]
+        link.delay()
+        data = client.post("/api/inputs", json={"inputs": batch}).get_json()
+        link.delay()
+        requests += 1
+        applied = data["inputSeq"]
+        if data["steps"]:
+            final = data["steps"][-1]["player"]
+    done = time.perf_counter() - start
+    thread.join()
+    return done, requests, 0, (final["x"], final["y"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=80.0, help="mean one-way delay, ms")
+    parser.add_argument("--jitter", type=float, default=0.5, help="delay spread, fraction of latency")
+    parser.add_argument("--interval", type=float, default=33.0, help="ms between key repeats")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    moves, expected = walk_inputs(args.steps)
+    print(f"{len(moves)}-step walk, {args.latency:.0f} ms ±{args.jitter:.0%} one-way, "
+          f"key repeat every {args.interval:.0f} ms (typing takes {(len(moves) - 1) * args.interval:.0f} ms)")
+    for name, run in (("per keypress", per_key), ("batched", batched)):
+        link = Link(args.latency, args.jitter, args.seed)
+        done, requests, reordered, final = run(moves, link, args.interval / 1000)
+        status = "ok" if final == expected else f"WRONG (ended at {final}, expected {expected})"
+        print(f"{name:<13} done in {done * 1000:6.0f} ms | {requests:3d} requests | "
+              f"{reordered:2d} moves applied out of order | final position {status}")
+
+
+if __name__ == "__main__":
+    main()
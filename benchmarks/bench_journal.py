@@ -0,0 +1,104 @@
+"""
+What persisting games costs a /api/move under concurrent load, with the
+journal off, on with group commit, and on with one commit per event (what
+a naive synchronous write would do). Also times rebuilding a session
+from its snapshot and events, as after a restart.
+
+    python benchmarks/bench_journal.py --players 32 --moves 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("ELASTICLUE_PUSH_PORT", "0")
+os.environ.setdefault("ELASTICLUE_SCENARIO_POOL_SIZE", "0")
+os.environ["ELASTICLUE_JOURNAL"] = "off"
+
+import browser_frontend
+from journal import GameJournal
+from stats import percentile
+
+
+class CommitEachJournal(GameJournal):
+    """Baseline: the request thread commits every event itself."""
+
+    def record(self, session_id, seq, kind, data):
+        super().record(session_id, seq, kind, data)
+        self.flush()
+
+
+def run(name, journal, players, moves):
+    browser_frontend.journal = journal
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(players)
+
+    def player():
+        client = browser_frontend.app.test_client()
+        client.get("/")
+        barrier.wait()
+        mine = []
+        for i in range(moves):
+            start = time.perf_counter()
+            client.get(f"/api/move?dx={1 if i % 2 == 0 else -1}&dy=0")
+            mine.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=player) for _ in range(players)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    if journal is not None:
+        journal.flush()
+    stats = journal.metrics() if journal is not None else {}
+    print(f"{name:<14} {players * moves / wall:9.0f} moves/s  p50 {percentile(latencies, 0.5):7.0f} us  "
+          f"p99 {percentile(latencies, 0.99):7.0f} us  commits {stats.get('commits', 0):>6}  "
+          f"events/commit {stats.get('meanBatch', 0.0):6.1f}")
+    return percentile(latencies, 0.5)
+
+
+def rebuild(journal, events):
+    browser_frontend.journal = journal
+    client = browser_frontend.app.test_client()
+    client.get("/")
+    session_id = next(reversed(browser_frontend.sessions._sessions))
+    for i in range(events):
+        client.get(f"/api/move?dx={1 if i % 2 == 0 else -1}&dy=0")
+    journal.flush()
+    browser_frontend.sessions.discard(session_id)
+    start = time.perf_counter()
+    state = browser_frontend.sessions.get(session_id)
+    elapsed = (time.perf_counter() - start) * 1000
+    replayed = state.journal_seq - state.snapshot_seq
+    print(f"rebuild after {events} moves: {elapsed:.2f} ms ({replayed} events replayed on the snapshot)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=32)
+    parser.add_argument("--moves", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        off = run("journal off", None, args.players, args.moves)
+        grouped = GameJournal(os.path.join(tmp, "grouped.sqlite"))
+        on = run("group commit", grouped, args.players, args.moves)
+        each = CommitEachJournal(os.path.join(tmp, "each.sqlite"))
+        run("commit each", each, args.players, args.moves)
+        print(f"group commit adds {on - off:.0f} us to the median /api/move")
+        rebuild(grouped, 250)
+        grouped.close()
+        each.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+LLM response cache: hit vs. miss latency, hit rate on a repetitive prompt
+mix, and an offline replay-only pass with the stand-in server shut down.
+
+    python benchmarks/bench_llm_cache.py --requests 300 --latency 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Unthrottled: this measures the network path, not the scheduler's rate limits.
+os.environ["ELASTICLUE_LLM_RPM"] = "0"
+os.environ["ELASTICLUE_LLM_TPM"] = "0"
+
+import openai
+
+import llm
+from llm_cache import ResponseCache
+from openai_standin import start_standin
+
+QUESTIONS = ["Where were you at midnight?", "Did you know Mr. Boddy?", "Who had the key?",
+             "Why is your sleeve torn?", "What did you hear?", "Who do you suspect?"]
+SUSPECTS = ["Mr. Green", "Ms. Scarlet", "Col. Mustard", "Mrs. Peacock", "Prof. Plum", "Dr. Orchid"]
+
+
+def workload(n, rng):
+    # Skewed: a few opening questions account for most traffic, like real players.
+    weights = [1 / (i + 1) for i in range(len(QUESTIONS))]
+    for _ in range(n):
+        suspect = rng.choice(SUSPECTS)
+        question = rng.choices(QUESTIONS, weights)[0]
+        yield [{"role": "system", "content": f"You are {suspect}, a Clue-like murder suspect."},
+               {"role": "user", "content": question}]
+
+
+def run(label, requests, seed):
+    rng = random.Random(seed)
+    hit_times, miss_times = [], []
+    for messages in workload(requests, rng):
+        hits_before = llm.cache.hits
+        start = time.perf_counter()
+        llm.chat_completion(messages)
+        elapsed = time.perf_counter() - start
+        (hit_times if llm.cache.hits > hits_before else miss_times).append(elapsed)
+    avg = lambda xs: sum(xs) / len(xs) * 1000 if xs else 0.0
+    print(f"{label:<22} hits {len(hit_times):4d} ({avg(hit_times):7.3f} ms avg)  "
+          f"misses {len(miss_times):4d} ({avg(miss_times):7.1f} ms avg)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server, api_base = start_standin(first_token=args.latency, token_interval=0.0)
+    openai.api_base = api_base
+    openai.api_key = "stub"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite")
+        llm.cache = ResponseCache(path)
+        run("cold cache", args.requests, args.seed)
+        run("warm cache", args.requests, args.seed)
+        print("stats:", llm.cache.stats())
+
+        # Offline replay: no server, no key, cache only.
+        server.shutdown()
+        openai.api_key = None
+        llm.cache = ResponseCache(path, replay_only=True)
+        start = time.perf_counter()
+        run("replay-only, offline", args.requests, args.seed)
+        print(f"replay pass took {(time.perf_counter() - start) * 1000:.1f} ms total")
+
+
+if __name__ == "__main__":
+    main()
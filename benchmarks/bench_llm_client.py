@@ -0,0 +1,152 @@
+"""
+The LLM client against the local OpenAI stand-in: connections opened with and
+without the shared pool when every call runs on a fresh thread (as Flask
+request threads do), success rate and latency with injected 429s and
+dropped connections, with and without retries, and how fast calls fail
+once the API is down and the circuit breaker has opened.
+
+    python benchmarks/bench_llm_client.py --calls 200 --rate-limit 0.2 --disconnect 0.1
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["ELASTICLUE_LLM_CACHE"] = "off"
+# Measure the client, not the scheduler's rate limits.
+os.environ["ELASTICLUE_LLM_RPM"] = "0"
+os.environ["ELASTICLUE_LLM_TPM"] = "0"
+
+import openai
+
+import llm
+from llm import CircuitBreaker, LLMClient, LLMUnavailable
+from openai_standin import start_standin
+from stats import percentile
+
+MESSAGES = [{"role": "user", "content": "Where were you at midnight?"}]
+
+
+def use_client(client):
+    llm.client = client
+    openai.requestssession = client.session if client is not None else None
+
+
+def direct_call():
+    """What every call site did before the client: no pool, timeout or retry."""
+    openai.ChatCompletion.create(model=llm.DEFAULT_MODEL, messages=MESSAGES, max_tokens=100, temperature=0.9)
+
+
+def pooled_call():
+    llm.chat_completion(MESSAGES)
+
+
+def run_calls(call, calls, concurrency):
+    """
+    Runs calls on a fresh thread each, at most concurrency at a time.
+    Returns (latencies of successful calls in ms, failures, wall seconds).
+    """
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    slots = threading.Semaphore(concurrency)
+
+    def one():
+        start = time.perf_counter()
+        try:
+            call()
+            ok = True
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                failures[0] += 1
+        slots.release()
+
+    threads = []
+    start = time.perf_counter()
+    for _ in range(calls):
+        slots.acquire()
+        thread = threading.Thread(target=one)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return latencies, failures[0], time.perf_counter() - start
+
+
+def report(name, standin, before, latencies, failures, calls):
+    stats = standin.config.stats()
+    p50 = f"{percentile(latencies, 0.5):7.1f}" if latencies else "      -"
+    p95 = f"{percentile(latencies, 0.95):7.1f}" if latencies else "      -"
+    print(f"{name:<24} ok {len(latencies) / calls:6.1%}  p50 {p50} ms  p95 {p95} ms  "
+          f"requests {stats['requests'] - before['requests']:>5}  "
+          f"connections {stats['connections_opened'] - before['connections_opened']:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in reply latency, seconds")
+    parser.add_argument("--rate-limit", type=float, default=0.2)
+    parser.add_argument("--disconnect", type=float, default=0.1)
+    args = parser.parse_args()
+
+    standin, api_base = start_standin(first_token=args.latency, token_interval=0.0, seed=1)
+    openai.api_base = api_base
+    openai.api_key = "sk-bench"
+
+    print(f"{args.calls} calls, {args.concurrency} at a time, one thread per call")
+    for name, client, call in (("direct, no pool", None, direct_call),
+                               ("client, pooled", LLMClient(), pooled_call)):
+        use_client(client)
+        before = standin.config.stats()
+        latencies, failures, _ = run_calls(call, args.calls, args.concurrency)
+        report(name, standin, before, latencies, failures, args.calls)
+
+    print(f"\nwith {args.rate_limit:.0%} 429s and {args.disconnect:.0%} dropped connections")
+    standin.config.rate_limit = args.rate_limit
+    standin.config.disconnect = args.disconnect
+    # A breaker that never opens, so the comparison is about retries alone.
+    for name, client in (("direct, no retries", None),
+                         ("client, retries=0", LLMClient(retries=0, breaker=CircuitBreaker(threshold=10 ** 9))),
+                         ("client, retries=3", LLMClient(retries=3, breaker=CircuitBreaker(threshold=10 ** 9)))):
+        use_client(client)
+        before = standin.config.stats()
+        latencies, failures, _ = run_calls(pooled_call if client else direct_call, args.calls, args.concurrency)
+        report(name, standin, before, latencies, failures, args.calls)
+
+    print("\nAPI down (every connection dropped)")
+    standin.config.rate_limit = 0.0
+    standin.config.disconnect = 1.0
+    client = LLMClient(retries=3, breaker=CircuitBreaker(threshold=5, cooldown=1.0))
+    use_client(client)
+    closed, opened = [], []
+    for _ in range(20):
+        state = client.breaker.state
+        start = time.perf_counter()
+        try:
+            pooled_call()
+        except LLMUnavailable:
+            pass
+        (closed if state == "closed" else opened).append((time.perf_counter() - start) * 1000)
+    print(f"  breaker closed: {len(closed):>3} calls, mean {sum(closed) / len(closed):8.2f} ms (retrying)")
+    print(f"  breaker open:   {len(opened):>3} calls, mean {sum(opened) / len(opened):8.4f} ms (fallback)")
+
+    standin.config.disconnect = 0.0
+    time.sleep(client.breaker.cooldown)
+    pooled_call()
+    print(f"  API back, after the cooldown the probe call closed the breaker: {client.breaker.state}")
+    print(f"\nclient metrics: {client.metrics()}")
+    standin.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Players chatting against a rate-limited OpenAI stand-in, one of them far
+chattier than the rest, while scenario generation runs in the background.
+Compares calls going straight to the API (unlimited scheduler, 429s and
+retries) with the LLM scheduler set to the stand-in's limit: latency for the
+ordinary players, fallbacks, 429s seen and when the background work got done.
+
+    python benchmarks/bench_llm_scheduler.py --rpm 1200 --players 8 --hog-threads 8
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["ELASTICLUE_LLM_CACHE"] = "off"
+
+import openai
+
+import llm
+from llm import LLMClient, LLMUnavailable
+from llm_scheduler import LLMScheduler, BACKGROUND
+from openai_standin import start_standin
+from stats import percentile
+
+MESSAGES = [{"role": "user", "content": "Where were you at midnight?"}]
+
+
+def run(name, scheduler, standin, args, pause_on_429=True):
+    llm.scheduler = scheduler
+    llm.client = LLMClient(deadline=args.deadline)
+    llm.client.on_rate_limit = scheduler.pause if pause_on_429 else None
+    openai.requestssession = llm.client.session
+    before = standin.config.stats()
+
+    latencies = {"player": [], "hog": []}
+    fallbacks = {"player": 0, "hog": 0}
+    background_done = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def call(kind, session):
+        begin = time.perf_counter()
+        try:
+            llm.chat_completion(MESSAGES, session=session)
+            ok = True
+        except LLMUnavailable:
+            ok = False
+        with lock:
+            if ok:
+                latencies[kind].append((time.perf_counter() - begin) * 1000)
+            else:
+                fallbacks[kind] += 1
+
+    def player(n):
+        for _ in range(args.turns):
+            call("player", f"player-{n}")
+            time.sleep(random.uniform(0.5, 1.5) * args.think)
+
+    def hog():
+        while time.perf_counter() - start < args.duration:
+            call("hog", "hog")
+
+    def background():
+        for _ in range(args.background):
+            llm.chat_completion(MESSAGES, max_tokens=400, priority=BACKGROUND)
+            background_done.append(time.perf_counter() - start)
+
+    threads = ([threading.Thread(target=player, args=(n,)) for n in range(args.players)]
+               + [threading.Thread(target=hog) for _ in range(args.hog_threads)]
+               + [threading.Thread(target=background)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = standin.config.stats()
+    metrics = scheduler.metrics()
+    print(f"{name:<12} players p50 {percentile(latencies['player'], 0.5):7.0f} ms  "
+          f"p95 {percentile(latencies['player'], 0.95):7.0f} ms  fallbacks {fallbacks['player']:>3}  |  "
+          f"hog calls {len(latencies['hog']):>4}  fallbacks {fallbacks['hog']:>3}  |  "
+          f"429s {stats['rate_limited'] - before['rate_limited']:>5}  "
+          f"background done {background_done[-1] if background_done else float('nan'):5.1f} s  "
+          f"max queued {metrics['maxQueued']:>3}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rpm", type=int, default=1200, help="the stand-in's requests per minute")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=5, help="chat turns per ordinary player")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a player's turns")
+    parser.add_argument("--hog-threads", type=int, default=8, help="concurrent calls from the chatty player")
+    parser.add_argument("--background", type=int, default=4, help="scenario generations")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=10.0)
+    args = parser.parse_args()
+    args.duration = args.turns * args.think
+    random.seed(1)
+
+    standin, api_base = start_standin(first_token=args.latency, token_interval=0.0,
+                                requests_per_minute=args.rpm, retry_after=1)
+    openai.api_base = api_base
+    openai.api_key = "sk-bench"
+
+    print(f"stand-in limit {args.rpm} requests/min; {args.players} players x {args.turns} turns, "
+          f"one player with {args.hog_threads} calls in flight, {args.background} background generations")
+    run("unscheduled", LLMScheduler(requests_per_minute=0, tokens_per_minute=0), standin, args, pause_on_429=False)
+    # Leave the stand-in's bucket full again before the next run.
+    time.sleep(2)
+    # A little under the real limit: the API counts arrivals, which jitter.
+    run("scheduled", LLMScheduler(requests_per_minute=args.rpm * 0.9, tokens_per_minute=0, burst_seconds=1.0),
+        standin, args)
+    standin.shutdown()
+
+
+if __name__ == "__main__":
+    main()
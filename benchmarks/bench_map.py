@@ -0,0 +1,105 @@
+"""
+Map generation and tile queries: list-of-strings vs. the compact TileGrid.
+
+    python benchmarks/bench_map.py --sizes 40x15 500x500 1000x1000 2000x2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import (
+    WALL_CHAR, FLOOR_CHAR, POSSIBLE_ROOM_NAMES,
+    generate_tile_grid, is_valid_tile, np,
+)
+
+
+def legacy_generate(num_rooms, overall_width, overall_height):
+    """The original nested-loop generator, kept here as the baseline."""
+    grid = [[WALL_CHAR for _ in range(overall_width)] for _ in range(overall_height)]
+    cols = 2
+    rows = (num_rooms + cols - 1) // cols
+    room_width = overall_width // cols
+    room_height = overall_height // rows
+    count = 0
+    for r in range(rows):
+        for c in range(cols):
+            if count >= num_rooms:
+                break
+            x = c * room_width + 1
+            y = r * room_height + 1
+            for row in range(y, y + room_height - 2):
+                for col in range(x, x + room_width - 2):
+                    if 0 <= row < overall_height and 0 <= col < overall_width:
+                        grid[row][col] = FLOOR_CHAR
+            for i, ch in enumerate(POSSIBLE_ROOM_NAMES[count]):
+                if 0 <= y - 1 < overall_height and 0 <= x + i < overall_width:
+                    grid[y - 1][x + i] = ch
+            count += 1
+    return ["".join(row) for row in grid]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def peak_mb(fn, *args, **kwargs):
+    tracemalloc.start()
+    fn(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def run(width, height, num_rooms, queries, skip_legacy_above):
+    rng = random.Random(0)
+    points = [(rng.randrange(width), rng.randrange(height)) for _ in range(queries)]
+    print(f"--- {width}x{height}, {num_rooms} rooms ---")
+
+    if width * height <= skip_legacy_above:
+        rows, ms = timed(legacy_generate, num_rooms, width, height)
+        start = time.perf_counter()
+        for x, y in points:
+            is_valid_tile(rows, x, y)
+        q = (time.perf_counter() - start) / queries * 1e9
+        peak = peak_mb(legacy_generate, num_rooms, width, height)
+        print(f"  legacy lists   gen {ms:9.2f} ms  peak {peak:8.2f} MB  "
+              f"query {q:6.0f} ns")
+    else:
+        print("  legacy lists   skipped (too slow at this size)")
+
+    backends = ["bytearray"] + (["numpy"] if np is not None else [])
+    for backend in backends:
+        (grid, _, _), ms = timed(generate_tile_grid, num_rooms, width, height, backend)
+        peak = peak_mb(generate_tile_grid, num_rooms, width, height, backend)
+        start = time.perf_counter()
+        for x, y in points:
+            grid.is_walkable(x, y)
+        q = (time.perf_counter() - start) / queries * 1e9
+        _, str_ms = timed(grid.to_strings)
+        print(f"  {backend:<14} gen {ms:9.2f} ms  peak {peak:8.2f} MB  "
+              f"query {q:6.0f} ns  to_strings {str_ms:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", default=["40x15", "500x500", "1000x1000", "2000x2000"])
+    parser.add_argument("--rooms", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=200000)
+    parser.add_argument("--legacy-max-cells", type=int, default=4_000_000,
+                        help="skip the nested-loop baseline above this many tiles")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        width, height = (int(v) for v in size.lower().split("x"))
+        run(width, height, args.rooms, args.queries, args.legacy_max_cells)
+
+
+if __name__ == "__main__":
+    main()
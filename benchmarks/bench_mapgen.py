@@ -0,0 +1,68 @@
+"""
+Seeded map generation from 6 to 10k rooms: build time, time per tile (flat
+if generation is linear in the map area), cache hits, and a check that
+every room is reachable, both on the door graph and by walking the tiles.
+
+    python benchmarks/bench_mapgen.py --rooms 6 100 1000 10000 --tiles-per-room 120
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logic
+from logic import generate_layout, MIN_ROOM_WIDTH, MIN_ROOM_HEIGHT
+from navigation import walkable_mask, distance_field, UNREACHABLE
+
+
+def map_size(num_rooms, tiles_per_room):
+    """A roughly 8:3 map with about tiles_per_room tiles per room."""
+    area = max(num_rooms * tiles_per_room, 40 * 15)
+    height = max(MIN_ROOM_HEIGHT, int((area * 3 / 8) ** 0.5))
+    width = max(MIN_ROOM_WIDTH, -(-area // height))
+    return width, height
+
+
+def rooms_reachable(layout):
+    """Rooms whose centre a BFS from the first room's centre reaches."""
+    mask, width, height = walkable_mask(layout.grid)
+    start = layout.rooms[0]
+    dist = distance_field(mask, width, height, (start["center_x"], start["center_y"]))
+    return sum(1 for room in layout.rooms
+               if dist[room["center_y"] * width + room["center_x"]] != UNREACHABLE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, nargs="+", default=[6, 100, 1000, 10000])
+    parser.add_argument("--tiles-per-room", type=int, default=120)
+    parser.add_argument("--seeds", type=int, default=3, help="maps built per size")
+    args = parser.parse_args()
+
+    print(f"{'rooms':>6} {'size':>11} {'build ms':>9} {'ns/tile':>8} {'cached us':>10} "
+          f"{'doors':>6} {'graph':>6} {'walk':>10}")
+    for num_rooms in args.rooms:
+        width, height = map_size(num_rooms, args.tiles_per_room)
+        logic.map_cache.clear()
+        build = []
+        for seed in range(args.seeds):
+            start = time.perf_counter()
+            layout = generate_layout(num_rooms, width, height, seed)
+            build.append(time.perf_counter() - start)
+        best = min(build)
+
+        start = time.perf_counter()
+        for _ in range(100):
+            generate_layout(num_rooms, width, height, 0)
+        cached_us = (time.perf_counter() - start) / 100 * 1e6
+
+        reachable = rooms_reachable(layout)
+        print(f"{num_rooms:>6} {f'{width}x{height}':>11} {best * 1000:>9.1f} "
+              f"{best / (width * height) * 1e9:>8.0f} {cached_us:>10.2f} {len(layout.doors):>6} "
+              f"{'ok' if layout.is_connected() else 'SPLIT':>6} {f'{reachable}/{num_rooms}':>10}")
+
+
+if __name__ == "__main__":
+    main()
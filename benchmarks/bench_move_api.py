@@ -0,0 +1,59 @@
+"""
+Cost of one arrow-key move: /move + redirect + full page vs. the /api/move delta.
+
+    python benchmarks/bench_move_api.py --moves 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from browser_frontend import app
+
+
+def response_bytes(resp):
+    headers = sum(len(k) + len(v) + 4 for k, v in resp.headers.items())
+    return headers + len(resp.get_data())
+
+
+def legacy_move(client, dx):
+    first = client.get(f"/move?dx={dx}&dy=0")
+    second = client.get(first.headers["Location"])
+    return 2, response_bytes(first) + response_bytes(second)
+
+
+def api_move(client, dx):
+    resp = client.get(f"/api/move?dx={dx}&dy=0")
+    return 1, response_bytes(resp)
+
+
+def run(name, move, moves):
+    client = app.test_client()
+    client.get("/")
+    total_bytes = 0
+    round_trips = 0
+    start = time.perf_counter()
+    for i in range(moves):
+        trips, nbytes = move(client, 1 if i % 2 == 0 else -1)
+        round_trips += trips
+        total_bytes += nbytes
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {elapsed / moves * 1e6:8.1f} us/move  "
+          f"{round_trips / moves:.0f} round trips/move  {total_bytes / moves:8.0f} bytes/move")
+    return total_bytes / moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--moves", type=int, default=1000)
+    args = parser.parse_args()
+
+    legacy = run("/move + /", legacy_move, args.moves)
+    delta = run("/api/move", api_move, args.moves)
+    print(f"payload reduction: x{legacy / delta:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Pathfinding cost on large maps: building a target's distance field (once),
+then path and distance queries against the cached field, plus the
+single search a "nearest clue" walk makes when its fields aren't cached.
+
+    python benchmarks/bench_pathfinding.py --size 1000x1000 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import generate_tile_grid
+from navigation import Navigator
+from stats import percentile
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", default="1000x1000", help="map WIDTHxHEIGHT")
+    parser.add_argument("--rooms", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--searches", type=int, default=5, help="uncached nearest-target searches to time")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    rng = random.Random(args.seed)
+    grid, rooms, _ = generate_tile_grid(args.rooms, width, height)
+
+    navigator, ms = timed(Navigator, grid)
+    print(f"{args.size} map, {args.rooms} rooms: walkable mask {ms:.1f} ms")
+
+    targets = [(r["center_x"], r["center_y"]) for r in rooms]
+    build = []
+    for target in targets:
+        _, ms = timed(navigator.field, *target)
+        build.append(ms)
+    print(f"distance field build (once per target): avg {sum(build) / len(build):.1f} ms, "
+          f"max {max(build):.1f} ms")
+
+    floor = [(x, y) for x, y in ((rng.randrange(width), rng.randrange(height)) for _ in range(args.queries * 20))
+             if navigator.mask[y * width + x]][:args.queries]
+    path_ms, dist_us, lengths = [], [], []
+    for start in floor:
+        target = rng.choice(targets)
+        path, ms = timed(navigator.path_to, start, target)
+        path_ms.append(ms)
+        lengths.append(len(path) if path is not None else 0)
+        t0 = time.perf_counter()
+        navigator.distance(start, target)
+        dist_us.append((time.perf_counter() - t0) * 1e6)
+    print(f"cached path query over {len(path_ms)} walks (avg {sum(lengths) / len(lengths):.0f} steps, "
+          f"max {max(lengths)}): p50 {percentile(path_ms, 0.5):.3f} ms, p99 {percentile(path_ms, 0.99):.3f} ms, "
+          f"max {max(path_ms):.3f} ms")
+    print(f"cached distance lookup: p50 {percentile(dist_us, 0.5):.1f} us")
+
+    # Big maps don't build fields for a nearest-target miss; force that on small ones too.
+    cold = Navigator(grid, eager_cells=0)
+    for start in floor[:args.searches]:
+        (goal, path), ms = timed(cold.nearest_path, start, targets)
+        steps = len(path) if path is not None else "no"
+        print(f"uncached nearest of {len(targets)} targets from {start}: {goal}, {steps} steps in {ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
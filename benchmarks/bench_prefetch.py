@@ -0,0 +1,110 @@
+"""
+Time from opening a chat to the suspect's first words, with greetings
+prefetched as players walk up to suspects vs. generated when the chat
+opens. Players walk tile by tile to a random suspect and open the chat
+with probability --chat; the other walks are the ones that waste a
+speculative call. Greetings come from the local OpenAI stand-in.
+
+    python benchmarks/bench_prefetch.py --players 8 --trips 12 --llm-latency 0.8 --chat 0.6
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["ELASTICLUE_LLM_CACHE"] = "off"
+os.environ["ELASTICLUE_LLM_RPM"] = "0"
+os.environ["ELASTICLUE_LLM_TPM"] = "0"
+
+import openai
+
+from engine import GameEngine
+from navigation import Navigator
+from openai_standin import Latency, start_standin
+from prefetch import GreetingPrefetcher, generate_greeting
+from simulate import build_layout
+from stats import percentile
+
+
+def run(name, prefetcher, layout, args):
+    rows, suspects, weapons, clues = layout
+    navigator = Navigator(rows)
+    waits = []
+    calls = [0]
+    lock = threading.Lock()
+
+    def player(n):
+        rng = random.Random(n)
+        engine = GameEngine(rows, suspects, weapons, clues, navigator=navigator, seed=n)
+        talked = set()
+        for _ in range(args.trips):
+            target = rng.choice([s for s in engine.suspects if s["name"] != engine.entities.suspect_at(
+                engine.player_x, engine.player_y)])
+            event = engine.step(("walk", target["name"]))
+            previous = event["from"]
+            for tile in event["path"] or ():
+                time.sleep(args.step)
+                prefetcher.observe(n, previous, tile, [s for s in engine.suspects if s["name"] not in talked],
+                                   engine.murderer["name"])
+                previous = tile
+            if target["name"] in talked or rng.random() >= args.chat:
+                continue
+            is_murderer = target["name"] == engine.murderer["name"]
+            start = time.perf_counter()
+            greeting = prefetcher.take(n, target["name"], is_murderer)
+            if greeting is None:
+                generate_greeting(target["name"], is_murderer, session=n)
+                with lock:
+                    calls[0] += 1
+            with lock:
+                waits.append((time.perf_counter() - start) * 1000)
+            talked.add(target["name"])
+
+    threads = [threading.Thread(target=player, args=(n,)) for n in range(args.players)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Let speculative calls still in flight finish before counting them.
+    prefetcher._executor.shutdown(wait=True)
+
+    m = prefetcher.metrics()
+    total_calls = calls[0] + m["speculative"]
+    print(f"{name:<12} first words p50 {percentile(waits, 0.5):7.0f} ms  p95 {percentile(waits, 0.95):7.0f} ms  "
+          f"chats {len(waits):>3}  LLM calls {total_calls:>4}  "
+          f"speculative {m['speculative']:>3}  wasted {m['wasted'] + m['pending']:>3}  suppressed {m['suppressed']:>3}")
+    return m
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--trips", type=int, default=12, help="walks to a suspect per player")
+    parser.add_argument("--chat", type=float, default=0.6, help="chance a walk ends in a chat")
+    parser.add_argument("--step", type=float, default=0.1, help="seconds per tile walked")
+    parser.add_argument("--radius", type=int, default=4)
+    parser.add_argument("--waste-burst", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    args = parser.parse_args()
+
+    standin, api_base = start_standin(first_token=Latency("normal", args.llm_latency, args.jitter),
+                                      token_interval=0.0, seed=1)
+    openai.api_base = api_base
+    openai.api_key = "sk-bench"
+    layout = build_layout(seed=1)
+
+    print(f"{args.players} players x {args.trips} walks, {args.chat:.0%} end in a chat, "
+          f"{args.step * 1000:.0f} ms per tile, LLM ~{args.llm_latency * 1000:.0f} ms")
+    run("on demand", GreetingPrefetcher(radius=0), layout, args)
+    m = run("prefetched", GreetingPrefetcher(radius=args.radius, waste_burst=args.waste_burst), layout, args)
+    print(f"\nprefetch metrics: {m}")
+    standin.shutdown()
+
+
+if __name__ == "__main__":
+    main()
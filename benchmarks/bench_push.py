@@ -0,0 +1,100 @@
+"""
+Load test for the SSE push hub: how many idle connections one process can
+hold, and how quickly an event fans out to all of them.
+
+    python benchmarks/bench_push.py --connections 5000 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from push import PushHub
+
+
+def raise_fd_limit(wanted):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(hard, max(soft, wanted))
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return target
+
+
+def rss_mb():
+    # ru_maxrss is KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def open_client(port, token):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /events?token={token} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    await reader.readuntil(b"\n\n")  # retry: hint
+    return reader, writer
+
+
+async def wait_event(reader):
+    while True:
+        chunk = await reader.readuntil(b"\n\n")
+        if chunk.startswith(b"event:"):
+            return chunk
+
+
+async def run(connections, rounds, batch):
+    hub = PushHub(port=0).start()
+    tokens = [f"session-{i}" for i in range(connections)]
+    rss_before = rss_mb()
+
+    start = time.perf_counter()
+    clients = []
+    for i in range(0, connections, batch):
+        clients.extend(await asyncio.gather(
+            *(open_client(hub.port, t) for t in tokens[i:i + batch])))
+    connect_time = time.perf_counter() - start
+
+    # Let the hub register the final batch.
+    while hub.connection_count < connections:
+        await asyncio.sleep(0.01)
+
+    print(f"connections held:      {hub.connection_count}")
+    print(f"connect time:          {connect_time:.2f} s")
+    print(f"threads in process:    {threading.active_count()} (hub uses 1)")
+    print(f"RSS growth:            {rss_mb() - rss_before:.1f} MB for clients + hub")
+
+    for r in range(rounds):
+        start = time.perf_counter()
+        for token in tokens:
+            hub.publish(token, "move", {"round": r})
+        await asyncio.gather(*(wait_event(reader) for reader, _ in clients))
+        elapsed = time.perf_counter() - start
+        print(f"round {r}: delivered {connections} events in {elapsed * 1000:.1f} ms "
+              f"({connections / elapsed:,.0f} events/s)")
+
+    for _, writer in clients:
+        writer.close()
+    hub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    # Both ends of every connection live in this process.
+    limit = raise_fd_limit(args.connections * 2 + 100)
+    if limit < args.connections * 2 + 100:
+        args.connections = (limit - 100) // 2
+        print(f"fd limit is {limit}; capping at {args.connections} connections")
+    asyncio.run(run(args.connections, args.rounds, args.batch))
+
+
+if __name__ == "__main__":
+    main()
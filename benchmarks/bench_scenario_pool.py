@@ -0,0 +1,70 @@
+"""
+Game start latency with the scenario pool vs. calling the LLM per game.
+The pool generates real scenarios against the local OpenAI stand-in,
+with normally distributed latency.
+
+    python benchmarks/bench_scenario_pool.py --llm-latency 2.0 --games 40 --arrival 0.2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["ELASTICLUE_LLM_CACHE"] = "off"
+os.environ.setdefault("ELASTICLUE_LLM_RPM", "0")
+
+import openai
+
+from openai_standin import Latency, start_standin
+from scenario_pool import ScenarioPool
+from stats import percentile
+
+ROOMS = ["Kitchen", "Ballroom", "Conservatory", "DiningRoom", "BilliardRoom", "Library"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--arrival", type=float, default=0.25,
+                        help="seconds between new games")
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--low-water", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    standin, api_base = start_standin(first_token=Latency("normal", args.llm_latency, args.jitter),
+                                      token_interval=0.0)
+    openai.api_base = api_base
+    openai.api_key = "sk-bench"
+    print(f"direct LLM call per game: ~{args.llm_latency * 1000:.0f} ms game start")
+
+    pool = ScenarioPool(ROOMS, size=args.size, low_water=args.low_water, workers=args.workers).start()
+    # Let the pool warm up, as it would while the server starts.
+    while len(pool) < args.size:
+        time.sleep(0.05)
+
+    starts, sources = [], []
+    for _ in range(args.games):
+        t0 = time.perf_counter()
+        scenario = pool.take()
+        starts.append(time.perf_counter() - t0)
+        sources.append(scenario["source"])
+        time.sleep(args.arrival)
+
+    pool.stop()
+    standin.shutdown()
+    m = pool.metrics()
+    print(f"pool take(): p50 {percentile(starts, 0.5) * 1e6:.1f} us, "
+          f"p99 {percentile(starts, 0.99) * 1e6:.1f} us")
+    print(f"served from pool: {sources.count('llm')}/{args.games}, "
+          f"fallbacks: {sources.count('fallback')}")
+    print(f"pool depth at end: {m['depth']}, refills: {m['generated']}, "
+          f"refill latency avg {m['refill_latency_avg_ms']:.0f} ms / max {m['refill_latency_max_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
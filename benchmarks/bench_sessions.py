@@ -0,0 +1,77 @@
+"""
+Games per process and per-request overhead of the browser session store.
+
+    python benchmarks/bench_sessions.py --games 5000 --requests 2000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import browser_frontend
+from browser_frontend import app, sessions, SESSION_COOKIE
+from game_state import GameState, SessionStore
+from scenario_pool import fallback_scenario
+
+
+def bench_memory(num_games):
+    store = SessionStore(
+        lambda: GameState(browser_frontend.game_map, browser_frontend.rooms,
+                          browser_frontend.selected_room_names,
+                          fallback_scenario(browser_frontend.selected_room_names)),
+        max_sessions=num_games,
+    )
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    for _ in range(num_games):
+        store.get_or_create(None)
+    elapsed = time.perf_counter() - start
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_game = (after - before) / num_games
+    print(f"created {num_games} games in {elapsed * 1000:.1f} ms "
+          f"({elapsed / num_games * 1e6:.1f} us/game)")
+    print(f"memory: {per_game / 1024:.1f} KiB/game -> "
+          f"~{int(512 * 1024 * 1024 // per_game)} games per 512 MiB")
+
+
+def bench_requests(num_requests, resident_games):
+    for _ in range(resident_games):
+        sessions.get_or_create(None)
+    client = app.test_client()
+    client.get("/")
+    session_id = client.get_cookie(SESSION_COOKIE).value
+
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        sessions.get(session_id)
+    lookup = (time.perf_counter() - start) / num_requests
+
+    moves = [(1, 0), (-1, 0)]
+    start = time.perf_counter()
+    for i in range(num_requests):
+        dx, dy = moves[i % 2]
+        client.get(f"/move?dx={dx}&dy={dy}")
+    move = (time.perf_counter() - start) / num_requests
+
+    print(f"{len(sessions)} resident games")
+    print(f"session lookup: {lookup * 1e6:.2f} us/request")
+    print(f"/move round trip (test client): {move * 1e6:.1f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    bench_memory(args.games)
+    bench_requests(args.requests, args.games)
+
+
+if __name__ == "__main__":
+    main()
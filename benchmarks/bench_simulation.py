@@ -0,0 +1,42 @@
+"""
+Headless game throughput: games per second for each simulate.py policy,
+in-process and across the worker pool, against the 10k games/s per core
+target.
+
+    python benchmarks/bench_simulation.py --games 100000 --workers 4
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulate import POLICIES, build_layout, run_batch
+
+TARGET_PER_CORE = 10000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--size", default="40x15", help="map WIDTHxHEIGHT")
+    parser.add_argument("--rooms", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    layout = build_layout(args.rooms, width, height, seed=args.seed)
+    print(f"{args.games} games per run on a {width}x{height} map, {args.rooms} rooms")
+    print(f"{'policy':<8} {'workers':>7} {'games/s':>10} {'per core':>10} {'actions':>8} {'moves p50':>10}  target")
+    for policy in sorted(POLICIES):
+        for workers in sorted({1, args.workers}):
+            stats = run_batch(layout, args.games, policy, workers)
+            per_core = stats["gamesPerSecond"] / min(workers, os.cpu_count() or 1)
+            verdict = "ok" if per_core >= TARGET_PER_CORE else "MISSED"
+            print(f"{policy:<8} {workers:>7} {stats['gamesPerSecond']:>10.0f} {per_core:>10.0f} "
+                  f"{stats['meanActions']:>8.1f} {stats['moves']['p50']:>10}  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
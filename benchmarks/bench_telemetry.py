@@ -0,0 +1,99 @@
+"""
+Telemetry overhead: cost of the instrumentation hooks and of an /api/move
+request with ELASTICLUE_OTEL=off (the default) and, when OpenTelemetry is
+installed, with the SDK recording everything in memory.
+
+Each mode runs in a fresh interpreter, since telemetry is configured at import.
+
+    python benchmarks/bench_telemetry.py --requests 5000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(requests, calls):
+    sys.path.insert(0, ROOT)
+    import telemetry
+    from browser_frontend import app
+
+    def per_call_ns(fn):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        return (time.perf_counter() - start) / calls * 1e9
+
+    def bare():
+        pass
+
+    def span():
+        with telemetry.span("bench", {"k": 1}):
+            pass
+
+    def count():
+        telemetry.count("moves")
+
+    client = app.test_client()
+    client.get("/")
+    for _ in range(200):
+        client.get("/api/move?dx=0&dy=0")
+    start = time.perf_counter()
+    for i in range(requests):
+        client.get(f"/api/move?dx={1 if i % 2 else -1}&dy=0")
+    request_us = (time.perf_counter() - start) / requests * 1e6
+
+    baseline = per_call_ns(bare)
+    print(json.dumps({
+        "enabled": telemetry.enabled,
+        "span_ns": per_call_ns(span) - baseline,
+        "count_ns": per_call_ns(count) - baseline,
+        "request_us": request_us,
+    }))
+
+
+def run_mode(mode, requests, calls):
+    env = dict(os.environ, ELASTICLUE_OTEL=mode, ELASTICLUE_LLM_CACHE="off")
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", "--requests", str(requests), "--calls", str(calls)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.requests, args.calls)
+        return
+
+    results = {}
+    for mode in ("off", "memory"):
+        result = run_mode(mode, args.requests, args.calls)
+        if mode != "off" and not result["enabled"]:
+            print(f"{mode:<6}: skipped (opentelemetry-sdk not installed)")
+            continue
+        results[mode] = result
+        print(f"{mode:<6}: span {result['span_ns']:8.0f} ns | count {result['count_ns']:6.0f} ns | "
+              f"/api/move {result['request_us']:6.1f} us/request")
+    off = results["off"]
+    # A move runs one count() (two with a pickup); Flask hooks aren't registered when off.
+    hook_us = 2 * off["count_ns"] / 1000
+    print(f"disabled: at most {hook_us:.2f} us of hooks per /api/move request "
+          f"({hook_us / off['request_us']:.3%} of the request)")
+    if "memory" in results:
+        off, on = results["off"]["request_us"], results["memory"]["request_us"]
+        print(f"recording everything costs {on - off:+.1f} us/request ({(on - off) / off:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
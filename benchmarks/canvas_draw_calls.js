@@ -0,0 +1,74 @@
+// Node driver for bench_canvas_draw.py: replays a walk against a stubbed 2D
+// context and reports draw calls per frame for the old full-redraw client
+// and for static/map_renderer.js. Reads {data, chars, moves} JSON on stdin.
+var path = require("path");
+var MapRenderer = require(path.join(__dirname, "..", "static", "map_renderer.js"));
+
+var DRAW_CALLS = ["fillRect", "clearRect", "fillText", "drawImage"];
+
+function stubCanvas(counts) {
+  var ctx = {font: "", fillStyle: ""};
+  DRAW_CALLS.forEach(function (name) {
+    ctx[name] = function () { counts[name] = (counts[name] || 0) + 1; };
+  });
+  return {width: 0, height: 0, getContext: function () { return ctx; }};
+}
+
+function total(counts) {
+  return DRAW_CALLS.reduce(function (sum, name) { return sum + (counts[name] || 0); }, 0);
+}
+
+// The client as it was: clear and repaint every tile and entity per frame.
+function legacyFrame(ctx, d, chars, T) {
+  ctx.clearRect(0, 0, d.mapWidth * T, d.mapHeight * T);
+  for (var row = 0; row < d.mapHeight; row++) {
+    for (var col = 0; col < d.mapWidth; col++) {
+      var tile = d.gameMap[row][col];
+      ctx.fillRect(col * T, row * T, T, T);
+      if (tile !== chars.wallChar && tile !== chars.doorChar && tile !== chars.floorChar) {
+        ctx.fillText(tile, col * T + 8, row * T + 20);
+      }
+    }
+  }
+  ctx.fillText(d.victim.emoji, 0, 0);
+  d.suspects.forEach(function (s) { ctx.fillText(s.emoji, 0, 0); });
+  d.weapons.forEach(function (w) { if (!w.collected) ctx.fillText(w.emoji, 0, 0); });
+  d.clues.forEach(function (c) { if (!c.found) ctx.fillText(chars.clueChar, 0, 0); });
+  ctx.fillText(chars.playerChar, 0, 0);
+}
+
+var input = JSON.parse(require("fs").readFileSync(0, "utf8"));
+var T = input.chars.tileSize;
+
+var legacyCounts = {};
+var legacyCtx = stubCanvas(legacyCounts).getContext();
+var legacyData = JSON.parse(JSON.stringify(input.data));
+var start = process.hrtime.bigint();
+input.moves.forEach(function (delta) {
+  legacyData.player = delta.player;
+  legacyFrame(legacyCtx, legacyData, input.chars, T);
+});
+var legacyMs = Number(process.hrtime.bigint() - start) / 1e6;
+
+var layerCounts = {}, frameCounts = {};
+var opts = Object.assign({createCanvas: function () { return stubCanvas(layerCounts); }}, input.chars);
+var data = JSON.parse(JSON.stringify(input.data));
+var renderer = new MapRenderer(stubCanvas(frameCounts), data, opts);
+renderer.drawAll();
+var firstFrame = total(frameCounts);
+frameCounts = {};
+renderer.ctx = stubCanvas(frameCounts).getContext();
+start = process.hrtime.bigint();
+input.moves.forEach(function (delta) { renderer.applyMoveDelta(delta); });
+var layerMs = Number(process.hrtime.bigint() - start) / 1e6;
+
+var moves = input.moves.length || 1;
+console.log(JSON.stringify({
+  legacy: {per_move: total(legacyCounts) / moves, ms: legacyMs},
+  layered: {
+    static_layer_calls: total(layerCounts),
+    first_frame: firstFrame,
+    per_move: total(frameCounts) / moves,
+    ms: layerMs,
+  },
+}));
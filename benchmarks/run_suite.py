@@ -0,0 +1,312 @@
+"""
+Reproducible performance suite: logic.py micro-benchmarks, a concurrent
+load test of the Flask frontend against the local OpenAI stand-in, and the
+headless curses frame benchmark. Results are written as JSON; --compare
+checks them against a stored baseline and exits 1 on regressions.
+
+    python benchmarks/run_suite.py --output baseline.json
+    python benchmarks/run_suite.py --compare baseline.json --threshold 0.15
+    python benchmarks/run_suite.py --parts load --players 50 --llm-latency 0.2
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from stats import percentile
+
+# The load test must never reach OpenAI or reuse cached replies, and must
+# not fight a running game for the push port.
+os.environ["ELASTICLUE_LLM_CACHE"] = "off"
+# Nor be throttled by the LLM scheduler's default rate limits.
+os.environ.setdefault("ELASTICLUE_LLM_RPM", "0")
+os.environ.setdefault("ELASTICLUE_LLM_TPM", "0")
+os.environ.setdefault("ELASTICLUE_PUSH_PORT", "0")
+os.environ.setdefault("ELASTICLUE_SCENARIO_POOL_SIZE", "0")
+# Games are journaled as in production, but into a throwaway file.
+os.environ.setdefault("ELASTICLUE_JOURNAL", os.path.join(tempfile.mkdtemp(prefix="elasticlue-"), "games.sqlite"))
+
+
+class Results:
+    """Flat name -> {value, unit, better} map, as written to the JSON file."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="lower"):
+        self.metrics[name] = {"value": value, "unit": unit, "better": better}
+        print(f"  {name:<48} {value:12.3f} {unit}")
+
+
+def best_of(fn, number, repeat=5):
+    """Fastest of `repeat` runs, in microseconds per call."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = (time.perf_counter() - start) / number * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# ------------------------------------------------------------------------------
+# Micro-benchmarks
+# ------------------------------------------------------------------------------
+def run_micro(results, quick, seed):
+    from logic import generate_game_map, generate_tile_grid, is_valid_tile, map_cache, EntityIndex
+
+    def generate(width, height):
+        # A seeded map is cached after the first call; time building it.
+        map_cache.clear()
+        generate_game_map(6, width, height, seed=seed)
+
+    print("micro")
+    sizes = [(40, 15, 200), (200, 100, 20)] + ([] if quick else [(1000, 1000, 2)])
+    for width, height, number in sizes:
+        us = best_of(lambda: generate(width, height), number, repeat=3)
+        results.add(f"micro.generate_game_map.{width}x{height}", us, "us")
+
+    rng = random.Random(seed)
+    for width, height, _ in sizes:
+        game_map, _, _ = generate_game_map(6, width, height, seed=seed)
+        grid, _, _ = generate_tile_grid(6, width, height, seed=seed)
+        points = [(rng.randrange(-1, width + 1), rng.randrange(-1, height + 1)) for _ in range(1000)]
+
+        def probe(tiles):
+            for x, y in points:
+                is_valid_tile(tiles, x, y)
+
+        # best_of() gives us per 1000 probes, which is ns per probe.
+        results.add(f"micro.is_valid_tile.rows.{width}x{height}", best_of(lambda: probe(game_map), 20), "ns")
+        results.add(f"micro.is_valid_tile.grid.{width}x{height}", best_of(lambda: probe(grid), 20), "ns")
+
+    for count in (6, 1000) + (() if quick else (10000,)):
+        side = max(40, int((count * 12) ** 0.5))
+        cells = rng.sample(range(side * side), count * 3)
+        make = lambda cell: {"x": cell % side, "y": cell // side, "name": str(cell)}
+        index = EntityIndex([make(c) for c in cells[:count]],
+                            [make(c) for c in cells[count:2 * count]],
+                            [make(c) for c in cells[2 * count:]])
+        points = [(rng.randrange(side), rng.randrange(side)) for _ in range(1000)]
+
+        def lookups():
+            for x, y in points:
+                index.suspect_at(x, y)
+                index.weapon_at(x, y)
+                index.clue_at(x, y)
+
+        results.add(f"micro.find_at.{count}_entities", best_of(lookups, 20) * 1000 / 3000, "ns")
+
+    from simulate import POLICIES, build_layout, run_batch
+
+    layout = build_layout(6, 40, 15, seed=seed)
+    for policy in sorted(POLICIES):
+        stats = run_batch(layout, 5000 if quick else 20000, policy, workers=1)
+        results.add(f"micro.simulate.{policy}", stats["gamesPerSecond"], "games/s", better="higher")
+
+
+# ------------------------------------------------------------------------------
+# Load test
+# ------------------------------------------------------------------------------
+def run_load(results, players, iterations, moves, llm_latency, seed):
+    import logging
+    import openai
+    import requests
+    from werkzeug.serving import make_server
+
+    from openai_standin import start_standin
+    # The mansion is built when browser_frontend is imported.
+    os.environ.setdefault("ELASTICLUE_MAP_SEED", str(seed))
+    from browser_frontend import app
+    from logic import suspects_data
+
+    print(f"load ({players} players x {iterations} iterations, LLM latency {llm_latency * 1000:.0f} ms)")
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    standin, api_base = start_standin(first_token=llm_latency, token_interval=0.0, seed=seed)
+    openai.api_base = api_base
+    openai.api_key = "sk-bench"
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    base = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    latencies = {}
+    errors = [0]
+    lock = threading.Lock()
+
+    def timed(session, route, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = session.request(method, base + path, allow_redirects=False, timeout=60, **kwargs)
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.setdefault(route, []).append(elapsed)
+            if not ok:
+                errors[0] += 1
+
+    def player(n):
+        session = requests.Session()
+        suspect = suspects_data[n % len(suspects_data)]["name"]
+        timed(session, "/", "GET", "/")
+        session.get(base + "/api/walk_to", params={"target": suspect}, timeout=60)
+        for i in range(iterations):
+            timed(session, "/", "GET", "/")
+            for m in range(moves):
+                # Step off and back so the player ends each round next to the suspect.
+                timed(session, "/move", "GET", f"/move?dx={1 if m % 2 == 0 else -1}&dy=0")
+            timed(session, "/check_suspect", "GET", "/check_suspect")
+            timed(session, "/chat_ajax", "POST", "/chat_ajax", json={"user_msg": f"Where were you? ({i})"})
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=player, args=(n,)) for n in range(players)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    server.shutdown()
+    standin.shutdown()
+
+    total = sum(len(v) for v in latencies.values())
+    results.add("load.throughput", total / wall, "req/s", better="higher")
+    results.add("load.errors", errors[0], "requests")
+    for route, values in sorted(latencies.items()):
+        results.add(f"load.{route}.p50", percentile(values, 0.5), "ms")
+        results.add(f"load.{route}.p95", percentile(values, 0.95), "ms")
+        results.add(f"load.{route}.mean", statistics.fmean(values), "ms")
+
+
+# ------------------------------------------------------------------------------
+# Curses frames
+# ------------------------------------------------------------------------------
+def run_curses(results, moves, seed):
+    import bench_curses_render
+    from logic import generate_game_map
+
+    print("curses")
+    game_map, rooms, _ = generate_game_map(6, 40, 15, seed=seed)
+    stats = bench_curses_render.run(None, game_map, rooms, 50, 120, moves, use_renderer=True)
+    results.add("curses.first_frame_addstr", stats["first_frame_calls"], "calls")
+    results.add("curses.per_move_addstr", stats["per_move_calls"], "calls")
+    results.add("curses.per_move_bytes", stats["per_move_bytes"], "bytes")
+
+    screen = bench_curses_render.FakeScreen(50, 120)
+    renderer = bench_curses_render.MapRenderer(screen, game_map)
+    status = bench_curses_render.status_for([], "Use arrow keys to move.", 120)
+    positions = list(bench_curses_render.walk(game_map, 200))
+    renderer.fits()
+    renderer.render(renderer.entity_overlays(2, 2), status)
+    frame = iter(range(10 ** 9))
+
+    def render_frame():
+        x, y = positions[next(frame) % len(positions)]
+        renderer.render(renderer.entity_overlays(x, y), status)
+
+    results.add("curses.frame_time", best_of(render_frame, 200), "us")
+
+
+# ------------------------------------------------------------------------------
+# Baseline comparison
+# ------------------------------------------------------------------------------
+def compare(current, baseline, threshold):
+    """
+    Prints every metric present in both runs and returns the names of
+    those that got worse by more than threshold (a fraction).
+    """
+    regressions = []
+    print(f"\ncomparison against baseline (threshold {threshold:.0%})")
+    for name, metric in sorted(current.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        before, after = old["value"], metric["value"]
+        if before == 0:
+            change = 0.0 if after == 0 else float("inf")
+        else:
+            change = (after - before) / abs(before)
+        worse = change > threshold if metric["better"] == "lower" else change < -threshold
+        flag = "REGRESSION" if worse else ""
+        print(f"  {name:<48} {before:12.3f} -> {after:12.3f} {metric['unit']:<8} {change:+8.1%} {flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", default="micro,load,curses", help="comma-separated: micro, load, curses")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging")
+    parser.add_argument("--quick", action="store_true", help="skip the largest micro-benchmark sizes")
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--moves", type=int, default=4, help="/move requests per player iteration")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="OpenAI stand-in latency, seconds")
+    parser.add_argument("--curses-moves", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    parts = {p.strip() for p in args.parts.split(",") if p.strip()}
+    results = Results()
+    if "micro" in parts:
+        run_micro(results, args.quick, args.seed)
+    if "load" in parts:
+        run_load(results, args.players, args.iterations, args.moves, args.llm_latency, args.seed)
+    if "curses" in parts:
+        run_curses(results, args.curses_moves, args.seed)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "metrics": results.metrics,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nwrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["metrics"]
+        regressions = compare(results.metrics, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
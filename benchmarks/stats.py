@@ -0,0 +1,9 @@
+def percentile(values, p):
+    """
+    The value at fraction p (0..1) of values once sorted, nearest rank;
+    nan if there are none.
+    """
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
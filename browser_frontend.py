@@ -1,75 +1,315 @@
+import atexit
+import os
 import random
-import json
-from flask import Flask, request, render_template_string, redirect, url_for, jsonify
+from functools import partial
+from flask import Flask, Response, request, render_template, redirect, url_for, jsonify, abort, g
 import sys
-import openai
 
 from logic import (
     PLAYER_CHAR, CLUE_CHAR, FLOOR_CHAR, WALL_CHAR, DOOR_CHAR,
-    victim_data, suspects_data, weapons_data, clues_data,
-    murder_story, cryptic_intro, chat_history,
-    generate_story_clues_and_intro, generate_game_map,
-    is_valid_tile, find_suspect_at, find_weapon_at, find_clue_at,
-    POSSIBLE_ROOM_NAMES
+    victim_data,
+    generate_tile_grid, place_entities,
+    find_suspect_at
 )
+from game_state import GameState, SessionStore
+from journal import GameJournal
+from navigation import Navigator
+from assets import StaticAssets, choose_encoding, compress, is_compressible, MIN_COMPRESS_SIZE
+from scenario_pool import ScenarioPool
+from push import PushHub
+from prefetch import GreetingPrefetcher
+from prompts import suspect_system_prompt, ledger, BUDGET_TEXT
+import llm
+import telemetry
+from llm import chat_completion, astream_chat, MissingAPIKey, LLMUnavailable, NO_KEY_TEXT, FALLBACK_TEXT
+
+# Static files are served by static_asset() below, from memory.
+app = Flask(__name__, static_folder=None)
+# Registered first so the request span covers the other hooks too.
+telemetry.instrument_flask(app)
+
+SESSION_COOKIE = "elasticlue_session"
+
+# Map/entity characters the canvas client draws with.
+TILES = {
+    "wall": WALL_CHAR,
+    "door": DOOR_CHAR,
+    "floor": FLOOR_CHAR,
+    "clue": CLUE_CHAR,
+    "player": PLAYER_CHAR,
+}
+
+# CSS/JS, read and compressed once; URLs carry a content hash.
+static_assets = StaticAssets(os.path.join(app.root_path, "static"))
+
+_asset_urls = {}
+
+def asset_url(filename):
+    """
+    Versioned URL for a static file, built once per file version.
+    """
+    version = static_assets.version(filename)
+    url = _asset_urls.get((filename, version))
+    if url is None:
+        url = _asset_urls[(filename, version)] = url_for("static", filename=filename, v=version)
+    return url
 
-app = Flask(__name__)
+app.jinja_env.globals["asset_url"] = asset_url
+
+# Compile every page template now rather than on its first request.
+for template_name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template_name)
 
 # ------------------------------------------------------------------------------
 # Slightly bigger map + tile size for better room display
 # ------------------------------------------------------------------------------
-player_x, player_y = 2, 2
-inventory = []
-collected_clues = []
-
-murderer = random.choice(suspects_data)
-murder_weapon = random.choice(weapons_data)
-
 num_rooms = 6
 overall_width = 40
 overall_height = 15
-game_map, rooms, selected_room_names = generate_game_map(num_rooms, overall_width, overall_height)
+
+def _open_journal():
+    """
+    Event log + snapshots that let games survive a restart.
+    ELASTICLUE_JOURNAL sets the SQLite path ("off" disables it).
+    ELASTICLUE_JOURNAL_MAX_AGE_DAYS drops games left unplayed that long
+    (0 keeps them forever).
+    """
+    path = os.getenv("ELASTICLUE_JOURNAL", os.path.join(app.root_path, ".elasticlue_games.sqlite"))
+    if path.lower() == "off":
+        return None
+    max_age_days = float(os.getenv("ELASTICLUE_JOURNAL_MAX_AGE_DAYS", "7"))
+    opened = GameJournal(path, max_age=max_age_days * 24 * 3600 if max_age_days > 0 else None)
+    atexit.register(opened.close)
+    return opened
+
+journal = _open_journal()
+# Snapshot a game after this many journaled events.
+SNAPSHOT_EVERY = int(os.getenv("ELASTICLUE_SNAPSHOT_EVERY", "100"))
+
+# Set ELASTICLUE_MAP_SEED to play the same mansion every time. Otherwise a
+# seed is drawn once and kept in the journal, so saved games come back on
+# the map they were played on.
+map_seed = os.getenv("ELASTICLUE_MAP_SEED")
+map_params = [num_rooms, overall_width, overall_height]
+if map_seed:
+    map_seed = int(map_seed)
+else:
+    saved_map = journal.get_meta("map") if journal else None
+    if saved_map and saved_map["params"] == map_params:
+        map_seed = saved_map["seed"]
+    else:
+        map_seed = random.getrandbits(32)
+        if journal:
+            journal.set_meta("map", {"seed": map_seed, "params": map_params})
+map_grid, rooms, selected_room_names = generate_tile_grid(
+    num_rooms, overall_width, overall_height, seed=map_seed,
+)
+map_key = [map_seed] + map_params
+# Row strings for the canvas client; movement checks use the compact grid.
+game_map = map_grid.to_strings()
 
 # Distribute suspects, weapons, clues among rooms
-for i, (suspect, weapon, clue) in enumerate(zip(suspects_data, weapons_data, clues_data)):
-    if i < len(rooms):
-        rm = rooms[i]
-        suspect["x"] = rm['x1'] + 2
-        suspect["y"] = rm['center_y']
-        weapon["x"] = rm['x2'] - 2
-        weapon["y"] = rm['center_y']
-        clue["x"] = rm['center_x']
-        clue["y"] = rm['y1'] + 1
-
-new_story, new_intro, new_clues = generate_story_clues_and_intro(
-    murderer["name"],
-    murder_weapon["name"],
-    selected_room_names
+place_entities(rooms)
+
+# Distance fields for /api/walk_to, shared by every game on this map.
+navigator = Navigator(map_grid)
+
+# Server-Sent Events channel, served from its own asyncio thread and port.
+push_hub = PushHub(
+    host=os.getenv("ELASTICLUE_PUSH_HOST", "127.0.0.1"),
+    port=int(os.getenv("ELASTICLUE_PUSH_PORT", "5002")),
 )
 
-# At the top, add/modify a global variable to store the current game message
-game_message = "Welcome to the mansion! Search for clues—and do be careful…"
+def push_event(state, event, data):
+    push_hub.publish(state.push_token, event, data)
 
-@app.route("/")
-def index():
+# Ready-made scenarios (murderer, weapon, story, clues), refilled in the
+# background so starting a game never waits on the LLM.
+scenario_pool = ScenarioPool(
+    selected_room_names,
+    size=int(os.getenv("ELASTICLUE_SCENARIO_POOL_SIZE", "8")),
+    low_water=int(os.getenv("ELASTICLUE_SCENARIO_POOL_LOW_WATER", "3")),
+)
+
+# Suspects' opening lines, generated while the player is still walking
+# over to them. ELASTICLUE_PREFETCH_RADIUS=0 turns it off.
+greetings = GreetingPrefetcher(
+    radius=int(os.getenv("ELASTICLUE_PREFETCH_RADIUS", "4")),
+    waste_per_minute=float(os.getenv("ELASTICLUE_PREFETCH_WASTE_PER_MINUTE", "1")),
+    waste_burst=int(os.getenv("ELASTICLUE_PREFETCH_WASTE_BURST", "3")),
+)
+
+def speculate(state, previous):
     """
-    Renders the main canvas page.
-    Now includes an invisible chat overlay that we toggle with the 'C' key.
-    Also includes a server message at the top, which can update dynamically.
+    Lets the greeting prefetcher see a move from previous, for suspects the
+    player hasn't talked to yet. Not called on replay. Caller must hold state.lock.
+    """
+    if not greetings.enabled:
+        return
+    suspects = [s for s in state.suspects if not state.chat_history.get(s["name"])]
+    greetings.observe(state.session_id, previous, (state.player_x, state.player_y),
+                      suspects, state.murderer["name"])
+
+def load_game(session_id):
+    """
+    Rebuilds a game from the journal: its last snapshot plus the events
+    recorded since, replayed through the same functions that handled them.
+    None if it was never saved or was played on a different map.
+    """
+    saved = journal.load(session_id) if journal else None
+    if saved is None:
+        return None
+    snapshot, events = saved
+    if snapshot.get("map") != map_key:
+        return None
+    state = GameState.from_snapshot(snapshot, map_grid, rooms, selected_room_names, navigator)
+    with state.lock:
+        for seq, kind, data in events:
+            replay_event(state, kind, data)
+            state.journal_seq = seq
+    return state
+
+# One GameState per browser session, each with its own murderer and story.
+sessions = SessionStore(
+    lambda: GameState(map_grid, rooms, selected_room_names, scenario_pool.take(), navigator),
+    loader=load_game,
+    # Greetings prefetched for a game nobody is playing would only be wasted.
+    on_evict=greetings.forget,
+)
+
+def save_snapshot(state):
+    """
+    Caller must hold state.lock.
+    """
+    data = state.snapshot()
+    data["map"] = map_key
+    state.snapshot_seq = state.journal_seq
+    journal.snapshot(state.session_id, state.journal_seq, data)
+
+def persist(state, kind, data):
+    """
+    Journals one state change (replay_event() re-applies it), with a
+    fresh snapshot every SNAPSHOT_EVERY events. Only queues the write.
+    Caller must hold state.lock.
+    """
+    if journal is None or state.session_id is None:
+        return
+    state.journal_seq += 1
+    journal.record(state.session_id, state.journal_seq, kind, data)
+    if state.journal_seq - state.snapshot_seq >= SNAPSHOT_EVERY:
+        save_snapshot(state)
+
+def replay_event(state, kind, data):
+    """
+    Re-applies a journaled event. Caller must hold state.lock.
+    """
+    if kind == "move":
+        apply_move(state, data["dx"], data["dy"])
+    elif kind == "inputs":
+        apply_inputs(state, data["inputs"])
+    elif kind == "walk":
+        apply_walk(state, data["target"])
+    elif kind == "accuse":
+        state.step(("accuse", data["suspect"], data["weapon"]))
+    elif kind == "chat":
+        add_chat_message(state, data["suspect"], data["role"], data["content"], replaying=True)
+
+def current_game():
+    """
+    Resolves the GameState for this request's session cookie,
+    starting a new game if the cookie is missing or expired.
+    """
+    if "game" not in g:
+        cookie_id = request.cookies.get(SESSION_COOKIE)
+        session_id, state = sessions.get_or_create(cookie_id)
+        if session_id != cookie_id:
+            g.new_session_id = session_id
+            if journal is not None:
+                # The story and clues came from the LLM: save them right away.
+                with state.lock:
+                    save_snapshot(state)
+        g.game = state
+    return g.game
+
+@app.after_request
+def set_session_cookie(response):
+    new_session_id = g.pop("new_session_id", None)
+    if new_session_id:
+        response.set_cookie(SESSION_COOKIE, new_session_id, httponly=True, samesite="Lax")
+    return response
+
+@app.after_request
+def compress_response(response):
+    """
+    Gzips (or brotli-compresses) generated pages and JSON big enough to
+    benefit. Static assets arrive here already compressed.
     """
-    # Make sure we use the global message here
-    global game_message
+    if (response.direct_passthrough or "Content-Encoding" in response.headers
+            or response.status_code != 200 or not is_compressible(response.mimetype)):
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+    coding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if coding is None:
+        return response
+    response.set_data(compress(body, coding, level=5 if coding == "br" else 6))
+    response.headers["Content-Encoding"] = coding
+    response.vary.add("Accept-Encoding")
+    return response
+
+@app.route("/static/<path:filename>", endpoint="static")
+def static_asset(filename):
+    """
+    Serves a file from static/ with an ETag, long-lived caching for
+    versioned URLs, and a precompressed body when the client accepts one.
+    """
+    asset = static_assets.get(filename)
+    if asset is None:
+        abort(404)
+    coding = choose_encoding(request.headers.get("Accept-Encoding"), asset.encoded)
+    response = Response(asset.encoded[coding] if coding else asset.body, mimetype=asset.mimetype)
+    if coding:
+        response.headers["Content-Encoding"] = coding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(asset.etag(coding))
+    if request.args.get("v") == asset.version:
+        response.headers["Cache-Control"] = StaticAssets.IMMUTABLE
+    else:
+        response.headers["Cache-Control"] = StaticAssets.REVALIDATE
+    return response.make_conditional(request)
+
+@app.before_request
+def start_background_services():
+    """
+    Starts the push hub and scenario pool on first use, so that only the
+    process actually serving requests runs them (not the debug reloader's
+    parent). Both calls are no-ops once running.
+    """
+    scenario_pool.start()
+    if not push_hub.running:
+        try:
+            push_hub.start()
+        except OSError as e:
+            app.logger.warning("Push channel disabled: %s", e)
 
-    game_data = {
-        "intro": new_intro,
-        "message": game_message,  # <--- Use the global message
+def build_game_data(state):
+    """
+    Serializes the parts of a GameState the canvas client needs.
+    """
+    return {
+        "intro": state.intro,
+        "message": state.game_message,
         "mapWidth": overall_width,
         "mapHeight": overall_height,
-        "player": {"x": player_x, "y": player_y},
+        "player": {"x": state.player_x, "y": state.player_y},
+        "seq": state.seq,
+        "inputSeq": state.input_seq,
+        "push": {"port": push_hub.port, "token": state.push_token} if push_hub.running else None,
         "victim": {"x": victim_data["x"], "y": victim_data["y"], "emoji": victim_data["emoji"]},
         "suspects": [
             {"x": s["x"], "y": s["y"], "emoji": s["emoji"], "name": s["name"]}
-            for s in suspects_data
+            for s in state.suspects
         ],
         "weapons": [
             {
@@ -79,446 +319,494 @@ def index():
                 "name": w["name"],
                 "collected": w.get("collected", False)
             }
-            for w in weapons_data
+            for w in state.weapons
         ],
         "clues": [
             {"x": c["x"], "y": c["y"], "found": c.get("found", False)}
-            for c in clues_data
+            for c in state.clues
         ],
         "gameMap": game_map
     }
-    game_data_json = json.dumps(game_data)
-    
-    # Inline JS/HTML for the basic page + canvas + chat overlay
-    html_content = f"""
-    <html>
-      <head>
-        <title>Clue Game - Canvas Version</title>
-        <style>
-          body {{
-            font-family: Arial, sans-serif;
-          }}
-          #gameCanvas {{
-            border: 2px solid #000;
-            background-color: #eee;
-          }}
-          /* Basic overlay styling for chat */
-          #chatOverlay {{
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0,0,0,0.5);
-            display: none; /* hidden by default */
-            justify-content: center;
-            align-items: center;
-          }}
-          .chat-box {{
-            background: #fff;
-            padding: 20px;
-            width: 400px;
-            border-radius: 8px;
-          }}
-          .chat-log {{
-            height: 200px;
-            overflow-y: auto;
-            border: 1px solid #ccc;
-            padding: 5px;
-            margin-bottom: 10px;
-          }}
-        </style>
-      </head>
-      <body>
-        <h1>Clue Game (Canvas)</h1>Intro: {new_intro}
-
-           <p>Use Arrow keys to move. Press 'C' to chat with suspect.</p>
-
-        <p>
-          <a href="/clues">View Collected Clues</a> |
-          <a href="/accuse">Accuse a Suspect</a> |
-          <a href="/story">Full Story</a> |
-          <a href="/quit">Quit</a>
-        </p>     
-
-        <!-- Display the dynamic server message -->
-        <p><strong>Message:</strong> {game_data["message"]}</p>
-
-        <canvas id="gameCanvas"></canvas>
-
-
-        <!-- Chat overlay -->
-        <div id="chatOverlay">
-          <div class="chat-box">
-            <!-- A title that shows who we're chatting with -->
-            <h2 id="chatTitle"></h2>
-            <div class="chat-log" id="chatLog"></div>
-            <form id="chatForm">
-              <input type="text" id="chatInput" placeholder="Say something..." size="40"/>
-              <button type="submit">Send</button>
-            </form>
-            <button type="button" onclick="hideChat()">Close</button>
-          </div>
-        </div>
-
-        <script>
-          var gameData = {game_data_json};
-          var TILE_SIZE = 32;
-          var mapWidth = gameData.mapWidth;
-          var mapHeight = gameData.mapHeight;
-
-          // Set up canvas
-          var canvas = document.getElementById("gameCanvas");
-          canvas.width = mapWidth * TILE_SIZE;
-          canvas.height = mapHeight * TILE_SIZE;
-          var ctx = canvas.getContext("2d");
-          ctx.font = "16px sans-serif";
-
-          function drawTile(tile, x, y) {{
-            if (tile === "{WALL_CHAR}") {{
-              ctx.fillStyle = "darkgray";
-              ctx.fillRect(x, y, TILE_SIZE, TILE_SIZE);
-            }} else if (tile === "{DOOR_CHAR}") {{
-              ctx.fillStyle = "brown";
-              ctx.fillRect(x, y, TILE_SIZE, TILE_SIZE);
-            }} else if (tile === "{FLOOR_CHAR}") {{
-              ctx.fillStyle = "lightgray";
-              ctx.fillRect(x, y, TILE_SIZE, TILE_SIZE);
-            }} else {{
-              // For room letters
-              ctx.fillStyle = "white";
-              ctx.fillRect(x, y, TILE_SIZE, TILE_SIZE);
-              ctx.fillStyle = "black";
-              ctx.fillText(tile, x + 8, y + 20);
-            }}
-          }}
-
-          function drawEverything() {{
-            ctx.clearRect(0, 0, canvas.width, canvas.height);
-            var mapData = gameData.gameMap;
-            for (var row = 0; row < mapHeight; row++) {{
-              for (var col = 0; col < mapWidth; col++) {{
-                drawTile(mapData[row][col], col * TILE_SIZE, row * TILE_SIZE);
-              }}
-            }}
-
-            // Victim
-            ctx.fillStyle = "red";
-            ctx.fillText(gameData.victim.emoji,
-                         gameData.victim.x * TILE_SIZE + 8,
-                         gameData.victim.y * TILE_SIZE - 10);
-
-            // Suspects
-            for (var i = 0; i < gameData.suspects.length; i++) {{
-              var s = gameData.suspects[i];
-              ctx.fillStyle = "blue";
-              ctx.fillText(s.emoji,
-                           s.x * TILE_SIZE + 8,
-                           s.y * TILE_SIZE + 20);
-            }}
-
-            // Weapons
-            for (var i = 0; i < gameData.weapons.length; i++) {{
-              var w = gameData.weapons[i];
-              if (!w.collected) {{
-                ctx.fillStyle = "green";
-                ctx.fillText(w.emoji,
-                             w.x * TILE_SIZE + 8,
-                             w.y * TILE_SIZE + 20);
-              }}
-            }}
-
-            // Clues
-            for (var i = 0; i < gameData.clues.length; i++) {{
-              var c = gameData.clues[i];
-              if (!c.found) {{
-                ctx.fillStyle = "purple";
-                ctx.fillText("{CLUE_CHAR}",
-                             c.x * TILE_SIZE + 8,
-                             c.y * TILE_SIZE + 20);
-              }}
-            }}
-
-            // Player
-            ctx.fillStyle = "black";
-            ctx.fillText("{PLAYER_CHAR}",
-                         gameData.player.x * TILE_SIZE + 8,
-                         gameData.player.y * TILE_SIZE + 20);
-          }}
-
-          drawEverything();
-
-          // Movement + Chat
-          window.addEventListener("keydown", function(e) {{
-            var key = e.key;
-            if (key === "ArrowLeft") {{
-              window.location = "/move?dx=-1&dy=0";
-            }} else if (key === "ArrowRight") {{
-              window.location = "/move?dx=1&dy=0";
-            }} else if (key === "ArrowUp") {{
-              window.location = "/move?dx=0&dy=-1";
-            }} else if (key === "ArrowDown") {{
-              window.location = "/move?dx=0&dy=1";
-            }} else if (key === "c" || key === "C") {{
-              e.preventDefault();
-              openChatIfSuspect();
-            }}
-          }});
-
-          function openChatIfSuspect() {{
-            fetch("/check_suspect")
-              .then(resp => resp.json())
-              .then(data => {{
-                if (data.hasSuspect) {{
-                  showChat(data.suspectName, data.chatHtml);
-                }} else {{
-                  alert("No suspect here to chat with!");
-                }}
-              }});
-          }}
-
-          // show/hide chat overlay
-          function showChat(suspectName, chatHtml) {{
-            document.getElementById("chatTitle").textContent = "Chat with " + suspectName;
-            document.getElementById("chatLog").innerHTML = chatHtml;
-            document.getElementById("chatOverlay").style.display = "flex";
-          }}
-          function hideChat() {{
-            document.getElementById("chatOverlay").style.display = "none";
-          }}
-
-          // handle chat form submission via AJAX
-          var chatForm = document.getElementById("chatForm");
-          chatForm.addEventListener("submit", function(e) {{
-            e.preventDefault();
-            var userMsg = document.getElementById("chatInput").value.trim();
-            if (!userMsg) return;
-            fetch("/chat_ajax", {{
-              method: "POST",
-              headers: {{
-                "Content-Type": "application/json"
-              }},
-              body: JSON.stringify({{user_msg: userMsg}})
-            }})
-            .then(resp => resp.json())
-            .then(data => {{
-              document.getElementById("chatLog").innerHTML = data.chatHtml;
-              document.getElementById("chatInput").value = "";
-            }});
-          }});
-        </script>
-      </body>
-    </html>
-    """
-    return html_content
+
+@app.route("/")
+def index():
+    """
+    Renders the main canvas page.
+    Now includes an invisible chat overlay that we toggle with the 'C' key.
+    Also includes a server message at the top, which can update dynamically.
+    """
+    state = current_game()
+    with state.lock:
+        game_data = build_game_data(state)
+    return render_template("index.html", game=game_data, tiles=TILES)
+
+def move_delta(state, event):
+    """
+    Turns one GameEngine move event into the JSON-ready delta the client
+    applies, updating the session's message and seq. Caller must hold state.lock.
+    """
+    delta = {"moved": event["moved"], "weapon": None, "clue": None}
+    if event["moved"]:
+        from_x, from_y = event["from"]
+        delta["from"] = {"x": from_x, "y": from_y}
+        telemetry.count("moves")
+    x, y = event["player"]
+    w_item = event["weapon"]
+    if w_item:
+        telemetry.count("pickups", attributes={"kind": "weapon"})
+        state.game_message = f"You picked up {w_item['name']}!"
+        delta["weapon"] = {"name": w_item["name"], "x": x, "y": y}
+    clue_item = event["clue"]
+    if clue_item:
+        telemetry.count("pickups", attributes={"kind": "clue"})
+        state.game_message = f"You found a clue: '{clue_item['text']}'"
+        delta["clue"] = {"text": clue_item["text"], "x": x, "y": y}
+
+    delta["player"] = {"x": x, "y": y}
+    delta["message"] = state.game_message
+    state.seq += 1
+    delta["seq"] = state.seq
+    return delta
+
+def apply_move(state, dx, dy):
+    """
+    Moves the player one step (if the tile is walkable), applies any
+    weapon/clue pickup, and returns a JSON-ready delta of what changed.
+    Caller must hold state.lock.
+    """
+    return move_delta(state, state.step(("move", dx, dy)))
+
+def parse_move(args):
+    """
+    The (dx, dy) of a /move or /api/move query, each clamped to one tile
+    like parse_inputs does. Returns None if either isn't an integer or
+    both are 0.
+    """
+    try:
+        dx = int(args.get("dx", 0))
+        dy = int(args.get("dy", 0))
+    except ValueError:
+        return None
+    if not (dx or dy):
+        return None
+    return max(-1, min(1, dx)), max(-1, min(1, dy))
+
+BAD_MOVE = "Expected integer dx and dy, not both 0."
 
 @app.route("/move")
 def move_player():
     """
-    Moves the player and updates the global message
+    Moves the player and updates the session's message
     when picking up weapons or clues.
+    Kept for non-JS clients; the canvas page uses /api/move.
     """
-    global player_x, player_y, game_message
-
-    dx = int(request.args.get("dx", 0))
-    dy = int(request.args.get("dy", 0))
-    new_x = player_x + dx
-    new_y = player_y + dy
+    move = parse_move(request.args)
+    if move is None:
+        return BAD_MOVE, 400
+    dx, dy = move
+    state = current_game()
+    with state.lock:
+        previous = (state.player_x, state.player_y)
+        delta = apply_move(state, dx, dy)
+        persist(state, "move", {"dx": dx, "dy": dy})
+        speculate(state, previous)
+    push_event(state, "move", delta)
+    return redirect(url_for("index"))
 
-    if is_valid_tile(game_map, new_x, new_y):
-        player_x, player_y = new_x, new_y
+@app.route("/api/move")
+def api_move():
+    """
+    Same as /move, but returns only the JSON delta instead of redirecting
+    to a full page render.
+    """
+    move = parse_move(request.args)
+    if move is None:
+        return jsonify({"error": BAD_MOVE}), 400
+    dx, dy = move
+    state = current_game()
+    with state.lock:
+        previous = (state.player_x, state.player_y)
+        delta = apply_move(state, dx, dy)
+        persist(state, "move", {"dx": dx, "dy": dy})
+        speculate(state, previous)
+    push_event(state, "move", delta)
+    return jsonify(delta)
+
+MAX_INPUT_BATCH = 256
+
+def apply_inputs(state, inputs):
+    """
+    Applies a batch of buffered moves in input-number order, with the same
+    rules as apply_move. Inputs at or below state.input_seq were applied
+    by an earlier (retried) batch and are skipped. Returns the deltas of
+    the moves applied. Caller must hold state.lock.
+    """
+    steps = []
+    for item in sorted(inputs, key=lambda item: item["n"]):
+        if item["n"] <= state.input_seq:
+            continue
+        state.input_seq = item["n"]
+        steps.append(apply_move(state, item["dx"], item["dy"]))
+    return steps
+
+def json_int(value):
+    """
+    value if it is a JSON integer; raises ValueError for anything else,
+    floats and booleans included.
+    """
+    if type(value) is not int:
+        raise ValueError(f"not an integer: {value!r}")
+    return value
 
-        w_item = find_weapon_at(player_x, player_y)
-        if w_item and not w_item.get("collected", False):
-            w_item["collected"] = True
-            inventory.append(w_item["name"])
-            # Update the message
-            game_message = f"You picked up {w_item['name']}!"
+def parse_inputs(data):
+    """
+    Validates an /api/inputs body: {"inputs": [{"n": 1, "dx": -1, "dy": 0}, ...]}.
+    Every value must be an integer. Steps are clamped to one tile.
+    Returns None if the body is malformed.
+    """
+    inputs = data.get("inputs") if isinstance(data, dict) else None
+    if not isinstance(inputs, list) or len(inputs) > MAX_INPUT_BATCH:
+        return None
+    parsed = []
+    for item in inputs:
+        try:
+            parsed.append({
+                "n": json_int(item["n"]),
+                "dx": max(-1, min(1, json_int(item.get("dx", 0)))),
+                "dy": max(-1, min(1, json_int(item.get("dy", 0)))),
+            })
+        except (KeyError, TypeError, ValueError, AttributeError, OverflowError):
+            return None
+    return parsed
+
+@app.route("/api/inputs", methods=["POST"])
+def api_inputs():
+    """
+    Batched movement: the client buffers keypresses, numbers them, and
+    sends whatever has queued up while its previous batch was in flight.
+    Returns {"steps": [move deltas], "inputSeq": last applied input}.
+    """
+    inputs = parse_inputs(request.get_json(silent=True))
+    if inputs is None:
+        return jsonify({"error": f"Expected {{\"inputs\": [...]}} with at most {MAX_INPUT_BATCH} moves."}), 400
+    state = current_game()
+    with state.lock:
+        previous = (state.player_x, state.player_y)
+        steps = apply_inputs(state, inputs)
+        if steps:
+            persist(state, "inputs", {"inputs": inputs})
+            speculate(state, previous)
+        data = {"steps": steps, "inputSeq": state.input_seq}
+    if steps:
+        push_event(state, "walk", {"steps": steps})
+    return jsonify(data)
+
+def apply_walk(state, target):
+    """
+    Walks the player along the shortest path to target (see
+    navigation.resolve_target), applying every pickup on the way.
+    Returns the per-step deltas, or None if the target is unknown or
+    unreachable. Caller must hold state.lock.
+    """
+    event = state.step(("walk", target))
+    if event["path"] is None:
+        return None
+    found = {i: (weapon, clue) for i, weapon, clue in event["pickups"]}
+    steps = []
+    previous = event["from"]
+    for i, tile in enumerate(event["path"]):
+        weapon, clue = found.get(i, (None, None))
+        steps.append(move_delta(state, {"moved": True, "from": previous, "player": tile,
+                                        "weapon": weapon, "clue": clue}))
+        previous = tile
+    return steps
+
+@app.route("/api/walk_to")
+def api_walk_to():
+    """
+    Walks to a suspect, weapon, the nearest clue or the x,y tile of one
+    of those in one request. Returns {"steps": [move deltas]}, which the
+    client applies like the /api/move deltas.
+    """
+    state = current_game()
+    target = request.args.get("target", "")
+    with state.lock:
+        previous = (state.player_x, state.player_y)
+        steps = apply_walk(state, target)
+        if steps is not None:
+            persist(state, "walk", {"target": target})
+            speculate(state, previous)
+    if steps is None:
+        return jsonify({"error": f"No way to reach {target!r} from here."}), 404
+    data = {"steps": steps}
+    push_event(state, "walk", data)
+    return jsonify(data)
+
+def chat_update(history, after_id):
+    """
+    The messages of a conversation after after_id, for the client to
+    append, and the id to ask from next time. Caller must hold state.lock.
+    """
+    if history is None:
+        return {"messages": [], "lastId": 0}
+    return {"messages": history.messages_after(after_id), "lastId": history.last_id}
 
-        clue_item = find_clue_at(player_x, player_y)
-        if clue_item and not clue_item.get("found", False):
-            clue_item["found"] = True
-            collected_clues.append(clue_item["text"])
-            # Update the message
-            game_message = f"You found a clue: '{clue_item['text']}'"
+def parse_after(value):
+    try:
+        return max(0, int(value or 0))
+    except (TypeError, ValueError):
+        return 0
 
-    return redirect(url_for("index"))
+def parse_seen(values):
+    """
+    The client's last message id per suspect, from "Name:id" query values.
+    """
+    seen = {}
+    for value in values:
+        name, _, message_id = value.rpartition(":")
+        seen[name] = parse_after(message_id)
+    return seen
 
 @app.route("/check_suspect")
 def check_suspect():
     """
     Returns JSON saying if we have a suspect at player location.
-    If so, also returns the suspect name and current chat message HTML.
+    If so, also returns the suspect name and the chat messages the client
+    doesn't have yet: it passes seen=Name:id for each conversation it
+    holds, and gets only the messages after that id.
+    A first chat opens with the suspect's greeting if it was prefetched.
+    """
+    state = current_game()
+    with state.lock:
+        suspect_here = find_suspect_at(state.player_x, state.player_y, state.entities)
+        if not suspect_here:
+            return jsonify({"hasSuspect": False})
+        suspect_name = suspect_here["name"]
+        is_murderer = (suspect_name == state.murderer["name"])
+        opening = not state.chat_history.get(suspect_name)
+
+    # Outside the lock: take() may wait for a greeting still in flight.
+    greeting = greetings.take(state.session_id, suspect_name, is_murderer) if opening else None
+
+    with state.lock:
+        if greeting and not state.chat_history.get(suspect_name):
+            add_chat_message(state, suspect_name, "assistant", greeting)
+        after_id = parse_seen(request.args.getlist("seen")).get(suspect_name, 0)
+        update = chat_update(state.chat_history.get(suspect_name), after_id)
+
+    return jsonify({"hasSuspect": True, "suspectName": suspect_name, **update})
+
+@app.route("/api/chat_messages")
+def api_chat_messages():
+    """
+    A suspect's chat messages after ?after=<id> (all of them by default):
+    {"suspect", "messages": [{"id", "role", "content"}], "lastId"}.
+    ?suspect= picks the conversation, else the suspect the player is on.
     """
-    suspect_here = find_suspect_at(player_x, player_y)
+    state = current_game()
+    after_id = parse_after(request.args.get("after"))
+    with state.lock:
+        suspect_name = request.args.get("suspect")
+        if not suspect_name:
+            suspect_here = find_suspect_at(state.player_x, state.player_y, state.entities)
+            if not suspect_here:
+                return jsonify({"error": "No suspect here."}), 404
+            suspect_name = suspect_here["name"]
+        update = chat_update(state.chat_history.get(suspect_name), after_id)
+    return jsonify({"suspect": suspect_name, **update})
+
+def add_chat_message(state, suspect_name, role, content, replaying=False):
+    """
+    Appends a message to a suspect's conversation and journals it.
+    Returns that suspect's ChatContext. Caller must hold state.lock.
+    """
+    history = state.chat_history[suspect_name]
+    history.append(role, content)
+    if role == "assistant":
+        state.chat_history.enforce_cap()
+    if not replaying:
+        persist(state, "chat", {"suspect": suspect_name, "role": role, "content": content})
+    return history
+
+def start_chat_turn(state, user_msg):
+    """
+    Records the player's message for the suspect at their position and
+    returns (suspect_name, history, msgs) for the LLM call, or None if
+    nobody is standing there. The prompt is bounded by the suspect's
+    ChatContext rather than growing with the whole history, and msgs is
+    None if the session or suspect is out of tokens (see prompts.ledger).
+    Caller must hold state.lock.
+    """
+    suspect_here = find_suspect_at(state.player_x, state.player_y, state.entities)
     if not suspect_here:
-        return jsonify({"hasSuspect": False})
+        return None
+
     suspect_name = suspect_here["name"]
-    
-    # Build the existing chat log
-    # If no chat for them yet, it's blank
-    history_txt = []
-    if suspect_name in chat_history:
-        for entry in chat_history[suspect_name]:
-            speaker = entry['role'].capitalize()
-            content = entry['content']
-            history_txt.append(f"<b>{speaker}:</b> {content}")
-    joined_history = "<br>".join(history_txt)
-    
-    return jsonify({
-        "hasSuspect": True,
-        "suspectName": suspect_name,
-        "chatHtml": joined_history
-    })
+    history = state.chat_history[suspect_name]
+    if user_msg:
+        add_chat_message(state, suspect_name, "user", user_msg)
+    is_murderer = (suspect_name == state.murderer["name"])
+
+    msgs = history.build_messages(suspect_system_prompt(suspect_name, is_murderer))
+    if not ledger.allow(state.session_id, suspect_name, msgs):
+        msgs = None
+    return suspect_name, history, msgs
 
 @app.route("/chat_ajax", methods=["POST"])
 def chat_ajax():
     """
     Receives a user_msg for the suspect at the current player position,
-    does the normal ChatGPT logic, then returns fresh HTML for the chat log.
+    does the normal ChatGPT logic, then returns the chat messages after
+    the request's "after" id (the player's message and the reply).
+    Used by clients without the push channel; see /api/chat.
     """
+    state = current_game()
     data = request.json
     user_msg = data.get("user_msg", "").strip()
-    suspect_here = find_suspect_at(player_x, player_y)
-    if not suspect_here:
-        return jsonify({"chatHtml": "(No suspect here!)"})
-
-    suspect_name = suspect_here["name"]
-    if suspect_name not in chat_history:
-        chat_history[suspect_name] = []
-    if user_msg:
-        chat_history[suspect_name].append({"role": "user", "content": user_msg})
-
-    is_murderer = (suspect_name == murderer["name"])
-    system_message = (
-        f"You are {suspect_name}, a Clue-like murder suspect.\n"
-        "Mr. Boddy has been found murdered.\n"
-    )
-    if is_murderer:
-        system_message += "Secretly, you DO know you are the murderer. Respond in character but don't be too obvious.\n"
+    after_id = parse_after(data.get("after"))
+
+    with state.lock:
+        turn = start_chat_turn(state, user_msg)
+    if turn is None:
+        return jsonify({"error": "No suspect here!", "messages": [], "lastId": after_id})
+    suspect_name, history, msgs = turn
+
+    # Don't hold the session lock across the (slow) OpenAI round trip.
+    try:
+        if msgs is None:
+            ai_text = BUDGET_TEXT
+        else:
+            ai_text = chat_completion(msgs, session=state.session_id,
+                                      charge=partial(ledger.record, state.session_id, suspect_name, msgs))
+    except MissingAPIKey:
+        ai_text = NO_KEY_TEXT
+    except LLMUnavailable:
+        ai_text = FALLBACK_TEXT
+    except Exception as e:
+        ai_text = f"(OpenAI error: {e})"
+
+    with state.lock:
+        add_chat_message(state, suspect_name, "assistant", ai_text)
+        update = chat_update(history, after_id)
+
+    return jsonify(update)
+
+async def stream_chat_reply(state, suspect_name, history, msgs):
+    """
+    Runs on the push hub's event loop: streams the suspect's reply to the
+    browser as chat_token events, then stores it and sends chat_done
+    with the stored message.
+    """
+    if msgs is None:
+        parts = [BUDGET_TEXT]
+        push_event(state, "chat_token", {"suspect": suspect_name, "text": BUDGET_TEXT})
     else:
-        system_message += "You are not the murderer.\n"
-    system_message += "Answer the player's question in a fun, story-driven way, under 50 words."
+        parts = []
+        charge = partial(ledger.record, state.session_id, suspect_name, msgs)
+        async for text in astream_chat(msgs, session=state.session_id, charge=charge):
+            parts.append(text)
+            push_event(state, "chat_token", {"suspect": suspect_name, "text": text})
+
+    with state.lock:
+        add_chat_message(state, suspect_name, "assistant", "".join(parts))
+        message_id = history.last_id
+    push_event(state, "chat_done", {"suspect": suspect_name,
+                                    "message": {"id": message_id, "role": "assistant", "content": "".join(parts)}})
+
+@app.route("/api/chat", methods=["POST"])
+def api_chat():
+    """
+    Streaming chat: records the player's message and returns at once,
+    with the messages after the request's "after" id. The reply arrives
+    token by token over the push channel, and the request thread is never
+    tied up waiting on the LLM.
+    """
+    if not push_hub.running:
+        return chat_ajax()
 
-    msgs = [{"role": "system", "content": system_message}]
-    for item in chat_history[suspect_name]:
-        msgs.append(item)
+    state = current_game()
+    data = request.json
+    user_msg = data.get("user_msg", "").strip()
+    after_id = parse_after(data.get("after"))
 
-    ai_text = "(No OPENAI_API_KEY configured.)"
-    if openai.api_key:
-        try:
-            resp = openai.ChatCompletion.create(
-                model="gpt-4o",
-                messages=msgs,
-                max_tokens=100,
-                temperature=0.9
-            )
-            ai_text = resp["choices"][0]["message"]["content"]
-        except Exception as e:
-            ai_text = f"(OpenAI error: {e})"
-
-    chat_history[suspect_name].append({"role": "assistant", "content": ai_text})
-
-    # Build updated log
-    history_txt = []
-    for entry in chat_history[suspect_name]:
-        speaker = entry['role'].capitalize()
-        content = entry['content']
-        history_txt.append(f"<b>{speaker}:</b> {content}")
-    joined_history = "<br>".join(history_txt)
-
-    return jsonify({"chatHtml": joined_history})
+    with state.lock:
+        turn = start_chat_turn(state, user_msg)
+        if turn is None:
+            return jsonify({"error": "No suspect here!", "messages": [], "lastId": after_id, "streaming": False})
+        suspect_name, history, msgs = turn
+        update = chat_update(history, after_id)
+
+    push_hub.submit(stream_chat_reply(state, suspect_name, history, msgs))
+    return jsonify({**update, "streaming": True}), 202
 
 @app.route("/clues")
 def show_clues():
-    clue_text = "<br>".join(collected_clues) if collected_clues else "(No clues yet!)"
-    return render_template_string(f"""
-    <html>
-      <head>
-        <title>Collected Clues</title>
-      </head>
-      <body>
-        <h1>Collected Clues</h1>
-        <p>{clue_text}</p>
-        <p><a href="/">Back</a></p>
-      </body>
-    </html>
-    """)
+    state = current_game()
+    with state.lock:
+        collected_clues = list(state.collected_clues)
+    return render_template("clues.html", clues=collected_clues)
 
 @app.route("/accuse", methods=["GET", "POST"])
 def accuse():
+    state = current_game()
     if request.method == "POST":
         suspect_chosen = request.form.get("suspect")
         weapon_chosen = request.form.get("weapon")
         if suspect_chosen and weapon_chosen:
-            if suspect_chosen == murderer["name"] and weapon_chosen == murder_weapon["name"]:
-                return render_template_string(f"""
-                <html><body>
-                <h1>YOU WIN!</h1>
-                <p>The murderer was {suspect_chosen} with the {weapon_chosen}!</p>
-                <p><a href="/story">View Full Story</a></p>
-                <p><a href="/">Back</a></p>
-                </body></html>
-                """)
-            else:
-                return render_template_string(f"""
-                <html><body>
-                <h1>WRONG ACCUSATION!</h1>
-                <p>You accused {suspect_chosen} with the {weapon_chosen} and failed.</p>
-                <p><a href="/">Back</a></p>
-                </body></html>
-                """)
+            with state.lock:
+                correct = state.step(("accuse", suspect_chosen, weapon_chosen))["correct"]
+                persist(state, "accuse", {"suspect": suspect_chosen, "weapon": weapon_chosen})
+            telemetry.count("accusations", attributes={"correct": correct})
+            return render_template("accuse_result.html", correct=correct,
+                                   suspect=suspect_chosen, weapon=weapon_chosen)
         else:
             return redirect(url_for("index"))
     else:
-        suspect_options = [s["name"] for s in suspects_data]
-        weapon_options = [w["name"] for w in weapons_data if w.get("collected")]
-        suspect_html = "".join([f"<option value='{n}'>{n}</option>" for n in suspect_options])
-        weapon_html = "".join([f"<option value='{w}'>{w}</option>" for w in weapon_options])
-
-        return render_template_string(f"""
-        <html>
-          <head><title>Accuse</title></head>
-          <body>
-            <h1>Accuse a suspect</h1>
-            <form method="POST">
-              <p>Suspect:
-                <select name="suspect">
-                  {suspect_html}
-                </select>
-              </p>
-              <p>Weapon (only ones you collected):
-                <select name="weapon">
-                  {weapon_html}
-                </select>
-              </p>
-              <p><input type="submit" value="Accuse"></p>
-            </form>
-            <p><a href="/">Back</a></p>
-          </body>
-        </html>
-        """)
+        with state.lock:
+            suspect_options = [s["name"] for s in state.suspects]
+            weapon_options = [w["name"] for w in state.weapons if w.get("collected")]
+        return render_template("accuse.html", suspects=suspect_options, weapons=weapon_options)
 
 @app.route("/story")
 def story():
-    global new_story
-    return render_template_string(f"""
-    <html>
-      <head><title>Story</title></head>
-      <body>
-        <h1>The Full Story</h1>
-        <p>{new_story}</p>
-        <p><a href="/">Back</a></p>
-      </body>
-    </html>
-    """)
+    state = current_game()
+    return render_template("story.html", story=state.story)
 
 @app.route("/quit")
 def quit_game():
+    if journal is not None:
+        journal.flush()
     sys.exit(0)
 
+@app.route("/api/usage")
+def usage():
+    """
+    This session's LLM tokens and cost, per suspect, and its remaining budget.
+    """
+    state = current_game()
+    return jsonify(ledger.usage(state.session_id))
+
+@app.route("/api/metrics")
+def metrics():
+    return jsonify({
+        "sessions": {"active": len(sessions), "created": sessions.created, "evicted": sessions.evicted,
+                     "loaded": sessions.loaded},
+        "scenarioPool": scenario_pool.metrics(),
+        "greetingPrefetch": greetings.metrics(),
+        "tokens": ledger.metrics(),
+        "push": {"connections": push_hub.connection_count, "published": push_hub.published,
+                 "dropped": push_hub.dropped},
+        "llmCache": llm.cache.stats() if llm.cache is not None else None,
+        "llm": llm.client.metrics(),
+        "llmScheduler": llm.scheduler.metrics(),
+        "navigator": navigator.metrics(),
+        "journal": journal.metrics() if journal is not None else None,
+    })
+
 if __name__ == "__main__":
-    for i, clue_text in enumerate(new_clues):
-        if i < len(clues_data):
-            clues_data[i]["text"] = clue_text
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Reloader child: warm the pool before the first visitor arrives.
+        scenario_pool.start()
+    # Pick up edits to static/ without a restart, like templates do.
+    static_assets.auto_reload = True
     app.run(debug=True, port=5001) 
\ No newline at end of file
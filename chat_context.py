@@ -0,0 +1,252 @@
+from collections import deque
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """
+    Cheap local token estimate (~4 characters per token for English), good
+    enough for budgeting prompts without a tokenizer dependency.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + 1
+
+
+def _gist(text, limit=90):
+    """
+    First sentence of text, cut to `limit` characters.
+    """
+    text = " ".join(text.split())
+    for stop in (". ", "? ", "! "):
+        cut = text.find(stop)
+        if 0 < cut < limit:
+            return text[:cut + 1]
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class ChatContext:
+    """
+    One suspect's conversation.
+
+    `transcript` is what the chat windows display. The prompt sent to the
+    LLM is bounded: only the last `keep_turns` exchanges go in verbatim,
+    and older messages are folded into a short running summary. The whole
+    prompt (system message + summary + recent messages) is kept under
+    `token_budget` estimated tokens, so its size stays flat no matter how
+    long the interrogation runs.
+
+    Every message gets an id, its position in the whole conversation
+    (1, 2, ...), which stays the same when older messages are trimmed from
+    the transcript, so clients can ask for just the messages after the
+    last one they have (see since()).
+
+    The prompt list is kept up to date as messages come and go (appended
+    at the end, folded off the front) instead of being rebuilt every
+    turn, and each message's token estimate is worked out only once.
+    """
+
+    def __init__(self, speaker="Suspect", keep_turns=4, token_budget=700, summary_tokens=200):
+        self.speaker = speaker
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.transcript = []
+        # Messages trimmed off the front of the transcript so far.
+        self.trimmed = 0
+        self.recent = deque()
+        self.summary_lines = deque()
+        self._summary_size = 0
+        # [system, summary (once there is one), *recent]
+        self._messages = [None]
+        self._system = None
+        self._system_tokens = 0
+        self._summary_dirty = False
+        self._summary_message_tokens = 0
+        # Token estimates for the oldest len(_counts) recent messages; the
+        # rest are counted at the next build_messages().
+        self._counts = deque()
+        self._recent_tokens = 0
+
+    def __len__(self):
+        return len(self.transcript)
+
+    def __iter__(self):
+        return iter(self.transcript)
+
+    def append(self, role, content):
+        """
+        Adds a message and returns its dict. Streaming callers may keep
+        extending entry["content"]; folding happens in build_messages().
+        """
+        entry = {"role": role, "content": content}
+        self.transcript.append(entry)
+        self.recent.append(entry)
+        self._messages.append(entry)
+        return entry
+
+    @property
+    def last_id(self):
+        return self.trimmed + len(self.transcript)
+
+    def since(self, after_id):
+        """
+        (id, message) pairs for the messages after after_id still in the
+        transcript, oldest first. Costs only what it returns.
+        """
+        start = max(0, after_id - self.trimmed)
+        return [(self.trimmed + i + 1, self.transcript[i]) for i in range(start, len(self.transcript))]
+
+    def messages_after(self, after_id):
+        """
+        since() as JSON-ready {"id", "role", "content"} dicts.
+        """
+        return [{"id": message_id, "role": e["role"], "content": e["content"]}
+                for message_id, e in self.since(after_id)]
+
+    @property
+    def summary(self):
+        return " ".join(self.summary_lines)
+
+    def _fold_oldest(self):
+        entry = self.recent.popleft()
+        if self._counts:
+            self._recent_tokens -= self._counts.popleft()
+        if self.summary_lines:
+            del self._messages[2]
+        else:
+            # The first fold: the summary takes the oldest message's place.
+            self._messages[1] = None
+        self._summary_dirty = True
+        who = "Player asked" if entry["role"] == "user" else f"{self.speaker} said"
+        line = f"{who}: {_gist(entry['content'])}"
+        self.summary_lines.append(line)
+        self._summary_size += estimate_tokens(line)
+        while self._summary_size > self.summary_tokens and len(self.summary_lines) > 1:
+            self._summary_size -= estimate_tokens(self.summary_lines.popleft())
+
+    def build_messages(self, system_message):
+        """
+        Returns the prompt: system message, the running summary (if any),
+        then the recent messages verbatim, within token_budget. The list is
+        a snapshot, safe to send while the conversation carries on; its
+        message dicts are shared with the transcript and must not be changed.
+        """
+        if system_message != self._system:
+            self._system = system_message
+            self._system_tokens = estimate_tokens(system_message)
+            self._messages[0] = {"role": "system", "content": system_message}
+        for i in range(len(self._counts), len(self.recent)):
+            tokens = estimate_tokens(self.recent[i]["content"])
+            self._counts.append(tokens)
+            self._recent_tokens += tokens
+
+        while len(self.recent) > self.keep_turns * 2:
+            self._fold_oldest()
+        while len(self.recent) > 1 and self._system_tokens + self._summary_size + self._recent_tokens > self.token_budget:
+            self._fold_oldest()
+
+        if self._summary_dirty:
+            content = "Earlier in this conversation: " + self.summary
+            self._messages[1] = {"role": "system", "content": content}
+            self._summary_message_tokens = estimate_tokens(content)
+            self._summary_dirty = False
+        return list(self._messages)
+
+    def to_dict(self):
+        """
+        JSON-ready state; from_dict() rebuilds an identical context.
+        """
+        return {
+            "transcript": [dict(e) for e in self.transcript],
+            "trimmed": self.trimmed,
+            "recent": len(self.recent),
+            "summary": list(self.summary_lines),
+        }
+
+    @classmethod
+    def from_dict(cls, data, **options):
+        context = cls(**options)
+        context.transcript = [dict(e) for e in data["transcript"]]
+        context.trimmed = data.get("trimmed", 0)
+        # recent is always the tail of the transcript (trimming never
+        # touches it), and must share its entry dicts.
+        if data["recent"]:
+            context.recent.extend(context.transcript[-data["recent"]:])
+        context.summary_lines.extend(data["summary"])
+        context._summary_size = sum(estimate_tokens(line) for line in context.summary_lines)
+        if context.summary_lines:
+            context._messages.append(None)
+            context._summary_dirty = True
+        context._messages.extend(context.recent)
+        return context
+
+    def prompt_tokens(self, system_message):
+        self.build_messages(system_message)
+        return self._system_tokens + self._summary_message_tokens + self._recent_tokens
+
+    def transcript_chars(self):
+        return sum(len(e["content"]) for e in self.transcript)
+
+    def trim_transcript(self, count):
+        """
+        Drops the oldest `count` displayed messages. Messages still in the
+        prompt window are never dropped.
+        """
+        while len(self.recent) > self.keep_turns * 2:
+            self._fold_oldest()
+        keep = len(self.recent)
+        count = min(count, len(self.transcript) - keep)
+        if count > 0:
+            del self.transcript[:count]
+            self.trimmed += count
+        return max(count, 0)
+
+
+class ChatMemory:
+    """
+    All of one game's conversations, keyed by suspect name, with a cap on
+    the total transcript size. When the cap is exceeded, the oldest
+    messages of the longest conversation are trimmed from the display;
+    their gist is already in that suspect's running summary.
+    """
+
+    def __init__(self, max_chars=64 * 1024, **context_options):
+        self.max_chars = max_chars
+        self.context_options = context_options
+        self._contexts = {}
+
+    def __getitem__(self, suspect_name):
+        context = self._contexts.get(suspect_name)
+        if context is None:
+            context = ChatContext(speaker=suspect_name, **self.context_options)
+            self._contexts[suspect_name] = context
+        return context
+
+    def __contains__(self, suspect_name):
+        return suspect_name in self._contexts
+
+    def get(self, suspect_name):
+        return self._contexts.get(suspect_name)
+
+    def items(self):
+        return self._contexts.items()
+
+    def to_dict(self):
+        return {name: context.to_dict() for name, context in self._contexts.items()}
+
+    @classmethod
+    def from_dict(cls, data, max_chars=64 * 1024, **context_options):
+        memory = cls(max_chars, **context_options)
+        for name, context in data.items():
+            memory._contexts[name] = ChatContext.from_dict(context, speaker=name, **context_options)
+        return memory
+
+    def total_chars(self):
+        return sum(c.transcript_chars() for c in self._contexts.values())
+
+    def enforce_cap(self):
+        total = self.total_chars()
+        while total > self.max_chars:
+            longest = max(self._contexts.values(), key=len)
+            if longest.trim_transcript(2) == 0:
+                break
+            total = self.total_chars()
@@ -1,65 +1,73 @@
 import curses
+import os
 import textwrap
-import random
 import sys
+from functools import partial
 
-import openai
+import telemetry
+from llm import stream_chat
 from logic import (
-    PLAYER_CHAR, CLUE_CHAR, FLOOR_CHAR, WALL_CHAR, DOOR_CHAR,
+    PLAYER_CHAR, CLUE_CHAR, FLOOR_CHAR,
     victim_data, suspects_data, weapons_data, clues_data,
     murder_story, cryptic_intro, chat_history,
-    generate_story_clues_and_intro, generate_game_map,
-    is_valid_tile, find_suspect_at, find_weapon_at, find_clue_at,
-    POSSIBLE_ROOM_NAMES
+    generate_story_clues_and_intro, generate_game_map, place_entities
 )
+from engine import GameEngine
+from prefetch import GreetingPrefetcher
+from prompts import suspect_system_prompt, ledger, BUDGET_TEXT
 
-def chat_with_suspect(stdscr, suspect, is_murderer):
+class WrapCache:
     """
-    Simple chat loop using ChatGPT in curses.
+    Chat messages wrapped to the terminal width, kept per message id, so a
+    redraw only wraps messages that are new or still growing (a reply
+    streaming in). A different width starts over.
+    """
+
+    def __init__(self, keep=64):
+        self.keep = keep
+        self.width = None
+        self._lines = {}
+
+    def lines(self, message_id, text, width):
+        if width != self.width:
+            self.width = width
+            self._lines.clear()
+        cached = self._lines.get(message_id)
+        if cached is None or cached[0] != text:
+            if len(self._lines) >= self.keep:
+                # Messages scroll out of view in id order; forget the oldest.
+                del self._lines[min(self._lines)]
+            cached = self._lines[message_id] = (text, textwrap.wrap(text, width))
+        return cached[1]
+
+def chat_with_suspect(stdscr, suspect, is_murderer, greeting=None):
+    """
+    Simple chat loop using ChatGPT in curses. A prefetched greeting
+    opens a first conversation.
     """
     suspect_name = suspect["name"]
-    if suspect_name not in chat_history:
-        chat_history[suspect_name] = []
+    history = chat_history[suspect_name]
+    if greeting and not len(history):
+        history.append("assistant", greeting)
 
-    system_message = (
-        f"You are {suspect_name}, a Clue-like murder suspect in a text-based game.\n"
-        "Mr. Boddy has been found murdered.\n"
-    )
-    if is_murderer:
-        system_message += (
-            "Secretly, you DO know you are the murderer. Respond in character but don't be too obvious. "
-            "When presented with enough evidence you might have to come clean.\n"
-        )
-    else:
-        system_message += (
-            "You do not know who the murderer is (because it isn't you). "
-            "Stay in character as an innocent suspect.\n"
-        )
-    system_message += (
-        "Answer the player's questions in a fun, story-driven way.\n"
-        "Be concise. Keep responses under 50 words.\n"
-    )
+    system_message = suspect_system_prompt(suspect_name, is_murderer)
 
-    def build_messages():
-        msgs = [{"role": "system", "content": system_message}]
-        for item in chat_history[suspect_name]:
-            msgs.append(item)
-        return msgs
+    prompt = "Your message (Enter='send', 'q' alone='quit'): "
+    wrapped_lines = WrapCache()
 
-    curses.echo()
-    while True:
+    def draw_chat():
         stdscr.clear()
         max_y, max_x = stdscr.getmaxyx()
         stdscr.addstr(0, 0, f"Chatting with {suspect_name} (type 'q' alone to quit)")
 
         HISTORY_LINES = 10
-        displayed_history = chat_history[suspect_name][-HISTORY_LINES:]
+        displayed_history = history.since(history.last_id - HISTORY_LINES)
         offset = 2
-        for entry in displayed_history:
+        for message_id, entry in displayed_history:
             role = entry["role"].capitalize()
             text = entry["content"]
             combined_line = f"{role}: {text}"
-            wrapped = textwrap.wrap(combined_line, max_x - 1)
+            wrapped = wrapped_lines.lines(message_id, combined_line, max_x - 1)
             for line in wrapped:
                 if offset >= max_y - 2:
                     break
@@ -67,11 +75,15 @@ def chat_with_suspect(stdscr, suspect, is_murderer):
                 offset += 1
 
         input_y = max_y - 1
-        prompt = "Your message (Enter='send', 'q' alone='quit'): "
         prompt_show = prompt[:max_x-1]
         stdscr.addstr(input_y, 0, prompt_show)
         stdscr.move(input_y, len(prompt_show))
         stdscr.refresh()
+        return input_y, prompt_show, max_x
+
+    curses.echo()
+    while True:
+        input_y, prompt_show, max_x = draw_chat()
 
         raw_input = stdscr.getstr(input_y, len(prompt_show), max_x - len(prompt_show) - 1)
         if not raw_input:
@@ -81,23 +93,19 @@ def chat_with_suspect(stdscr, suspect, is_murderer):
         if user_msg.lower() == 'q' and len(user_msg) == 1:
             break
 
-        chat_history[suspect_name].append({"role": "user", "content": user_msg})
+        history.append("user", user_msg)
 
-        try:
-            if not openai.api_key:
-                ai_text = "(No OPENAI_API_KEY configured.)"
-            else:
-                resp = openai.ChatCompletion.create(
-                    model="gpt-4o",
-                    messages=build_messages(),
-                    max_tokens=100,
-                    temperature=0.9
-                )
-                ai_text = resp["choices"][0]["message"]["content"]
-        except Exception as e:
-            ai_text = f"(OpenAI error: {e})"
-
-        chat_history[suspect_name].append({"role": "assistant", "content": ai_text})
+        # Stream the reply into the window as it arrives instead of
+        # freezing the UI until the whole completion is back.
+        msgs = history.build_messages(system_message)
+        reply = history.append("assistant", "")
+        if ledger.allow(None, suspect_name, msgs):
+            for text in stream_chat(msgs, charge=partial(ledger.record, None, suspect_name, msgs)):
+                reply["content"] += text
+                draw_chat()
+        else:
+            reply["content"] = BUDGET_TEXT
+        chat_history.enforce_cap()
 
     curses.noecho()
 
@@ -186,6 +194,196 @@ def select_weapon(stdscr, inventory):
         elif key in (curses.KEY_ENTER, 10, 13):
             return inventory[idx]
 
+def select_walk_target(stdscr, engine):
+    """
+    Lets you pick where to walk: the nearest clue, a suspect, or a weapon
+    that hasn't been picked up. Returns a target for navigation.resolve_target(),
+    or None if canceled.
+    """
+    options = [("clue", "Nearest clue")]
+    options += [(s["name"], s["name"]) for s in engine.suspects]
+    options += [(w["name"], w["name"]) for w in engine.weapons if "collected" not in w]
+
+    idx = 0
+    while True:
+        stdscr.clear()
+        stdscr.addstr(0, 0, "Walk to (↑/↓ to navigate, Enter to confirm, Q to cancel):")
+
+        for i, (_, label) in enumerate(options):
+            highlight = ">> " if i == idx else "   "
+            stdscr.addstr(i + 2, 0, f"{highlight}{label}")
+
+        stdscr.refresh()
+        key = stdscr.getch()
+
+        if key in (ord('q'), ord('Q'), 27):
+            return None
+        elif key == curses.KEY_DOWN:
+            idx = (idx + 1) % len(options)
+        elif key == curses.KEY_UP:
+            idx = (idx - 1) % len(options)
+        elif key in (curses.KEY_ENTER, 10, 13):
+            return options[idx][0]
+
+def pickup_message(weapon, clue):
+    """
+    The message for what a move picked up, or None if nothing.
+    """
+    message = None
+    if weapon:
+        telemetry.count("pickups", attributes={"kind": "weapon"})
+        message = f"You picked up {weapon['name']}!"
+    if clue:
+        telemetry.count("pickups", attributes={"kind": "clue"})
+        message = f"You found a clue: \"{clue['text']}\""
+    return message
+
+class MapRenderer:
+    """
+    Differential renderer for the main map screen.
+
+    The static map is painted once; after that only screen cells whose
+    overlay (victim, weapon, clue, suspect or player) changed are repainted,
+    along with any status line whose text changed. Everything is redrawn
+    only on the first frame, when the terminal size changes (KEY_RESIZE),
+    or after another screen (chat, clues, accusation) has drawn over the map.
+    """
+
+    UI_LINES = 8
+
+    def __init__(self, stdscr, game_map):
+        self.stdscr = stdscr
+        self.game_map = game_map
+        self.map_rows = len(game_map)
+        self.map_cols = len(game_map[0]) if self.map_rows > 0 else 0
+        self.max_y = self.max_x = 0
+        self.tile_height = self.tile_width = 1
+        self._overlays = {}
+        self._status = []
+        self._size = None
+        self._needs_full = True
+
+    def invalidate(self):
+        self._needs_full = True
+
+    def fits(self):
+        """
+        Reads the terminal size and computes the tile layout.
+        Returns False if the map can't be shown at all.
+        """
+        self.max_y, self.max_x = self.stdscr.getmaxyx()
+        available_height = self.max_y - self.UI_LINES
+        if available_height <= 0 or self.map_cols == 0 or self.map_rows == 0:
+            return False
+        self.tile_height = max(1, available_height // self.map_rows)
+        self.tile_width = max(1, self.max_x // self.map_cols)
+        if self._size != (self.max_y, self.max_x):
+            self._size = (self.max_y, self.max_x)
+            self._needs_full = True
+        return True
+
+    def _put(self, y, x, text):
+        if 0 <= y < self.max_y and 0 <= x < self.max_x:
+            try:
+                self.stdscr.addstr(y, x, text)
+            except curses.error:
+                # Writing the last cell of the screen moves the cursor off it.
+                pass
+
+    @staticmethod
+    def _width(text):
+        return 1 if text.isascii() else 2
+
+    def _base(self, y, x):
+        """
+        What the static map shows at screen cell (y, x).
+        """
+        if y % self.tile_height or x % self.tile_width:
+            return " "
+        row, col = y // self.tile_height, x // self.tile_width
+        if row < self.map_rows and col < self.map_cols:
+            tile = self.game_map[row][col]
+            return tile if tile != FLOOR_CHAR else " "
+        return " "
+
+    def entity_overlays(self, player_x, player_y, engine=None):
+        """
+        Screen position -> text for everything drawn on top of the map.
+        Later entries win, in the same order the old full redraw used.
+        Draws engine's entities, or the module-level lists without one.
+        """
+        th, tw = self.tile_height, self.tile_width
+        if engine is not None:
+            suspects, weapons, clues = engine.suspects, engine.weapons, engine.clues
+        else:
+            suspects, weapons, clues = suspects_data, weapons_data, clues_data
+        overlays = {(victim_data["y"] * th - 1, victim_data["x"] * tw - 1): victim_data["emoji"]}
+        for w in weapons:
+            if "x" in w and "y" in w and "collected" not in w:
+                overlays[(w["y"] * th, w["x"] * tw)] = w["emoji"]
+        for c_data in clues:
+            if "x" in c_data and "y" in c_data and "found" not in c_data:
+                overlays[(c_data["y"] * th, c_data["x"] * tw)] = CLUE_CHAR
+        for s in suspects:
+            if "x" in s and "y" in s:
+                overlays[(s["y"] * th, s["x"] * tw)] = s["emoji"]
+        overlays[(player_y * th, player_x * tw)] = PLAYER_CHAR
+        return overlays
+
+    def _draw_full(self, overlays, status_lines):
+        self.stdscr.clear()
+        th, tw = self.tile_height, self.tile_width
+        for row in range(self.map_rows):
+            line = self.game_map[row]
+            for col in range(self.map_cols):
+                # clear() already blanked the floor.
+                if line[col] != FLOOR_CHAR:
+                    self._put(row * th, col * tw, line[col])
+        for (y, x), text in overlays.items():
+            self._put(y, x, text)
+        ui_start = self.map_rows * th
+        for i, line in enumerate(status_lines):
+            self._put(ui_start + i, 0, line[:self.max_x - 1])
+
+    def _draw_diff(self, overlays, status_lines):
+        old = self._overlays
+        dirty = [pos for pos in old.keys() | overlays.keys() if old.get(pos) != overlays.get(pos)]
+        repaint = set()
+        for y, x in dirty:
+            previous = old.get((y, x))
+            if previous is not None:
+                # Put the map back under whatever used to be here (emoji are 2 cells wide).
+                for dx in range(self._width(previous)):
+                    self._put(y, x + dx, self._base(y, x + dx))
+            # Neighbours may have been clipped by the restore; repaint them too.
+            for dx in (-1, 0, 1):
+                if (y, x + dx) in overlays:
+                    repaint.add((y, x + dx))
+        for pos in sorted(repaint):
+            self._put(pos[0], pos[1], overlays[pos])
+
+        ui_start = self.map_rows * self.tile_height
+        for i in range(max(len(status_lines), len(self._status))):
+            new_line = status_lines[i][:self.max_x - 1] if i < len(status_lines) else ""
+            old_line = self._status[i] if i < len(self._status) else ""
+            if new_line != old_line and ui_start + i < self.max_y:
+                self._put(ui_start + i, 0, new_line)
+                try:
+                    self.stdscr.move(ui_start + i, len(new_line))
+                    self.stdscr.clrtoeol()
+                except curses.error:
+                    pass
+
+    def render(self, overlays, status_lines):
+        if self._needs_full:
+            self._draw_full(overlays, status_lines)
+            self._needs_full = False
+        else:
+            self._draw_diff(overlays, status_lines)
+        self._overlays = overlays
+        self._status = list(status_lines)
+        self.stdscr.refresh()
+
 def main(stdscr, game_map, rooms, selected_room_names):
     curses.curs_set(0)
     stdscr.nodelay(False)
@@ -194,135 +392,69 @@ def main(stdscr, game_map, rooms, selected_room_names):
     global murder_story
     global cryptic_intro
 
-    player_x, player_y = 2, 2
-    inventory = []
-    collected_clues = []
     game_message = "Use arrow keys to move. Press 'C' to chat, 'A' to accuse, 'L' for clues."
 
-    murderer = random.choice(suspects_data)
-    murder_weapon = random.choice(weapons_data)
+    # The rules live in the engine; this loop only reads keys and draws.
+    engine = GameEngine(game_map)
 
     new_story, new_intro, new_clues = generate_story_clues_and_intro(
-        murderer["name"],
-        murder_weapon["name"],
+        engine.murderer["name"],
+        engine.murder_weapon["name"],
         selected_room_names
     )
 
     murder_story = new_story
     cryptic_intro = new_intro
 
-    for i, clue_text in enumerate(new_clues):
-        if i < len(clues_data):
-            clues_data[i]["text"] = clue_text
+    for clue, clue_text in zip(engine.clues, new_clues):
+        clue["text"] = clue_text
 
-    while True:
-        stdscr.clear()
-        max_y, max_x = stdscr.getmaxyx()
+    # Suspects' greetings, generated while the player walks over to them.
+    greetings = GreetingPrefetcher(radius=int(os.getenv("ELASTICLUE_PREFETCH_RADIUS", "4")))
 
-        map_rows = len(game_map)
-        map_cols = len(game_map[0]) if map_rows > 0 else 0
-        ui_lines = 8
-        available_height = max_y - ui_lines
-        if available_height <= 0 or map_cols == 0 or map_rows == 0:
+    def speculate(previous):
+        suspects = [s for s in engine.suspects if not chat_history.get(s["name"])]
+        greetings.observe(None, previous, (engine.player_x, engine.player_y), suspects, engine.murderer["name"])
+
+    renderer = MapRenderer(stdscr, game_map)
+    while True:
+        if not renderer.fits():
+            stdscr.clear()
             stdscr.addstr(0, 0, "Terminal too small. Enlarge window.")
             stdscr.refresh()
+            renderer.invalidate()
             c = stdscr.getch()
             if c in [ord('q'), ord('Q'), 27]:
                 break
             continue
 
-        tile_height = max(1, available_height // map_rows)
-        tile_width = max(1, max_x // map_cols)
-
-        for row in range(map_rows):
-            for col in range(map_cols):
-                tile = game_map[row][col]
-                draw_char = tile if tile != FLOOR_CHAR else " "
-                screen_y = row * tile_height
-                screen_x = col * tile_width
-                try:
-                    stdscr.addstr(screen_y, screen_x, draw_char)
-                except:
-                    pass
-
-        try:
-            vy = victim_data["y"] * tile_height - 1
-            vx = victim_data["x"] * tile_width - 1
-            stdscr.addstr(vy, vx, victim_data["emoji"])
-        except:
-            pass
-
-        for w in weapons_data:
-            if "x" in w and "y" in w and "collected" not in w:
-                sy = w["y"] * tile_height
-                sx = w["x"] * tile_width
-                try:
-                    stdscr.addstr(sy, sx, w["emoji"])
-                except:
-                    pass
-
-        for c_data in clues_data:
-            if "x" in c_data and "y" in c_data and "found" not in c_data:
-                sy = c_data["y"] * tile_height
-                sx = c_data["x"] * tile_width
-                try:
-                    stdscr.addstr(sy, sx, CLUE_CHAR)
-                except:
-                    pass
-
-        for s in suspects_data:
-            if "x" in s and "y" in s:
-                sy = s["y"] * tile_height
-                sx = s["x"] * tile_width
-                try:
-                    stdscr.addstr(sy, sx, s["emoji"])
-                except:
-                    pass
-
-        py = player_y * tile_height
-        px = player_x * tile_width
-        stdscr.addstr(py, px, PLAYER_CHAR)
-
-        ui_start = map_rows * tile_height
-        intro_lines = textwrap.wrap(f"Intro: {cryptic_intro}", width=max_x - 1)
-        used_ui_lines = 0
-        for line in intro_lines:
-            if ui_start + used_ui_lines >= max_y:
-                break
-            stdscr.addstr(ui_start + used_ui_lines, 0, line)
-            used_ui_lines += 1
-
-        if ui_start + used_ui_lines < max_y:
-            stdscr.addstr(ui_start + used_ui_lines, 0,
-                          f"INVENTORY: {', '.join(inventory) if inventory else '(empty)'}")
-            used_ui_lines += 1
-
-        if ui_start + used_ui_lines < max_y:
-            stdscr.addstr(ui_start + used_ui_lines, 0, f"MESSAGE: {game_message}")
-            used_ui_lines += 1
-
-        if ui_start + used_ui_lines < max_y:
-            stdscr.addstr(ui_start + used_ui_lines, 0, "Press 'Q' or ESC to quit.")
-            stdscr.addstr(ui_start + used_ui_lines + 1, 0, "Use arrow keys to move. Press 'C' to chat, 'A' to accuse, 'L' for clues.")
-            used_ui_lines += 2
-
-        stdscr.refresh()
+        inventory = engine.inventory
+        status_lines = textwrap.wrap(f"Intro: {cryptic_intro}", width=renderer.max_x - 1)
+        status_lines += [
+            f"INVENTORY: {', '.join(inventory) if inventory else '(empty)'}",
+            f"MESSAGE: {game_message}",
+            "Press 'Q' or ESC to quit.",
+            "Use arrow keys to move. Press 'C' to chat, 'A' to accuse, 'L' for clues, 'G' to walk to.",
+        ]
+        renderer.render(renderer.entity_overlays(engine.player_x, engine.player_y, engine), status_lines)
 
         c = stdscr.getch()
         if c in [ord('q'), ord('Q'), 27]:
             break
 
-        new_x, new_y = player_x, player_y
-        if c == curses.KEY_LEFT:
-            new_x -= 1
+        dx = dy = 0
+        if c == curses.KEY_RESIZE:
+            renderer.invalidate()
+        elif c == curses.KEY_LEFT:
+            dx = -1
         elif c == curses.KEY_RIGHT:
-            new_x += 1
+            dx = 1
         elif c == curses.KEY_UP:
-            new_y -= 1
+            dy = -1
         elif c == curses.KEY_DOWN:
-            new_y += 1
+            dy = 1
         elif c in (ord('a'), ord('A')):
-            suspect_here = find_suspect_at(player_x, player_y)
+            suspect_here = engine.entities.suspect_at(engine.player_x, engine.player_y)
             if not suspect_here:
                 game_message = "No suspect here to accuse!"
             else:
@@ -330,11 +462,13 @@ def main(stdscr, game_map, rooms, selected_room_names):
                     game_message = "No weapons in inventory."
                 else:
                     chosen_weapon = select_weapon(stdscr, inventory)
+                    renderer.invalidate()
                     if not chosen_weapon:
                         game_message = "Accusation canceled."
                     else:
-                        if (suspect_here["name"] == murderer["name"]
-                                and chosen_weapon == murder_weapon["name"]):
+                        correct = engine.step(("accuse", suspect_here["name"], chosen_weapon))["correct"]
+                        telemetry.count("accusations", attributes={"correct": correct})
+                        if correct:
                             game_message = f"Correct! {suspect_here['name']} with the {chosen_weapon}. YOU WIN!"
                             reveal_full_story(stdscr, murder_story)
                             break
@@ -342,29 +476,43 @@ def main(stdscr, game_map, rooms, selected_room_names):
                             game_message = (f"Wrong! Suspect: {suspect_here['name']} / "
                                             f"Weapon: {chosen_weapon}. Try again!")
         elif c in (ord('c'), ord('C')):
-            suspect_here = find_suspect_at(player_x, player_y)
+            suspect_here = engine.entities.suspect_at(engine.player_x, engine.player_y)
             if not suspect_here:
                 game_message = "No suspect here to chat with!"
             else:
-                is_murderer = (suspect_here["name"] == murderer["name"])
-                chat_with_suspect(stdscr, suspect_here, is_murderer)
+                is_murderer = (suspect_here["name"] == engine.murderer["name"])
+                greeting = None
+                if not chat_history.get(suspect_here["name"]):
+                    greeting = greetings.take(None, suspect_here["name"], is_murderer)
+                chat_with_suspect(stdscr, suspect_here, is_murderer, greeting)
+                renderer.invalidate()
                 game_message = "You finished chatting."
         elif c in (ord('l'), ord('L')):
-            view_clues(stdscr, collected_clues)
-
-        if new_x != player_x or new_y != player_y:
-            if is_valid_tile(game_map, new_x, new_y):
-                player_x, player_y = new_x, new_y
-                w_item = find_weapon_at(player_x, player_y)
-                if w_item:
-                    w_item["collected"] = True
-                    inventory.append(w_item["name"])
-                    game_message = f"You picked up {w_item['name']}!"
-                clue_item = find_clue_at(player_x, player_y)
-                if clue_item:
-                    clue_item["found"] = True
-                    collected_clues.append(clue_item["text"])
-                    game_message = f"You found a clue: \"{clue_item['text']}\""
+            view_clues(stdscr, engine.collected_clues)
+            renderer.invalidate()
+        elif c in (ord('g'), ord('G')):
+            target = select_walk_target(stdscr, engine)
+            renderer.invalidate()
+            if target is None:
+                game_message = "Walk canceled."
+            else:
+                # The whole path is walked in one step, picking things up
+                # on the way, and drawn once at the end.
+                event = engine.step(("walk", target))
+                if event["path"] is None:
+                    game_message = f"You can't find a way to {target}."
+                else:
+                    telemetry.count("moves", len(event["path"]))
+                    for _, weapon, clue in event["pickups"]:
+                        game_message = pickup_message(weapon, clue) or game_message
+                    speculate(event["from"])
+
+        if dx or dy:
+            event = engine.step(("move", dx, dy))
+            if event["moved"]:
+                telemetry.count("moves")
+                speculate(event["from"])
+                game_message = pickup_message(event["weapon"], event["clue"]) or game_message
 
     stdscr.nodelay(False)
     stdscr.clear()
@@ -377,18 +525,14 @@ if __name__ == "__main__":
         num_rooms = 6
         overall_width = 40
         overall_height = 15
-        generated_map, rooms, selected_room_names = generate_game_map(num_rooms, overall_width, overall_height)
+        map_seed = os.getenv("ELASTICLUE_MAP_SEED")
+        generated_map, rooms, selected_room_names = generate_game_map(
+            num_rooms, overall_width, overall_height,
+            seed=int(map_seed) if map_seed else None,
+        )
 
         # Distribute suspects, weapons, clues among rooms
-        for i, (suspect, weapon, clue) in enumerate(zip(suspects_data, weapons_data, clues_data)):
-            if i < len(rooms):
-                rm = rooms[i]
-                suspect["x"] = rm['x1'] + 2
-                suspect["y"] = rm['center_y']
-                weapon["x"] = rm['x2'] - 2
-                weapon["y"] = rm['center_y']
-                clue["x"] = rm['center_x']
-                clue["y"] = rm['y1'] + 1
+        place_entities(rooms)
 
         curses.wrapper(main, generated_map, rooms, selected_room_names)
     except KeyboardInterrupt:
@@ -0,0 +1,232 @@
+import random
+
+from logic import suspects_data, weapons_data, clues_data, EntityIndex, is_valid_tile
+from navigation import Navigator, resolve_target
+
+START = (2, 2)
+
+# Walk paths remembered per engine, keyed by (start, goal).
+MAX_CACHED_PATHS = 4096
+
+
+class GameEngine:
+    """
+    The rules of one game with no I/O attached: moving, picking up weapons
+    and clues, walking to a target, and accusing. Both frontends drive
+    their games through step(), and simulate.py plays thousands of them
+    headless.
+
+    step() takes an action tuple and returns an event dict describing what
+    happened; turning that into messages, deltas or screen updates is up
+    to the caller:
+
+        ("move", dx, dy)            -> {"type": "move", "moved", "from", "player", "weapon", "clue"}
+        ("walk", target)            -> {"type": "walk", "goal", "from", "path", "pickups", "player"}
+        ("accuse", suspect, weapon) -> {"type": "accuse", "suspect", "weapon", "valid", "correct"}
+
+    The map and the Navigator over it are shared read-only. reset() copies
+    the placed suspects, weapons and clues, so games never affect each
+    other or the module-level lists they start from.
+    """
+
+    def __init__(self, game_map, suspects=None, weapons=None, clues=None,
+                 navigator=None, seed=None, scenario=None):
+        self.game_map = game_map
+        self.templates = (
+            suspects if suspects is not None else suspects_data,
+            weapons if weapons is not None else weapons_data,
+            clues if clues is not None else clues_data,
+        )
+        self.suspect_names = frozenset(s["name"] for s in self.templates[0])
+        self.navigator = navigator
+        self._paths = {}
+        self.reset(seed, scenario)
+
+    def reset(self, seed=None, scenario=None, rng=None):
+        """
+        Starts a new game. With a scenario (as produced by ScenarioPool)
+        the murderer, weapon and clue texts come from it; otherwise the
+        murderer and weapon are drawn from rng, or random.Random(seed).
+        """
+        suspects, weapons, clues = self.templates
+        # The entity dicts only hold scalars, so a shallow copy is a full one.
+        self.suspects = [dict(s) for s in suspects]
+        self.weapons = [dict(w) for w in weapons]
+        self.clues = [dict(c) for c in clues]
+        self.entities = EntityIndex(self.suspects, self.weapons, self.clues)
+        self.player_x, self.player_y = START
+        self.inventory = []
+        self.collected_clues = []
+        self.moves = 0
+        self.accusations = 0
+        # (suspect, weapon) pairs already accused, right or wrong.
+        self.accused = set()
+        self.solved = False
+
+        if scenario is not None:
+            self.murderer = next(s for s in self.suspects if s["name"] == scenario["murderer"])
+            self.murder_weapon = next(w for w in self.weapons if w["name"] == scenario["weapon"])
+            for clue, clue_text in zip(self.clues, scenario["clues"]):
+                clue["text"] = clue_text
+        else:
+            rng = rng or random.Random(seed)
+            self.murderer = rng.choice(self.suspects)
+            self.murder_weapon = rng.choice(self.weapons)
+
+    def snapshot(self):
+        """
+        The game's rules state as JSON-ready data; restore() rebuilds it.
+        """
+        return {
+            "murderer": self.murderer["name"],
+            "weapon": self.murder_weapon["name"],
+            "clues": [c["text"] for c in self.clues],
+            "player": [self.player_x, self.player_y],
+            "inventory": list(self.inventory),
+            "collectedClues": list(self.collected_clues),
+            "found": [i for i, c in enumerate(self.clues) if "found" in c],
+            "moves": self.moves,
+            "accusations": self.accusations,
+            "accused": sorted(self.accused),
+            "solved": self.solved,
+        }
+
+    def restore(self, snapshot):
+        self.reset(scenario=snapshot)
+        for weapon in self.weapons:
+            if weapon["name"] in snapshot["inventory"]:
+                self.entities.collect_weapon(weapon)
+        for i in snapshot["found"]:
+            self.entities.mark_clue_found(self.clues[i])
+        self.player_x, self.player_y = snapshot["player"]
+        self.inventory = list(snapshot["inventory"])
+        self.collected_clues = list(snapshot["collectedClues"])
+        self.moves = snapshot["moves"]
+        self.accusations = snapshot["accusations"]
+        self.accused = {tuple(pair) for pair in snapshot["accused"]}
+        self.solved = snapshot["solved"]
+
+    @property
+    def done(self):
+        return self.solved
+
+    def step(self, action):
+        kind = action[0]
+        if kind == "move":
+            return self.move(action[1], action[2])
+        if kind == "walk":
+            return self.walk(action[1])
+        if kind == "accuse":
+            return self.accuse(action[1], action[2])
+        raise ValueError(f"Unknown action {action!r}")
+
+    def _pick_up(self, x, y):
+        """
+        Collects the weapon and clue at (x, y), if any. Returns (weapon, clue).
+        """
+        weapon = self.entities.weapon_at(x, y)
+        if weapon:
+            self.entities.collect_weapon(weapon)
+            self.inventory.append(weapon["name"])
+        clue = self.entities.clue_at(x, y)
+        if clue:
+            self.entities.mark_clue_found(clue)
+            self.collected_clues.append(clue["text"])
+        return weapon, clue
+
+    def move(self, dx, dy):
+        """
+        One step, if the tile is walkable, picking up whatever is there.
+        A (0, 0) step goes nowhere and isn't counted.
+        """
+        start = (self.player_x, self.player_y)
+        new_x, new_y = self.player_x + dx, self.player_y + dy
+        event = {"type": "move", "moved": False, "from": start, "weapon": None, "clue": None}
+        if (dx or dy) and is_valid_tile(self.game_map, new_x, new_y):
+            self.player_x, self.player_y = new_x, new_y
+            self.moves += 1
+            event["moved"] = True
+            event["weapon"], event["clue"] = self._pick_up(new_x, new_y)
+        event["player"] = (self.player_x, self.player_y)
+        return event
+
+    def _path(self, start, goal):
+        """
+        (path, step index of each tile on it) for a walk, remembered so
+        repeated walks between the same tiles cost one dict lookup.
+        """
+        key = (start, goal)
+        cached = self._paths.get(key)
+        if cached is None:
+            path = self.navigator.path_to(start, goal)
+            if path is None:
+                return None
+            if len(self._paths) >= MAX_CACHED_PATHS:
+                self._paths.clear()
+            cached = self._paths[key] = (tuple(path), {tile: i for i, tile in enumerate(path)})
+        return cached
+
+    def walk(self, target):
+        """
+        Walks the shortest path to target, an (x, y) tile or anything
+        navigation.resolve_target accepts, picking up everything on the
+        way. path is None if the target is unknown or unreachable. pickups
+        lists (step index, weapon, clue) for each step where something was
+        picked up, in path order.
+        """
+        if self.navigator is None:
+            self.navigator = Navigator(self.game_map)
+        start = (self.player_x, self.player_y)
+        if isinstance(target, tuple):
+            goal = target
+            cached = self._path(start, goal)
+        else:
+            goal, path = resolve_target(target, start, self.navigator, self.entities)
+            cached = (tuple(path), {tile: i for i, tile in enumerate(path)}) if path is not None else None
+        event = {"type": "walk", "goal": goal, "from": start, "path": None, "pickups": []}
+        if cached is None:
+            event["player"] = start
+            return event
+        path, where = cached
+
+        # Only tiles holding something are checked against the path,
+        # instead of probing the index at every step.
+        hits = {}
+        for table, slot in ((self.entities.weapons, 0), (self.entities.clues, 1)):
+            for tile, bucket in table.items():
+                i = where.get(tile)
+                if i is not None:
+                    hits.setdefault(i, [None, None])[slot] = bucket[0]
+        pickups = event["pickups"]
+        for i in sorted(hits):
+            weapon, clue = hits[i]
+            if weapon:
+                self.entities.collect_weapon(weapon)
+                self.inventory.append(weapon["name"])
+            if clue:
+                self.entities.mark_clue_found(clue)
+                self.collected_clues.append(clue["text"])
+            pickups.append((i, weapon, clue))
+
+        if path:
+            self.player_x, self.player_y = path[-1]
+        self.moves += len(path)
+        event["path"] = path
+        event["player"] = (self.player_x, self.player_y)
+        return event
+
+    def accuse(self, suspect_name, weapon_name):
+        """
+        Checks an accusation. It is only valid for a known suspect and a
+        weapon the player has picked up; a correct one ends the game.
+        """
+        valid = suspect_name in self.suspect_names and weapon_name in self.inventory
+        correct = (valid and suspect_name == self.murderer["name"]
+                   and weapon_name == self.murder_weapon["name"])
+        if valid:
+            self.accusations += 1
+            self.accused.add((suspect_name, weapon_name))
+        if correct:
+            self.solved = True
+        return {"type": "accuse", "suspect": suspect_name, "weapon": weapon_name,
+                "valid": valid, "correct": correct}
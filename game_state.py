@@ -0,0 +1,199 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from chat_context import ChatMemory
+from engine import GameEngine
+
+WELCOME_MESSAGE = "Welcome to the mansion! Search for clues—and do be careful…"
+
+
+class GameState(GameEngine):
+    """
+    Everything that belongs to one player's game: the rules state from
+    GameEngine (position, inventory, entities, murderer and weapon), plus
+    the story, the chat history and what the browser has been sent.
+
+    The map and navigator are shared read-only between games; GameEngine
+    copies the entity lists so picking up a weapon in one game doesn't
+    affect another. Callers must hold `lock` while reading or mutating the state.
+    """
+
+    def __init__(self, game_map, rooms, selected_room_names, scenario, navigator=None):
+        self.lock = threading.RLock()
+        self.rooms = rooms
+        self.selected_room_names = selected_room_names
+        GameEngine.__init__(self, game_map, navigator=navigator, scenario=scenario)
+
+        self.game_message = WELCOME_MESSAGE
+        # Events pushed to the browser carry an increasing seq so the client
+        # can ignore anything it has already applied from an HTTP response.
+        self.seq = 0
+        # Highest client input number applied by /api/inputs, so a retried
+        # batch doesn't move the player twice.
+        self.input_seq = 0
+        self.push_token = uuid.uuid4().hex
+        self.chat_history = ChatMemory()
+
+        self.story = scenario["story"]
+        self.intro = scenario["intro"]
+
+        # Set by SessionStore. journal_seq numbers this game's events in
+        # the GameJournal; snapshot_seq is the last one snapshotted.
+        self.session_id = None
+        self.journal_seq = 0
+        self.snapshot_seq = 0
+
+    def snapshot(self):
+        """
+        Everything needed to rebuild this game, as JSON-ready data.
+        """
+        data = GameEngine.snapshot(self)
+        data.update({
+            "story": self.story,
+            "intro": self.intro,
+            "message": self.game_message,
+            "seq": self.seq,
+            "inputSeq": self.input_seq,
+            "pushToken": self.push_token,
+            "chat": self.chat_history.to_dict(),
+            "journalSeq": self.journal_seq,
+        })
+        return data
+
+    @classmethod
+    def from_snapshot(cls, data, game_map, rooms, selected_room_names, navigator=None):
+        state = cls(game_map, rooms, selected_room_names, data, navigator)
+        state.restore(data)
+        state.game_message = data["message"]
+        state.seq = data["seq"]
+        state.input_seq = data["inputSeq"]
+        state.push_token = data["pushToken"]
+        state.chat_history = ChatMemory.from_dict(data["chat"])
+        state.journal_seq = state.snapshot_seq = data["journalSeq"]
+        return state
+
+
+class SessionStore:
+    """
+    Thread-safe, bounded map of session id -> GameState.
+
+    Sessions are kept in least-recently-used order, so idle eviction only has
+    to look at the front of the OrderedDict and the size cap drops the
+    oldest game first. Both are amortised O(1) per request.
+
+    An optional loader(session_id) is asked for sessions the store doesn't
+    hold (after a restart, or once evicted); it returns a rebuilt
+    GameState or None. An optional on_evict(session_id) is called, outside
+    the store lock, for every session idle eviction or the cap drops.
+    """
+
+    def __init__(self, factory, max_sessions=5000, idle_timeout=30 * 60, loader=None, on_evict=None):
+        self.factory = factory
+        self.loader = loader
+        self.on_evict = on_evict
+        self._evicted_ids = []
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+        self._last_access = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+        self.loaded = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def get(self, session_id):
+        """
+        Returns the GameState for session_id, or None if it is unknown or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._touch(session_id, now)
+        self._report_evictions()
+        if state is not None:
+            return state
+        if self.loader is None:
+            return None
+
+        # Rebuild outside the store lock: it reads from disk.
+        state = self.loader(session_id)
+        if state is None:
+            return None
+        state.session_id = session_id
+        with self._lock:
+            # Another request may have loaded it meanwhile; keep theirs.
+            state = self._sessions.setdefault(session_id, state)
+            self._touch(session_id, now)
+            self.loaded += 1
+            self._enforce_cap()
+        self._report_evictions()
+        return state
+
+    def get_or_create(self, session_id):
+        """
+        Returns (session_id, state), creating a new game under a fresh id
+        when session_id is missing or has been evicted.
+        """
+        if session_id:
+            state = self.get(session_id)
+            if state is not None:
+                return session_id, state
+
+        # Build the game outside the store lock: it may call the LLM.
+        state = self.factory()
+        session_id = uuid.uuid4().hex
+        state.session_id = session_id
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = state
+            self._touch(session_id, now)
+            self.created += 1
+            self._enforce_cap()
+        self._report_evictions()
+        return session_id, state
+
+    def _enforce_cap(self):
+        while len(self._sessions) > self.max_sessions:
+            old_id, _ = self._sessions.popitem(last=False)
+            del self._last_access[old_id]
+            self._evicted(old_id)
+
+    def discard(self, session_id):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None:
+                del self._last_access[session_id]
+
+    def _touch(self, session_id, now):
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = now
+
+    def _evict_idle(self, now):
+        cutoff = now - self.idle_timeout
+        while self._sessions:
+            oldest_id = next(iter(self._sessions))
+            if self._last_access[oldest_id] >= cutoff:
+                break
+            del self._sessions[oldest_id]
+            del self._last_access[oldest_id]
+            self._evicted(oldest_id)
+
+    def _evicted(self, session_id):
+        self.evicted += 1
+        if self.on_evict is not None:
+            self._evicted_ids.append(session_id)
+
+    def _report_evictions(self):
+        if not self._evicted_ids:
+            return
+        with self._lock:
+            evicted, self._evicted_ids = self._evicted_ids, []
+        for session_id in evicted:
+            self.on_evict(session_id)
@@ -0,0 +1,226 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class GameJournal:
+    """
+    Durable game state: an append-only log of events per session, plus a
+    snapshot per session that the log is replayed on top of. Stored in a
+    local SQLite file in WAL mode.
+
+    record() and snapshot() only serialize and queue; a writer thread
+    commits everything that has queued up since its last commit in one
+    transaction (group commit), so the request path never waits on disk
+    and a burst of moves costs one commit, not one each. Writing a snapshot
+    drops the events it covers, which keeps the log short.
+
+    Anything still queued when the process dies is lost, typically the
+    last few milliseconds of play. close() (registered with atexit by the
+    frontend) commits the queue on a clean exit.
+
+    Sessions nobody has played for `max_age` seconds are deleted by the
+    writer, at most once every `prune_every` seconds (None keeps them
+    forever). Games evicted from memory are still loaded back from here,
+    so age is the only thing that retires them.
+    """
+
+    def __init__(self, path, max_batch=5000, max_age=None, prune_every=600.0, clock=time.time):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.prune_every = prune_every
+        self.clock = clock
+        self.recorded = 0
+        self.committed = 0
+        self.commits = 0
+        self.commit_seconds = 0.0
+        self.pruned = 0
+        self._next_prune = 0.0
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._db = self._connect()
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " session TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (session, seq)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " session TEXT PRIMARY KEY,"
+            " seq INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " updated REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS snapshots_updated ON snapshots (updated);"
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL);"
+        )
+        self._writer = threading.Thread(target=self._write_loop, name="game-journal", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only syncs at checkpoints: a power cut can lose
+        # the latest commits but never corrupts the file.
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def record(self, session_id, seq, kind, data):
+        """
+        Queues one event. seq must increase per session.
+        """
+        self.recorded += 1
+        self._queue.put(("event", session_id, seq, kind, json.dumps(data, separators=(",", ":"))))
+
+    def snapshot(self, session_id, seq, data):
+        """
+        Queues a snapshot of the session as of event seq, replacing the
+        previous one and every event up to seq.
+        """
+        self._queue.put(("snapshot", session_id, seq, None, json.dumps(data, separators=(",", ":"))))
+
+    def forget(self, session_id):
+        self._queue.put(("forget", session_id, None, None, None))
+
+    def prune(self):
+        """
+        Queues the deletion of every session idle for more than max_age.
+        The writer also does this on its own every prune_every seconds.
+        """
+        if self.max_age is not None:
+            self._queue.put(("prune", None, None, None, None))
+
+    def flush(self, timeout=None):
+        """
+        Waits until everything queued so far has been committed.
+        """
+        done = threading.Event()
+        self._queue.put(("flush", done, None, None, None))
+        return done.wait(timeout)
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Everything that queued while the last commit ran goes into
+            # this one.
+            while item is not None and len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            stop = batch[-1] is None
+            batch = [i for i in batch if i is not None]
+            if self.max_age is not None and self.clock() >= self._next_prune:
+                self._next_prune = self.clock() + self.prune_every
+                batch.append(("prune", None, None, None, None))
+            self._commit(db, batch)
+            if stop:
+                db.close()
+                return
+
+    def _commit(self, db, batch):
+        start = time.perf_counter()
+        events = 0
+        pruned = 0
+        waiters = []
+        played = set()
+        prune = False
+        now = self.clock()
+        db.execute("BEGIN")
+        try:
+            for op, session_id, seq, kind, data in batch:
+                if op == "event":
+                    db.execute("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?)",
+                               (session_id, seq, kind, data))
+                    played.add(session_id)
+                    events += 1
+                elif op == "snapshot":
+                    db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                               (session_id, seq, data, now))
+                    db.execute("DELETE FROM events WHERE session = ? AND seq <= ?", (session_id, seq))
+                    played.discard(session_id)
+                elif op == "forget":
+                    db.execute("DELETE FROM snapshots WHERE session = ?", (session_id,))
+                    db.execute("DELETE FROM events WHERE session = ?", (session_id,))
+                    played.discard(session_id)
+                elif op == "prune":
+                    prune = True
+                elif op == "flush":
+                    waiters.append(session_id)
+            # A snapshot's updated time is the session's last activity,
+            # so sessions played in this batch are touched before pruning.
+            db.executemany("UPDATE snapshots SET updated = ? WHERE session = ?",
+                           [(now, session_id) for session_id in played])
+            if prune:
+                cutoff = now - self.max_age
+                db.execute("DELETE FROM events WHERE session IN"
+                           " (SELECT session FROM snapshots WHERE updated < ?)", (cutoff,))
+                pruned = db.execute("DELETE FROM snapshots WHERE updated < ?", (cutoff,)).rowcount
+            db.execute("COMMIT")
+        except sqlite3.Error:
+            # Keep the writer alive: losing one batch beats losing them all.
+            logger.exception("Game journal commit of %d items failed", len(batch))
+            db.execute("ROLLBACK")
+            events = 0
+            pruned = 0
+        finally:
+            for done in waiters:
+                done.set()
+        self.committed += events
+        self.pruned += pruned
+        self.commits += 1
+        self.commit_seconds += time.perf_counter() - start
+
+    def load(self, session_id):
+        """
+        Returns (snapshot, events) for session_id, events being
+        (seq, kind, data) newer than the snapshot in order, or None if the
+        session was never snapshotted.
+        """
+        self.flush()
+        with self._read_lock:
+            row = self._db.execute(
+                "SELECT seq, data FROM snapshots WHERE session = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            rows = self._db.execute(
+                "SELECT seq, kind, data FROM events WHERE session = ? AND seq > ? ORDER BY seq",
+                (session_id, row[0])).fetchall()
+        snapshot = json.loads(row[1])
+        return snapshot, [(seq, kind, json.loads(data)) for seq, kind, data in rows]
+
+    def get_meta(self, key):
+        with self._read_lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        with self._read_lock:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+    def metrics(self):
+        return {
+            "recorded": self.recorded,
+            "committed": self.committed,
+            "queued": self._queue.qsize(),
+            "commits": self.commits,
+            "pruned": self.pruned,
+            "meanBatch": self.committed / self.commits if self.commits else 0.0,
+            "meanCommitMs": self.commit_seconds / self.commits * 1000 if self.commits else 0.0,
+        }
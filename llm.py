@@ -0,0 +1,619 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+
+import aiohttp
+import openai
+import requests
+from openai import error as openai_error
+
+import telemetry
+from chat_context import estimate_tokens
+from llm_cache import ResponseCache, cache_key
+from llm_scheduler import LLMScheduler, INTERACTIVE
+
+DEFAULT_MODEL = "gpt-4o"
+NO_KEY_TEXT = "(No OPENAI_API_KEY configured.)"
+FALLBACK_TEXT = "(No answer. The suspect stares past you; try again in a moment.)"
+
+
+class MissingAPIKey(Exception):
+    """
+    Raised by chat_completion() when a request isn't cached and there is no
+    OPENAI_API_KEY to send it with.
+    """
+
+
+class LLMUnavailable(Exception):
+    """
+    Raised when the API can't be reached in time: the circuit breaker is
+    open, or every retry failed or the call ran out of its deadline.
+    Callers show FALLBACK_TEXT instead of the error.
+    """
+
+
+def _use_standin():
+    """
+    ELASTICLUE_LLM_STANDIN=1 plays against the bundled openai_standin
+    server, started in this process, instead of the real API, so neither
+    a key nor the network is needed. ELASTICLUE_LLM_STANDIN_LATENCY is its
+    first-token latency as a Latency spec. To use a stand-in started on its
+    own (python openai_standin.py ...), set OPENAI_API_BASE instead.
+    """
+    if os.getenv("ELASTICLUE_LLM_STANDIN", "") != "1":
+        return None
+    from openai_standin import start_standin
+    server, api_base = start_standin(first_token=os.getenv("ELASTICLUE_LLM_STANDIN_LATENCY", "lognormal:0.4:0.4"))
+    openai.api_base = api_base
+    # logic.py reads the key from the environment too.
+    os.environ.setdefault("OPENAI_API_KEY", "sk-standin")
+    openai.api_key = os.environ["OPENAI_API_KEY"]
+    return server
+
+standin = _use_standin()
+
+
+def _open_cache():
+    """
+    The on-disk response cache every call below goes through.
+    ELASTICLUE_LLM_CACHE sets the SQLite path ("off" disables caching, the
+    default with the stand-in, whose replies shouldn't mix with real ones);
+    ELASTICLUE_LLM_REPLAY=1 serves from the cache only, never the network.
+    """
+    default = "off" if standin is not None else \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite")
+    path = os.getenv("ELASTICLUE_LLM_CACHE", default)
+    if path.lower() == "off":
+        return None
+    return ResponseCache(
+        path,
+        max_entries=int(os.getenv("ELASTICLUE_LLM_CACHE_MAX_ENTRIES", "10000")),
+        ttl=float(os.getenv("ELASTICLUE_LLM_CACHE_TTL", str(7 * 24 * 3600))),
+        replay_only=os.getenv("ELASTICLUE_LLM_REPLAY", "") == "1",
+    )
+
+cache = _open_cache()
+
+
+class CircuitBreaker:
+    """
+    Stops calling an API that keeps failing. After threshold consecutive
+    failed calls the circuit opens and allow() says no for cooldown
+    seconds, so callers fall back at once instead of each waiting out
+    their own retries. Then a single probe call is let through: success
+    closes the circuit, failure opens it for another cooldown.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probe_started is not None or self.clock() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = self.clock()
+            if now - self._opened_at < self.cooldown:
+                return False
+            # A probe that never reported back (its caller went away)
+            # doesn't keep the circuit shut forever.
+            if self._probe_started is not None and now - self._probe_started < self.cooldown:
+                return False
+            self._probe_started = now
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probe_started is not None or (self._opened_at is None and self.failures >= self.threshold):
+                self.trips += 1
+                self._opened_at = self.clock()
+                self._probe_started = None
+
+
+class _PooledSession(requests.Session):
+    """
+    One keep-alive connection pool shared by every thread. openai 0.28
+    "closes" each thread's session every three minutes; since they are all
+    this one, that would drop every idle connection, so close() is a no-op.
+    """
+
+    def close(self):
+        pass
+
+
+def _retryable(e):
+    """
+    Errors worth another attempt: rate limits, timeouts, dropped
+    connections and server-side failures. Bad requests and auth errors
+    would fail the same way again.
+    """
+    if isinstance(e, (openai_error.RateLimitError, openai_error.Timeout, openai_error.APIConnectionError,
+                      openai_error.ServiceUnavailableError, openai_error.TryAgain)):
+        return True
+    if isinstance(e, openai_error.APIError):
+        return e.http_status is None or e.http_status >= 500
+    # Streams are read outside openai's error wrapping.
+    return isinstance(e, (requests.RequestException, aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class LLMClient:
+    """
+    How every call below reaches the chat-completions API:
+
+    - Connections come from one keep-alive pool (requests for the blocking
+      calls, one aiohttp session per event loop for the async ones), so a
+      chat turn on a fresh request thread doesn't pay for a new TLS
+      handshake.
+    - Each attempt has a timeout and the whole call a deadline.
+    - Retryable errors are retried up to `retries` times with full-jitter
+      exponential backoff, honouring Retry-After on 429s. A stream is only
+      retried until its first token; after that the player has seen text.
+    - A CircuitBreaker fails calls fast while the API is down.
+
+    Calls that can't be completed raise LLMUnavailable. metrics() reports
+    outcomes and recent latencies for /api/metrics.
+    """
+
+    def __init__(self, timeout=20.0, connect_timeout=3.05, deadline=45.0, retries=3,
+                 backoff=0.25, max_backoff=8.0, pool_size=32, breaker=None, window=1024):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        # Called with the backoff delay on every 429 (LLMScheduler.pause).
+        self.on_rate_limit = None
+        self.session = _PooledSession()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._aio_sessions = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.short_circuited = 0
+        self.errors = {}
+
+    def _aio_session(self):
+        loop = asyncio.get_running_loop()
+        session = self._aio_sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+            self._aio_sessions[loop] = session
+        return session
+
+    def _begin(self):
+        with self._lock:
+            self.calls += 1
+        if not self.breaker.allow():
+            with self._lock:
+                self.short_circuited += 1
+            raise LLMUnavailable("circuit breaker open")
+        start = time.monotonic()
+        return start, start + self.deadline
+
+    def _request_timeout(self, deadline):
+        remaining = max(0.1, deadline - time.monotonic())
+        return (min(self.connect_timeout, remaining), min(self.timeout, remaining))
+
+    def _retry_delay(self, e, attempt, deadline):
+        """
+        Seconds to wait before retrying after e, or None to give up.
+        """
+        with self._lock:
+            name = type(e).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+        if not _retryable(e) or attempt >= self.retries:
+            return None
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = (getattr(e, "headers", None) or {}).get("retry-after")
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        if isinstance(e, openai_error.RateLimitError) and self.on_rate_limit is not None:
+            self.on_rate_limit(delay)
+        if time.monotonic() + delay >= deadline:
+            return None
+        with self._lock:
+            self.retried += 1
+        return delay
+
+    def _succeeded(self, start):
+        self.breaker.success()
+        with self._lock:
+            self.succeeded += 1
+            self._latencies.append(time.monotonic() - start)
+
+    def _give_up(self, e):
+        """
+        Records a call that failed for good and returns what to raise.
+        """
+        with self._lock:
+            self.failed += 1
+        if not _retryable(e):
+            # The API answered, so it is up; this request is just bad.
+            self.breaker.success()
+            return e
+        self.breaker.failure()
+        unavailable = LLMUnavailable(f"LLM unavailable: {e}")
+        unavailable.__cause__ = e
+        return unavailable
+
+    def create(self, **params):
+        """
+        Blocking ChatCompletion.create() with retries; returns the response.
+        """
+        start, deadline = self._begin()
+        attempt = 0
+        while True:
+            try:
+                response = openai.ChatCompletion.create(request_timeout=self._request_timeout(deadline), **params)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise self._give_up(e)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._succeeded(start)
+            return response
+
+    def stream(self, **params):
+        """
+        Yields the chunks of a streamed ChatCompletion, retrying until the
+        first one arrives.
+        """
+        start, deadline = self._begin()
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for chunk in openai.ChatCompletion.create(
+                        stream=True, request_timeout=self._request_timeout(deadline), **params):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise self._give_up(e)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._succeeded(start)
+            return
+
+    async def astream(self, **params):
+        """
+        Async version of stream(), on this event loop's pooled session.
+        """
+        start, deadline = self._begin()
+        openai.aiosession.set(self._aio_session())
+        attempt = 0
+        while True:
+            started = False
+            try:
+                response = await openai.ChatCompletion.acreate(
+                    stream=True, request_timeout=self._request_timeout(deadline), **params)
+                async for chunk in response:
+                    started = True
+                    yield chunk
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise self._give_up(e)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._succeeded(start)
+            return
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            errors = dict(self.errors)
+            counts = {
+                "calls": self.calls,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retried": self.retried,
+                "shortCircuited": self.short_circuited,
+            }
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return {
+            **counts,
+            "errors": errors,
+            "breaker": {"state": self.breaker.state, "trips": self.breaker.trips},
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            "latency_max_ms": latencies[-1] * 1000 if latencies else None,
+        }
+
+
+def _make_client():
+    """
+    ELASTICLUE_LLM_TIMEOUT is the per-attempt timeout and
+    ELASTICLUE_LLM_DEADLINE the whole call's, in seconds;
+    ELASTICLUE_LLM_RETRIES, ELASTICLUE_LLM_POOL_SIZE,
+    ELASTICLUE_LLM_BREAKER_THRESHOLD and ELASTICLUE_LLM_BREAKER_COOLDOWN
+    tune the rest.
+    """
+    return LLMClient(
+        timeout=float(os.getenv("ELASTICLUE_LLM_TIMEOUT", "20")),
+        deadline=float(os.getenv("ELASTICLUE_LLM_DEADLINE", "45")),
+        retries=int(os.getenv("ELASTICLUE_LLM_RETRIES", "3")),
+        pool_size=int(os.getenv("ELASTICLUE_LLM_POOL_SIZE", "32")),
+        breaker=CircuitBreaker(
+            threshold=int(os.getenv("ELASTICLUE_LLM_BREAKER_THRESHOLD", "5")),
+            cooldown=float(os.getenv("ELASTICLUE_LLM_BREAKER_COOLDOWN", "30")),
+        ),
+    )
+
+client = _make_client()
+openai.requestssession = client.session
+
+
+def _make_scheduler():
+    """
+    ELASTICLUE_LLM_RPM and ELASTICLUE_LLM_TPM are the account's requests
+    and tokens per minute (0 for no limit).
+    """
+    return LLMScheduler(
+        requests_per_minute=float(os.getenv("ELASTICLUE_LLM_RPM", "500")),
+        tokens_per_minute=float(os.getenv("ELASTICLUE_LLM_TPM", "30000")),
+    )
+
+scheduler = _make_scheduler()
+client.on_rate_limit = scheduler.pause
+
+
+def _prompt_tokens(messages):
+    return sum(estimate_tokens(str(m["content"])) for m in messages)
+
+
+def _admission(session, priority, messages, max_tokens):
+    """
+    Arguments for LLMScheduler.acquire(). Interactive calls give up after
+    the client's deadline; background ones wait as long as it takes.
+    """
+    timeout = client.deadline if priority == INTERACTIVE else None
+    return session, _prompt_tokens(messages) + max_tokens, priority, timeout
+
+
+def _admit(session, priority, messages, max_tokens):
+    ticket = scheduler.acquire(*_admission(session, priority, messages, max_tokens))
+    if ticket is None:
+        raise LLMUnavailable("LLM request queue wait exceeded the deadline")
+    return ticket
+
+
+async def _aadmit(session, priority, messages, max_tokens):
+    ticket = await scheduler.aacquire(*_admission(session, priority, messages, max_tokens))
+    if ticket is None:
+        raise LLMUnavailable("LLM request queue wait exceeded the deadline")
+    return ticket
+
+
+def _cached(model, messages, max_tokens, temperature):
+    """
+    Returns (key, cached_text). cached_text is None on a miss; in replay-only
+    mode a miss raises CacheMiss instead.
+    """
+    if cache is None:
+        return None, None
+    key = cache_key(model, messages, max_tokens=max_tokens, temperature=temperature)
+    return key, cache.get_or_raise(key)
+
+
+def _store(key, model, text):
+    if cache is not None and key is not None and text:
+        cache.put(key, model, text)
+
+
+def _observe(span, kind, model, messages, start, text, cached, usage=None):
+    """
+    Puts token counts and latency on the call's span and metrics.
+    Token counts come from the API's usage block when there is one and
+    are estimated otherwise (cached and streamed replies).
+    """
+    if not telemetry.enabled:
+        return
+    elapsed = time.perf_counter() - start
+    usage = usage or {}
+    prompt_tokens = usage.get("prompt_tokens") or _prompt_tokens(messages)
+    completion_tokens = usage.get("completion_tokens") or estimate_tokens(text or "")
+    span.set_attributes({
+        "llm.prompt_tokens": prompt_tokens,
+        "llm.completion_tokens": completion_tokens,
+        "llm.cached": cached,
+        "llm.latency_ms": elapsed * 1000,
+    })
+    telemetry.record_llm_call(model, elapsed, prompt_tokens, cached=cached, kind=kind)
+
+
+def _span_attributes(model, max_tokens, temperature):
+    return {"llm.model": model, "llm.max_tokens": max_tokens, "llm.temperature": temperature}
+
+
+def chat_completion(messages, model=DEFAULT_MODEL, max_tokens=100, temperature=0.9,
+                    session=None, priority=INTERACTIVE, charge=None):
+    """
+    Blocking call; returns the assistant's reply text.
+    Raises MissingAPIKey if there's no key and no cached reply,
+    LLMUnavailable if the API couldn't be reached in time, and otherwise
+    whatever openai raises, so callers can decide how to report it.
+
+    Uncached calls wait their turn with the scheduler; session and
+    priority decide where they queue. charge(text), if given, is called
+    with the reply only when it came from the API, not from the cache.
+    """
+    with telemetry.span("llm.chat_completion", _span_attributes(model, max_tokens, temperature)) as span:
+        start = time.perf_counter()
+        key, text = _cached(model, messages, max_tokens, temperature)
+        if text is not None:
+            _observe(span, "completion", model, messages, start, text, cached=True)
+            return text
+        if not openai.api_key:
+            raise MissingAPIKey(NO_KEY_TEXT)
+        ticket = _admit(session, priority, messages, max_tokens)
+        used = ticket.cost
+        try:
+            response = client.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            text = response["choices"][0]["message"]["content"]
+            used = (response.get("usage") or {}).get("total_tokens") or _prompt_tokens(messages) + estimate_tokens(text)
+        finally:
+            scheduler.settle(ticket, used)
+        _store(key, model, text)
+        _observe(span, "completion", model, messages, start, text, cached=False, usage=response.get("usage"))
+        if charge is not None:
+            charge(text)
+        return text
+
+
+def _chunk_text(chunk):
+    choices = chunk.get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
+
+
+def stream_chat(messages, model=DEFAULT_MODEL, max_tokens=100, temperature=0.9,
+                session=None, priority=INTERACTIVE, charge=None):
+    """
+    Yields the reply in pieces as the API streams them.
+    Errors are yielded as a final piece rather than raised, matching how
+    the chat UIs have always shown them: FALLBACK_TEXT if the API is
+    unavailable, "(OpenAI error: ...)" otherwise.
+
+    charge(text), if given, is called once with what the API sent, even
+    if it broke off, and not at all for cached replies, NO_KEY_TEXT or
+    error text.
+    """
+    # Generators can be resumed from other contexts, so the span isn't made current.
+    with telemetry.span("llm.stream_chat", _span_attributes(model, max_tokens, temperature), current=False) as span:
+        start = time.perf_counter()
+        parts = []
+        try:
+            key, text = _cached(model, messages, max_tokens, temperature)
+            if text is not None:
+                _observe(span, "stream", model, messages, start, text, cached=True)
+                yield text
+                return
+            if not openai.api_key:
+                yield NO_KEY_TEXT
+                return
+            ticket = _admit(session, priority, messages, max_tokens)
+            try:
+                for chunk in client.stream(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                ):
+                    text = _chunk_text(chunk)
+                    if text:
+                        if not parts:
+                            span.set_attribute("llm.first_token_ms", (time.perf_counter() - start) * 1000)
+                        parts.append(text)
+                        yield text
+            finally:
+                scheduler.settle(ticket, _prompt_tokens(messages) + estimate_tokens("".join(parts)))
+                if charge is not None and parts:
+                    charge("".join(parts))
+            _store(key, model, "".join(parts))
+            _observe(span, "stream", model, messages, start, "".join(parts), cached=False)
+        except LLMUnavailable as e:
+            span.record_exception(e)
+            # A reply cut off mid-stream keeps what already arrived.
+            yield f" {FALLBACK_TEXT}" if parts else FALLBACK_TEXT
+        except Exception as e:
+            span.record_exception(e)
+            yield f"(OpenAI error: {e})"
+
+
+async def astream_chat(messages, model=DEFAULT_MODEL, max_tokens=100, temperature=0.9,
+                       session=None, priority=INTERACTIVE, charge=None):
+    """
+    Async generator version of stream_chat(), so one event loop can keep
+    many conversations in flight without a thread each.
+    """
+    with telemetry.span("llm.astream_chat", _span_attributes(model, max_tokens, temperature), current=False) as span:
+        start = time.perf_counter()
+        parts = []
+        try:
+            key, text = _cached(model, messages, max_tokens, temperature)
+            if text is not None:
+                _observe(span, "stream", model, messages, start, text, cached=True)
+                yield text
+                return
+            if not openai.api_key:
+                yield NO_KEY_TEXT
+                return
+            ticket = await _aadmit(session, priority, messages, max_tokens)
+            try:
+                async for chunk in client.astream(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                ):
+                    text = _chunk_text(chunk)
+                    if text:
+                        if not parts:
+                            span.set_attribute("llm.first_token_ms", (time.perf_counter() - start) * 1000)
+                        parts.append(text)
+                        yield text
+            finally:
+                scheduler.settle(ticket, _prompt_tokens(messages) + estimate_tokens("".join(parts)))
+                if charge is not None and parts:
+                    charge("".join(parts))
+            _store(key, model, "".join(parts))
+            _observe(span, "stream", model, messages, start, "".join(parts), cached=False)
+        except LLMUnavailable as e:
+            span.record_exception(e)
+            # A reply cut off mid-stream keeps what already arrived.
+            yield f" {FALLBACK_TEXT}" if parts else FALLBACK_TEXT
+        except Exception as e:
+            span.record_exception(e)
+            yield f"(OpenAI error: {e})"
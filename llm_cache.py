@@ -0,0 +1,158 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class CacheMiss(Exception):
+    """
+    Raised in replay-only mode when a request isn't in the cache.
+    """
+
+
+def normalize_messages(messages):
+    """
+    Role and content only, with whitespace collapsed, so cosmetic
+    differences in prompt formatting still hit the same entry.
+    """
+    return [
+        {"role": m["role"].strip().lower(), "content": " ".join(str(m["content"]).split())}
+        for m in messages
+    ]
+
+
+def cache_key(model, messages, **params):
+    payload = json.dumps(
+        {"model": model, "messages": normalize_messages(messages), "params": params},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed store of LLM replies in a local SQLite file.
+
+    Entries are keyed by cache_key(model, messages, sampling params). Reads
+    refresh an entry's last_used time, and writes evict least-recently-used
+    entries once max_entries or max_bytes is exceeded. Entries older than
+    ttl seconds are treated as misses and removed.
+
+    With replay_only=True the cache never lets a request through to the
+    network: get_or_raise() raises CacheMiss instead, which keeps
+    benchmark and test runs deterministic and offline.
+
+    The entry count and byte total are counted once at open and then kept
+    up to date in memory, so a write only scans the table when it has
+    gone over a cap.
+    """
+
+    def __init__(self, path, max_entries=10000, max_bytes=64 * 1024 * 1024,
+                 ttl=7 * 24 * 3600, replay_only=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._count, self._bytes = self._totals()
+
+    def _totals(self):
+        return self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count -= 1
+                self._bytes -= row[2]
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def get_or_raise(self, key):
+        """
+        Like get(), but raises CacheMiss on a miss in replay-only mode.
+        """
+        response = self.get(key)
+        if response is None and self.replay_only:
+            raise CacheMiss(f"no cached response for {key[:12]} (replay-only mode)")
+        return response
+
+    def put(self, key, model, response):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            if old is None:
+                self._count += 1
+            else:
+                self._bytes -= old[0]
+            self._bytes += size
+            if self._count > self.max_entries or self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Recount first, in case another process shares the file.
+        count, total = self._totals()
+        # Walk from least recently used until both caps are met.
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._count, self._bytes = count, total
+        self.evictions += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._count = self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            count, total = self._count, self._bytes
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "replay_only": self.replay_only,
+        }
@@ -0,0 +1,299 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITIES = {"interactive": INTERACTIVE, "background": BACKGROUND}
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_minute, holding at most burst_seconds worth. A
+    rate of 0 means unlimited. The level may go negative when a call
+    turns out to cost more than was taken up front; that debt is paid
+    off by the refill before anything else is granted.
+    """
+
+    def __init__(self, rate_per_minute, burst_seconds=10.0, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds) if rate_per_minute else float("inf")
+        self.clock = clock
+        self.level = self.capacity
+        self._updated = clock()
+
+    def _refill(self, now):
+        if self.rate:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until amount can be taken (0 if it can be now).
+        """
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        if self.rate:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount, now):
+        if self.rate:
+            self._refill(now)
+            self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    """
+    One queued or granted LLM call. cost is the tokens charged up front.
+    """
+    __slots__ = ("session", "priority", "cost", "enqueued", "waited", "granted", "event", "loop", "future")
+
+    def __init__(self, session, priority, cost, now):
+        self.session = session
+        self.priority = priority
+        self.cost = cost
+        self.enqueued = now
+        self.waited = 0.0
+        self.granted = False
+        self.event = None
+        self.loop = None
+        self.future = None
+
+
+class LLMScheduler:
+    """
+    Admits LLM calls within requests-per-minute and tokens-per-minute
+    token buckets, so the game stays under the API's rate limits instead of
+    hitting them and retrying.
+
+    Each call asks for a slot with acquire() (or aacquire() on an event
+    loop), charging its estimated tokens (prompt plus max_tokens), and
+    reports what it really used with settle(). When the buckets are short,
+    calls wait in per-priority queues. Interactive calls are always served
+    before background ones. Within a priority, sessions take turns one call
+    at a time (round robin), so one chatty player can't starve the others,
+    and a session that had nothing queued is served first.
+
+    A 429 from the API calls pause(), which holds every grant until the
+    API's Retry-After has passed rather than letting each session find out
+    for itself.
+    """
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=30000, burst_seconds=10.0,
+                 clock=time.monotonic, window=1024):
+        self.clock = clock
+        self.requests = TokenBucket(requests_per_minute, burst_seconds, clock)
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds, clock)
+        # Per priority: each queued session's calls, and the order sessions
+        # are served in, sessions that had nothing queued (new) first.
+        self._calls = [{} for _ in PRIORITIES]
+        self._new = [deque() for _ in PRIORITIES]
+        self._old = [deque() for _ in PRIORITIES]
+        self._depth = [0] * len(PRIORITIES)
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+        self._dispatcher = None
+        self.granted = [0] * len(PRIORITIES)
+        self.queued = [0] * len(PRIORITIES)
+        self.timeouts = 0
+        self.pauses = 0
+        self.max_depth = 0
+        self._waits = [deque(maxlen=window) for _ in PRIORITIES]
+
+    def _wait_time(self, cost, now):
+        return max(self._paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(cost, now))
+
+    def _grant(self, ticket, now):
+        self.requests.take(1, now)
+        self.tokens.take(ticket.cost, now)
+        ticket.granted = True
+        ticket.waited = now - ticket.enqueued
+        self.granted[ticket.priority] += 1
+        self._waits[ticket.priority].append(ticket.waited)
+        if ticket.event is not None:
+            ticket.event.set()
+        elif ticket.future is not None:
+            ticket.loop.call_soon_threadsafe(_resolve, ticket.future)
+
+    def _submit(self, session, cost, priority, make_waiter):
+        """
+        Grants the ticket at once if nothing is queued and the buckets
+        allow it; otherwise queues it behind its session's earlier calls.
+        """
+        with self._cond:
+            now = self.clock()
+            ticket = Ticket(session, priority, cost, now)
+            if not any(self._depth) and self._wait_time(cost, now) == 0:
+                self._grant(ticket, now)
+                return ticket
+            make_waiter(ticket)
+            calls = self._calls[priority].get(session)
+            if calls is None:
+                # As in FQ-CoDel, a session with nothing queued is served
+                # before the backlogged ones: an occasional caller (a
+                # player asking one question) doesn't wait behind a
+                # chatty one, which still gets its turn every round.
+                self._calls[priority][session] = deque([ticket])
+                self._new[priority].append(session)
+            else:
+                calls.append(ticket)
+            self._depth[priority] += 1
+            self.queued[priority] += 1
+            self.max_depth = max(self.max_depth, sum(self._depth))
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="llm-scheduler", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+            return ticket
+
+    def acquire(self, session, cost, priority=INTERACTIVE, timeout=None):
+        """
+        Blocks until the call may go ahead; returns its Ticket, or None if
+        it waited longer than timeout seconds.
+        """
+        ticket = self._submit(session, cost, priority, _with_event)
+        if ticket.granted or ticket.event.wait(timeout) or not self._cancel(ticket):
+            return ticket
+        return None
+
+    async def aacquire(self, session, cost, priority=INTERACTIVE, timeout=None):
+        """
+        acquire() for coroutines: waits without blocking the event loop.
+        """
+        ticket = self._submit(session, cost, priority, _with_future)
+        if ticket.granted:
+            return ticket
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout)
+        except asyncio.TimeoutError:
+            if self._cancel(ticket):
+                return None
+        except asyncio.CancelledError:
+            if not self._cancel(ticket):
+                # Granted just as the caller went away: hand the tokens back.
+                self.settle(ticket, 0)
+            raise
+        return ticket
+
+    def _cancel(self, ticket):
+        """
+        Takes a ticket that gave up waiting out of its queue. Returns False
+        if it was granted in the meantime, in which case it goes ahead.
+        """
+        with self._cond:
+            if ticket.granted:
+                return False
+            calls = self._calls[ticket.priority].get(ticket.session)
+            if calls is not None and ticket in calls:
+                calls.remove(ticket)
+                if not calls:
+                    del self._calls[ticket.priority][ticket.session]
+                    for ring in (self._new[ticket.priority], self._old[ticket.priority]):
+                        if ticket.session in ring:
+                            ring.remove(ticket.session)
+                self._depth[ticket.priority] -= 1
+            self.timeouts += 1
+            return True
+
+    def settle(self, ticket, used_tokens):
+        """
+        Corrects the token bucket once a call's real cost is known.
+        """
+        if ticket is None:
+            return
+        with self._cond:
+            now = self.clock()
+            if used_tokens < ticket.cost:
+                self.tokens.give_back(ticket.cost - used_tokens, now)
+            else:
+                self.tokens.take(used_tokens - ticket.cost, now)
+            self._cond.notify()
+
+    def pause(self, seconds):
+        """
+        Holds all grants for seconds, after the API said we're over its limit.
+        """
+        with self._cond:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+            self.pauses += 1
+
+    def _next(self):
+        """
+        The ticket to serve next and the ring its session is at the head of.
+        """
+        for priority in range(len(PRIORITIES)):
+            for ring in (self._new[priority], self._old[priority]):
+                if ring:
+                    return self._calls[priority][ring[0]][0], ring
+        return None, None
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                ticket, ring = self._next()
+                if ticket is None:
+                    self._cond.wait()
+                    continue
+                now = self.clock()
+                wait = self._wait_time(ticket.cost, now)
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                ring.popleft()
+                calls = self._calls[ticket.priority][ticket.session]
+                calls.popleft()
+                if calls:
+                    # Back of the line for the session's next call.
+                    self._old[ticket.priority].append(ticket.session)
+                else:
+                    del self._calls[ticket.priority][ticket.session]
+                self._depth[ticket.priority] -= 1
+                self._grant(ticket, now)
+
+    def metrics(self):
+        with self._cond:
+            now = self.clock()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            result = {
+                "queued": sum(self._depth),
+                "maxQueued": self.max_depth,
+                "timeouts": self.timeouts,
+                "pauses": self.pauses,
+                "paused": self._paused_until > now,
+                "requestBucket": self.requests.level if self.requests.rate else None,
+                "tokenBucket": self.tokens.level if self.tokens.rate else None,
+            }
+            for name, priority in PRIORITIES.items():
+                waits = sorted(self._waits[priority])
+                result[name] = {
+                    "queued": self._depth[priority],
+                    "sessionsQueued": len(self._calls[priority]),
+                    "granted": self.granted[priority],
+                    "everQueued": self.queued[priority],
+                    "wait_p50_ms": waits[len(waits) // 2] * 1000 if waits else None,
+                    "wait_p95_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else None,
+                    "wait_max_ms": waits[-1] * 1000 if waits else None,
+                }
+            return result
+
+
+def _with_event(ticket):
+    ticket.event = threading.Event()
+
+
+def _with_future(ticket):
+    ticket.loop = asyncio.get_running_loop()
+    ticket.future = ticket.loop.create_future()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
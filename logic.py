@@ -5,9 +5,20 @@ import locale
 import os
 import json
 import textwrap
+from collections import OrderedDict
 
 import openai
 
+import telemetry
+from llm import chat_completion, MissingAPIKey
+from llm_scheduler import INTERACTIVE
+from chat_context import ChatMemory
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the bytearray backend needs nothing extra
+    np = None
+
 openai.api_key = os.getenv("OPENAI_API_KEY", None)
 
 locale.setlocale(locale.LC_ALL, '')
@@ -61,18 +72,17 @@ CLUE_CHAR = "\U0001F4DC"  # 📜
 murder_story = "(No full story generated.)"
 cryptic_intro = "(No intro)"
 
-chat_history = {}
+chat_history = ChatMemory()
 
-def generate_story_clues_and_intro(murderer_name, weapon_name, used_room_names):
+@telemetry.traced("story.generate")
+def generate_story_clues_and_intro(murderer_name, weapon_name, used_room_names, priority=INTERACTIVE):
     """
     Calls ChatGPT to create:
       - A short story about the murder (30-50 words).
       - A short spooky intro (10-20 words).
       - A list of six short textual clues referencing the scenario.
+    priority is the LLM scheduler's: BACKGROUND when nobody is waiting on it.
     """
-    if not openai.api_key:
-        return "(No story - missing OPENAI_API_KEY)", "(No intro)", []
-
     room_list_str = ", ".join(used_room_names)
     system_prompt = (
         "You are a creative assistant generating a Clue-like murder scenario. "
@@ -98,16 +108,17 @@ def generate_story_clues_and_intro(murderer_name, weapon_name, used_room_names):
     )
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
+        assistant_text = chat_completion(
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
             max_tokens=400,
-            temperature=0.9
+            temperature=0.9,
+            priority=priority
         )
-        assistant_text = response["choices"][0]["message"]["content"]
+    except MissingAPIKey:
+        return "(No story - missing OPENAI_API_KEY)", "(No intro)", []
     except Exception as e:
         return (f"(Failed to generate story via ChatGPT: {e})", "(No intro)", [])
 
@@ -128,90 +139,421 @@ def generate_story_clues_and_intro(murderer_name, weapon_name, used_room_names):
 
     return story_text, intro_text, clues_list
 
-def generate_game_map(num_rooms, overall_width, overall_height):
+class TileGrid:
     """
-    Dynamically generate a game map with the specified number of rooms.
+    Compact map: one byte per tile (the tile character's code), stored
+    row-major in a bytearray, or in a NumPy uint8 array when
+    backend="numpy" and NumPy is installed.
+
+    Rooms are carved with slice assignment instead of per-cell loops, and
+    to_strings() produces the same list of row strings as generate_game_map.
+    """
+
+    def __init__(self, width, height, fill=WALL_CHAR, backend="bytearray"):
+        self.width = width
+        self.height = height
+        self.backend = backend
+        code = ord(fill)
+        if backend == "numpy":
+            if np is None:
+                raise RuntimeError("backend='numpy' requires numpy to be installed")
+            self.cells = np.full((height, width), code, dtype=np.uint8)
+        elif backend == "bytearray":
+            self.cells = bytearray([code]) * (width * height)
+        else:
+            raise ValueError(f"Unknown TileGrid backend: {backend!r}")
+        self._wall_code = ord(WALL_CHAR)
+
+    def __len__(self):
+        return self.height
+
+    def get(self, x, y):
+        if self.backend == "numpy":
+            return chr(self.cells[y, x])
+        return chr(self.cells[y * self.width + x])
+
+    def set(self, x, y, tile):
+        if self.backend == "numpy":
+            self.cells[y, x] = ord(tile)
+        else:
+            self.cells[y * self.width + x] = ord(tile)
+
+    def fill_rect(self, x1, y1, x2, y2, tile):
+        """
+        Fills the inclusive rectangle (x1, y1)-(x2, y2), clipped to the grid.
+        """
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, self.width - 1), min(y2, self.height - 1)
+        if x1 > x2 or y1 > y2:
+            return
+        code = ord(tile)
+        if self.backend == "numpy":
+            self.cells[y1:y2 + 1, x1:x2 + 1] = code
+            return
+        run = bytes([code]) * (x2 - x1 + 1)
+        width = self.width
+        for row in range(y1, y2 + 1):
+            start = row * width + x1
+            self.cells[start:start + len(run)] = run
+
+    def write_text(self, x, y, text):
+        """
+        Writes text left-to-right starting at (x, y), clipped to the grid.
+        """
+        if not 0 <= y < self.height:
+            return
+        start, end = max(x, 0), min(x + len(text), self.width)
+        if start >= end:
+            return
+        data = text[start - x:end - x].encode("latin-1", "replace")
+        if self.backend == "numpy":
+            self.cells[y, start:end] = np.frombuffer(data, dtype=np.uint8)
+        else:
+            offset = y * self.width
+            self.cells[offset + start:offset + end] = data
+
+    def is_walkable(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        if self.backend == "numpy":
+            return bool(self.cells[y, x] != self._wall_code)
+        return self.cells[y * self.width + x] != self._wall_code
+
+    def to_strings(self):
+        """
+        Returns the map as a list of row strings, like generate_game_map.
+        """
+        raw = self.cells.tobytes() if self.backend == "numpy" else self.cells
+        text = raw.decode("latin-1")
+        width = self.width
+        return [text[i:i + width] for i in range(0, len(text), width)]
+
+# Smallest region one room may get, walls included: 6x3 floor tiles.
+# place_entities() keeps its suspect and weapon on the middle row at least
+# a tile apart, and its clue on the top row, so in a room this size or
+# larger no two entities share a tile.
+MIN_ROOM_WIDTH = 8
+MIN_ROOM_HEIGHT = 5
+
+# Layouts kept by map_cache, keyed by (seed, params).
+MAP_CACHE_SIZE = int(os.getenv("ELASTICLUE_MAP_CACHE_SIZE", "16"))
+
+def room_names(num_rooms):
+    """
+    POSSIBLE_ROOM_NAMES in order, then numbered repeats (Kitchen2, Ballroom2, ...).
+    """
+    base = len(POSSIBLE_ROOM_NAMES)
+    return [POSSIBLE_ROOM_NAMES[i % base] + (str(i // base + 1) if i >= base else "")
+            for i in range(num_rooms)]
+
+class MapLayout:
+    """
+    A generated map: the TileGrid, its rooms and the doors between them.
+
+    rooms are the dicts place_entities() expects (name, x1, y1, x2, y2,
+    center_x, center_y) plus an "id", their index in the list. Each door
+    is {"tiles": ((x, y), (x, y)), "rooms": (a, b)}, the two tiles going
+    from room a's wall to room b's, and graph maps each room id to the ids
+    it has a door to. The door graph is a spanning tree, so every room can
+    reach every other.
+
+    Layouts may be shared through map_cache; treat them as read-only.
+    """
+
+    def __init__(self, grid, rooms, doors, seed):
+        self.grid = grid
+        self.rooms = rooms
+        self.doors = doors
+        self.seed = seed
+        self.graph = {room["id"]: [] for room in rooms}
+        for door in doors:
+            a, b = door["rooms"]
+            self.graph[a].append(b)
+            self.graph[b].append(a)
+
+    @property
+    def room_names(self):
+        return [room["name"] for room in self.rooms]
+
+    def is_connected(self):
+        """
+        True if every room is reachable from the first through doors.
+        """
+        if not self.rooms:
+            return True
+        seen = {0}
+        frontier = [0]
+        while frontier:
+            for neighbour in self.graph[frontier.pop()]:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    frontier.append(neighbour)
+        return len(seen) == len(self.rooms)
+
+def _split_regions(rng, region, num_rooms, leaves, doors):
     """
-    grid = [[WALL_CHAR for _ in range(overall_width)] for _ in range(overall_height)]
-    cols = 2
-    rows = (num_rooms + cols - 1) // cols
-    room_width = overall_width // cols
-    room_height = overall_height // rows
+    Binary space partition: splits region (x, y, width, height) until each
+    part holds one room, appending the parts to leaves and one door per
+    split to doors. Returns the indexes into leaves of region's parts.
 
+    Each side of a split gets a whole number of minimum-size cells, enough
+    for its share of the rooms, so a split can never leave a side too
+    small. The door goes where a room on one side faces a room on the other.
+    """
+    x, y, width, height = region
+    if num_rooms == 1:
+        leaves.append(region)
+        return [len(leaves) - 1]
+
+    cols, rows = width // MIN_ROOM_WIDTH, height // MIN_ROOM_HEIGHT
+    # Cut across the side with more room-sized cells, so rooms stay close
+    # to the minimum room's proportions.
+    vertical = cols > rows or (cols == rows and rng.random() < 0.5)
+    if (cols if vertical else rows) < 2:
+        vertical = not vertical
+    length, cells, across = (width, cols, rows) if vertical else (height, rows, cols)
+
+    spread = cells // 4
+    first_cells = rng.randint(max(1, cells // 2 - spread), min(cells - 1, (cells + 1) // 2 + spread))
+    low = max(1, num_rooms - (cells - first_cells) * across)
+    high = min(num_rooms - 1, first_cells * across)
+    first_rooms = min(high, max(low, round(num_rooms * first_cells / cells)))
+    first_length = length * first_cells // cells
+
+    if vertical:
+        first = (x, y, first_length, height)
+        second = (x + first_length, y, width - first_length, height)
+    else:
+        first = (x, y, width, first_length)
+        second = (x, y + first_length, width, height - first_length)
+    first_ids = _split_regions(rng, first, first_rooms, leaves, doors)
+    second_ids = _split_regions(rng, second, num_rooms - first_rooms, leaves, doors)
+
+    # Rooms touching the split line on each side, with the span of floor
+    # along the line each one has. Walls are two tiles thick (one from each
+    # side), so a door is two tiles from one floor to the other.
+    split = x + first_length if vertical else y + first_length
+    axis, along = (0, 1) if vertical else (1, 0)
+
+    def facing(ids, on_first_side):
+        spans = []
+        for i in ids:
+            leaf = leaves[i]
+            edge = leaf[axis] + leaf[axis + 2] if on_first_side else leaf[axis]
+            if edge == split:
+                spans.append((leaf[along] + 1, leaf[along] + leaf[along + 2] - 2, i))
+        spans.sort()
+        return spans
+
+    first_spans, second_spans = facing(first_ids, True), facing(second_ids, False)
+    pairs = []
+    i = j = 0
+    while i < len(first_spans) and j < len(second_spans):
+        lo = max(first_spans[i][0], second_spans[j][0])
+        hi = min(first_spans[i][1], second_spans[j][1])
+        if lo <= hi:
+            pairs.append((lo, hi, first_spans[i][2], second_spans[j][2]))
+        if first_spans[i][1] < second_spans[j][1]:
+            i += 1
+        else:
+            j += 1
+    lo, hi, a, b = rng.choice(pairs)
+    at = rng.randint(lo, hi)
+    if vertical:
+        tiles = ((split - 1, at), (split, at))
+    else:
+        tiles = ((at, split - 1), (at, split))
+    doors.append({"tiles": tiles, "rooms": (a, b)})
+    return first_ids + second_ids
+
+def _build_layout(num_rooms, overall_width, overall_height, seed, backend):
+    if num_rooms < 1:
+        raise ValueError("A map needs at least one room")
+    capacity = (overall_width // MIN_ROOM_WIDTH) * (overall_height // MIN_ROOM_HEIGHT)
+    if capacity < num_rooms:
+        raise ValueError(
+            f"A {overall_width}x{overall_height} map holds at most {capacity} rooms "
+            f"of {MIN_ROOM_WIDTH}x{MIN_ROOM_HEIGHT}; asked for {num_rooms}")
+
+    rng = random.Random(seed)
+    leaves, doors = [], []
+    _split_regions(rng, (0, 0, overall_width, overall_height), num_rooms, leaves, doors)
+
+    grid = TileGrid(overall_width, overall_height, WALL_CHAR, backend)
     rooms = []
-    count = 0
-    selected_room_names = POSSIBLE_ROOM_NAMES[:num_rooms]
-
-    for r in range(rows):
-        for c in range(cols):
-            if count >= num_rooms:
-                break
-
-            x = c * room_width + 1
-            y = r * room_height + 1
-            room_inner_width = room_width - 2
-            room_inner_height = room_height - 2
-            room_name = selected_room_names[count]
-
-            rooms.append({
-                'name': room_name,
-                'center_x': x + room_inner_width // 2,
-                'center_y': y + room_inner_height // 2,
-                'x1': x,
-                'y1': y,
-                'x2': x + room_inner_width - 1,
-                'y2': y + room_inner_height - 1
-            })
-
-            for row in range(y, y + room_inner_height):
-                for col in range(x, x + room_inner_width):
-                    if 0 <= row < overall_height and 0 <= col < overall_width:
-                        grid[row][col] = FLOOR_CHAR
-
-            if c > 0: 
-                door_y = y + room_inner_height // 2
-                grid[door_y][x - 1] = DOOR_CHAR
-                grid[door_y][x - 2] = DOOR_CHAR
-            if r > 0:
-                door_x = x + 15
-                row_above = y - 1
-                if 0 <= row_above < len(grid) and 0 <= door_x < len(grid[0]):
-                    grid[row_above][door_x] = DOOR_CHAR
-                    grid[row_above-1][door_x] = DOOR_CHAR
-
-            top_wall_y = y - 1
-            top_wall_x = x
-            for i, ch in enumerate(room_name):
-                if (0 <= top_wall_y < overall_height and
-                    0 <= (top_wall_x + i) < overall_width):
-                    grid[top_wall_y][top_wall_x + i] = ch
-
-            count += 1
-
-    map_data = ["".join(row) for row in grid]
-    return map_data, rooms, selected_room_names
+    for room_id, ((x, y, width, height), name) in enumerate(zip(leaves, room_names(num_rooms))):
+        x1, y1 = x + 1, y + 1
+        x2, y2 = x + width - 2, y + height - 2
+        rooms.append({
+            'id': room_id,
+            'name': name,
+            'center_x': x1 + (x2 - x1 + 1) // 2,
+            'center_y': y1 + (y2 - y1 + 1) // 2,
+            'x1': x1,
+            'y1': y1,
+            'x2': x2,
+            'y2': y2,
+        })
+        grid.fill_rect(x1, y1, x2, y2, FLOOR_CHAR)
+        # The name sits in the room's own top wall, as it always has.
+        grid.write_text(x1, y, name[:x2 - x1 + 1])
+
+    for door in doors:
+        for x, y in door["tiles"]:
+            grid.set(x, y, DOOR_CHAR)
+    return MapLayout(grid, rooms, doors, seed)
+
+map_cache = OrderedDict()
+
+def generate_layout(num_rooms, overall_width, overall_height, seed=None, backend="bytearray"):
+    """
+    Builds a MapLayout with num_rooms rooms, in time linear in the map
+    area. The same seed and parameters always give the same map, and such
+    layouts are kept in map_cache so later games on them start instantly.
+    With no seed a fresh one is drawn from the random module (and kept in
+    layout.seed, so the map can be reproduced); those aren't cached.
+    """
+    if seed is None:
+        return _build_layout(num_rooms, overall_width, overall_height, random.getrandbits(32), backend)
+    key = (seed, num_rooms, overall_width, overall_height, backend)
+    layout = map_cache.get(key)
+    if layout is not None:
+        map_cache.move_to_end(key)
+        return layout
+    layout = map_cache[key] = _build_layout(num_rooms, overall_width, overall_height, seed, backend)
+    while len(map_cache) > MAP_CACHE_SIZE:
+        map_cache.popitem(last=False)
+    return layout
+
+@telemetry.traced("map.generate_tile_grid")
+def generate_tile_grid(num_rooms, overall_width, overall_height, backend="bytearray", seed=None):
+    """
+    Same layout as generate_game_map, but returns a TileGrid instead of
+    row strings: (grid, rooms, selected_room_names).
+    See generate_layout() for the door graph.
+    """
+    layout = generate_layout(num_rooms, overall_width, overall_height, seed, backend)
+    return layout.grid, layout.rooms, layout.room_names
+
+@telemetry.traced("map.generate")
+def generate_game_map(num_rooms, overall_width, overall_height, seed=None):
+    """
+    Dynamically generate a game map with the specified number of rooms.
+    """
+    grid, rooms, selected_room_names = generate_tile_grid(num_rooms, overall_width, overall_height, seed=seed)
+    return grid.to_strings(), rooms, selected_room_names
 
 def is_valid_tile(game_map, x, y):
-    rows = len(game_map)
-    cols = len(game_map[0]) if rows > 0 else 0
-    if 0 <= y < rows and 0 <= x < cols:
+    if isinstance(game_map, TileGrid):
+        return game_map.is_walkable(x, y)
+    if x < 0 or y < 0:
+        return False
+    try:
         return game_map[y][x] != WALL_CHAR
-    return False
-
-def find_suspect_at(x, y):
-    for s in suspects_data:
-        if s["x"] == x and s["y"] == y:
-            return s
-    return None
-
-def find_weapon_at(x, y):
-    for w in weapons_data:
-        if w["x"] == x and w["y"] == y and "collected" not in w:
-            return w
-    return None
-
-def find_clue_at(x, y):
-    for c in clues_data:
-        if c["x"] == x and c["y"] == y and "found" not in c:
-            return c
-    return None 
\ No newline at end of file
+    except IndexError:
+        return False
+
+class EntityIndex:
+    """
+    Spatial index of suspects, weapons and clues keyed by (x, y).
+
+    Lookups are a single dict probe instead of a scan over every entity.
+    Collected weapons and found clues are dropped from the index in place,
+    so the find_*_at helpers never have to re-check those flags.
+    Each tile keeps a list so entities sharing a tile behave like the old
+    linear scan: the first one placed is the one returned.
+    """
+
+    def __init__(self, suspects=(), weapons=(), clues=()):
+        self.suspects = {}
+        self.weapons = {}
+        self.clues = {}
+        for s in suspects:
+            self._add(self.suspects, s)
+        for w in weapons:
+            if "collected" not in w:
+                self._add(self.weapons, w)
+        for c in clues:
+            if "found" not in c:
+                self._add(self.clues, c)
+
+    @staticmethod
+    def _add(table, entity):
+        table.setdefault((entity["x"], entity["y"]), []).append(entity)
+
+    @staticmethod
+    def _remove(table, entity):
+        key = (entity["x"], entity["y"])
+        bucket = table.get(key)
+        if bucket and entity in bucket:
+            bucket.remove(entity)
+            if not bucket:
+                del table[key]
+
+    @staticmethod
+    def _first(table, x, y):
+        bucket = table.get((x, y))
+        return bucket[0] if bucket else None
+
+    def suspect_at(self, x, y):
+        return self._first(self.suspects, x, y)
+
+    def weapon_at(self, x, y):
+        return self._first(self.weapons, x, y)
+
+    def clue_at(self, x, y):
+        return self._first(self.clues, x, y)
+
+    def collect_weapon(self, weapon):
+        weapon["collected"] = True
+        self._remove(self.weapons, weapon)
+
+    def mark_clue_found(self, clue):
+        clue["found"] = True
+        self._remove(self.clues, clue)
+
+entity_index = EntityIndex(suspects_data, weapons_data, clues_data)
+
+def place_entities(rooms, suspects=None, weapons=None, clues=None):
+    """
+    Distributes suspects, weapons and clues among rooms (one of each per room)
+    and returns a fresh EntityIndex over them.
+    With no lists given, places the shared module-level data and rebuilds
+    the default index used by the find_*_at helpers.
+    """
+    use_defaults = suspects is None
+    if use_defaults:
+        suspects, weapons, clues = suspects_data, weapons_data, clues_data
+
+    for i, (suspect, weapon, clue) in enumerate(zip(suspects, weapons, clues)):
+        if i < len(rooms):
+            rm = rooms[i]
+            suspect["x"] = rm['x1'] + 2
+            suspect["y"] = rm['center_y']
+            weapon["x"] = rm['x2'] - 2
+            weapon["y"] = rm['center_y']
+            # Top floor row: center_y is always below it, so the clue
+            # never lands on the suspect's or weapon's tile.
+            clue["x"] = rm['center_x']
+            clue["y"] = rm['y1']
+
+    index = EntityIndex(suspects, weapons, clues)
+    if use_defaults:
+        global entity_index
+        entity_index = index
+    return index
+
+def find_suspect_at(x, y, index=None):
+    return (index or entity_index).suspect_at(x, y)
+
+def find_weapon_at(x, y, index=None):
+    return (index or entity_index).weapon_at(x, y)
+
+def find_clue_at(x, y, index=None):
+    return (index or entity_index).clue_at(x, y)
+
+def collect_weapon(weapon, index=None):
+    (index or entity_index).collect_weapon(weapon)
+
+def mark_clue_found(clue, index=None):
+    (index or entity_index).mark_clue_found(clue)
@@ -0,0 +1,263 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+import logic
+from logic import WALL_CHAR, TileGrid
+
+UNREACHABLE = -1
+
+# bytes.translate table: wall -> 0, anything else -> 1.
+_WALKABLE = bytes(0 if i == ord(WALL_CHAR) else 1 for i in range(256))
+
+
+def walkable_mask(game_map):
+    """
+    Returns (mask, width, height) for a TileGrid or a list of row strings,
+    where mask[y * width + x] is 1 for tiles is_valid_tile() accepts.
+    """
+    if isinstance(game_map, TileGrid):
+        raw = game_map.cells.tobytes() if game_map.backend == "numpy" else bytes(game_map.cells)
+        return raw.translate(_WALKABLE), game_map.width, game_map.height
+    height = len(game_map)
+    width = max((len(row) for row in game_map), default=0)
+    # Short rows are padded with walls, matching is_valid_tile's IndexError case.
+    raw = "".join(row.ljust(width, WALL_CHAR) for row in game_map).encode("latin-1", "replace")
+    return raw.translate(_WALKABLE), width, height
+
+
+def distance_field(mask, width, height, target, stop_at=()):
+    """
+    Breadth-first search out from target over walkable tiles.
+    Returns an array of step counts indexed by y * width + x,
+    with UNREACHABLE for walls and tiles cut off from the target.
+
+    If stop_at lists tiles, the search stops after the first ring that
+    reaches any of them, leaving tiles further out UNREACHABLE.
+    """
+    size = width * height
+    dist = array("i", [UNREACHABLE]) * size
+    tx, ty = target
+    if not (0 <= tx < width and 0 <= ty < height) or not mask[ty * width + tx]:
+        return dist
+    stops = [y * width + x for x, y in stop_at if 0 <= x < width and 0 <= y < height]
+    start = ty * width + tx
+    dist[start] = 0
+    frontier = [start]
+    d = 0
+    while frontier:
+        if stops and any(dist[i] >= 0 for i in stops):
+            break
+        d += 1
+        next_frontier = []
+        push = next_frontier.append
+        for i in frontier:
+            x = i % width
+            if x > 0:
+                j = i - 1
+                if mask[j] and dist[j] < 0:
+                    dist[j] = d
+                    push(j)
+            if x < width - 1:
+                j = i + 1
+                if mask[j] and dist[j] < 0:
+                    dist[j] = d
+                    push(j)
+            j = i - width
+            if j >= 0 and mask[j] and dist[j] < 0:
+                dist[j] = d
+                push(j)
+            j = i + width
+            if j < size and mask[j] and dist[j] < 0:
+                dist[j] = d
+                push(j)
+        frontier = next_frontier
+    return dist
+
+
+class DistanceField:
+    """
+    Distances from every tile to one target. Building it is a full BFS;
+    after that distance() is a lookup and path_from() only walks the path.
+    """
+
+    def __init__(self, mask, width, height, target, stop_at=()):
+        self.width = width
+        self.height = height
+        self.target = target
+        self.dist = distance_field(mask, width, height, target, stop_at)
+
+    def distance(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return UNREACHABLE
+        return self.dist[y * self.width + x]
+
+    def path_from(self, x, y):
+        """
+        Steps from (x, y) to the target, excluding (x, y) itself;
+        None if the target can't be reached from there.
+        """
+        d = self.distance(x, y)
+        if d == UNREACHABLE:
+            return None
+        dist, width = self.dist, self.width
+        i = y * width + x
+        step = 1
+        path = []
+        while d > 0:
+            d -= 1
+            # Keep going the same way while that's still downhill, so
+            # straight corridors cost one probe per tile.
+            j = i + step
+            if not (0 <= j < len(dist) and dist[j] == d and abs(j % width - i % width) <= 1):
+                for step in (1, -1, width, -width):
+                    j = i + step
+                    if 0 <= j < len(dist) and dist[j] == d and abs(j % width - i % width) <= 1:
+                        break
+            i = j
+            path.append((i % width, i // width))
+        return path
+
+
+class Navigator:
+    """
+    Pathfinding over one game map.
+
+    Distance fields are built lazily per target tile and kept in an LRU
+    cache, so repeated walks to the same suspect, weapon or clue only pay
+    for the BFS once. Every field holds one int per tile, so the cache
+    keeps at most `max_fields` of them and no more than about `max_cells`
+    tiles' worth in total: a 1000x1000 map keeps 16 by default.
+
+    A field depends only on the map and the target tile, so one Navigator
+    can be shared by every game on the same map. For the same reason,
+    picking an item up doesn't drop its tile's field: other games on the
+    map still have that item, and the LRU retires fields nobody walks to.
+    Thread-safe.
+    """
+
+    def __init__(self, game_map, max_fields=64, max_cells=16_000_000, eager_cells=100_000):
+        self.mask, self.width, self.height = walkable_mask(game_map)
+        self.max_fields = max(1, min(max_fields, max_cells // max(1, self.width * self.height)))
+        self.eager_cells = eager_cells
+        self._fields = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def field(self, x, y):
+        key = (x, y)
+        with self._lock:
+            field = self._fields.get(key)
+            if field is not None:
+                self._fields.move_to_end(key)
+                self.hits += 1
+                return field
+            self.misses += 1
+        # Build outside the lock; a racing duplicate build is harmless.
+        field = DistanceField(self.mask, self.width, self.height, key)
+        with self._lock:
+            self._fields[key] = field
+            if len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+        return field
+
+    def metrics(self):
+        with self._lock:
+            return {"fields": len(self._fields), "hits": self.hits, "misses": self.misses}
+
+    def distance(self, start, goal):
+        return self.field(*goal).distance(*start)
+
+    def path_to(self, start, goal):
+        """
+        Path from start to goal using goal's (cached) distance field.
+        """
+        return self.field(*goal).path_from(*start)
+
+    def nearest_path(self, start, targets):
+        """
+        (target, path) for the target (x, y) closest to start by walking
+        distance, with the steps to it as path_to() gives them; ties go to
+        the earliest in targets. (None, None) if none can be reached.
+
+        On maps of at most `eager_cells` tiles, missing fields are built
+        through field() and cached, so this is a lookup per target from
+        then on. On bigger maps, where a field costs a full BFS of the
+        map, a miss is instead one BFS out from start that stops at the
+        nearest ring holding a target, and nothing is cached.
+        """
+        targets = [tuple(t) for t in targets]
+        if not targets:
+            return None, None
+        with self._lock:
+            fields = [self._fields.get(t) for t in targets]
+        if not all(fields) and self.width * self.height <= self.eager_cells and len(targets) <= self.max_fields:
+            fields = [field or self.field(*t) for t, field in zip(targets, fields)]
+        if all(fields):
+            best, best_d = None, None
+            for target, field in zip(targets, fields):
+                d = field.distance(*start)
+                if d != UNREACHABLE and (best_d is None or d < best_d):
+                    best, best_d = field, d
+            if best is None:
+                return None, None
+            return best.target, best.path_from(*start)
+
+        around = DistanceField(self.mask, self.width, self.height, tuple(start), stop_at=targets)
+        reached = [(around.distance(*t), n) for n, t in enumerate(targets) if around.distance(*t) != UNREACHABLE]
+        if not reached:
+            return None, None
+        goal = targets[min(reached)[1]]
+        # around runs downhill to start, so the walk back from goal
+        # reversed is the path out to it.
+        path = around.path_from(*goal)[:-1]
+        path.reverse()
+        if goal != tuple(start):
+            path.append(goal)
+        return goal, path
+
+    def nearest(self, start, targets):
+        """
+        The target (x, y) closest to start by walking distance, or None.
+        """
+        return self.nearest_path(start, targets)[0]
+
+
+def resolve_target(target, start, navigator, index=None):
+    """
+    Where to walk for a target and how: "clue" (the nearest clue not yet
+    found), a suspect's name, the name of a weapon still lying around, or
+    the "x,y" tile of one of those. Returns (goal, path) with path as
+    Navigator.path_to() gives it, or (None, None) if nothing matches or
+    it can't be reached. Looks entities up in index, or the default
+    EntityIndex from logic.
+
+    Only entity tiles are accepted, so the fields a walk builds and
+    caches are bounded by what is on the map, not by what clients send.
+    """
+    index = index or logic.entity_index
+    target = (target or "").strip()
+    if target.lower() == "clue":
+        return navigator.nearest_path(start, list(index.clues))
+    tables = (index.suspects, index.weapons, index.clues)
+    goal = None
+    for table in tables[:2]:
+        for tile, entities in table.items():
+            if any(e["name"].lower() == target.lower() for e in entities):
+                goal = tile
+                break
+        if goal is not None:
+            break
+    x, sep, y = target.partition(",")
+    if goal is None and sep:
+        try:
+            tile = int(x), int(y)
+        except ValueError:
+            return None, None
+        if any(tile in table for table in tables):
+            goal = tile
+    if goal is None:
+        return None, None
+    path = navigator.path_to(start, goal)
+    return (goal, path) if path is not None else (None, None)
@@ -0,0 +1,426 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUSPECTS = ["Mr. Green", "Ms. Scarlet", "Col. Mustard", "Mrs. Peacock", "Prof. Plum", "Dr. Orchid"]
+
+STORIES = [
+    "{murderer} lured Mr. Boddy into the {room} after dinner, struck him with the {weapon}, "
+    "then wiped it clean and slipped back to the party before the {other_room} clock chimed midnight.",
+    "Mr. Boddy knew {murderer}'s secret. In the {room}, {murderer} silenced him with the {weapon}, "
+    "hid it behind a curtain and joined the others in the {other_room}, calm as ever.",
+    "During the storm's blackout {murderer} followed Mr. Boddy to the {room}. One blow from the "
+    "{weapon} ended their quarrel; by candlelight {murderer} was back in the {other_room} pouring tea.",
+]
+INTROS = [
+    "Thunder rolls over the manor, and somewhere inside, a liar is smiling.",
+    "The lights flicker, a scream is cut short, and every door is locked.",
+    "Mr. Boddy will not be joining breakfast. Someone made sure of that.",
+]
+CLUES = [
+    "A smear of something dark near the {room} door",
+    "The {weapon} was moved from its usual place",
+    "{herring} claims to have heard a scream upstairs",
+    "Muddy footprints lead away from the {room}",
+    "Someone saw {initial}'s shadow around midnight",
+    "A torn invitation lies crumpled in the {other_room}",
+    "The {other_room} clock stopped at twelve minutes past",
+    "A monogrammed glove was left on the {room} sofa",
+]
+
+ALIBIS = [
+    "I was in the {room} all evening, detective. Ask anyone.",
+    "At midnight? Reading by the fire in the {room}, alone, sadly.",
+    "I stepped out to the {room} for air. The storm was rather loud.",
+]
+GREETINGS = [
+    "Ah, the detective. Come in out of the draught; the {room} is the only warm room tonight.",
+    "You must be the one asking questions. Ask away, though I doubt I can help.",
+    "Detective! Thank goodness. I've been waiting in the {room} for someone sensible to arrive.",
+]
+DEFLECTIONS = [
+    "If you want my opinion, keep an eye on {other}. Awfully nervous tonight, weren't they?",
+    "Have you asked {other} where they were? I'd start there.",
+]
+MURDERER_TELLS = [
+    " Why do you keep looking at my hands?",
+    " I barely knew the man, really.",
+    " Is it warm in here, or is it just me?",
+]
+INNOCENT_TELLS = [
+    " Poor Mr. Boddy. Nobody deserved that.",
+    " I want this solved as much as you do.",
+    "",
+]
+WEAPON_WORDS = ["knife", "candlestick", "revolver", "rope", "pipe", "wrench", "weapon"]
+ROOMS = ["Library", "Conservatory", "Ballroom", "Study", "Kitchen", "Lounge"]
+
+
+class Latency:
+    """
+    A latency distribution in seconds, from a spec string: "0.4" (fixed),
+    "uniform:0.2:0.8", "normal:0.4:0.1" (mean and standard deviation) or
+    "lognormal:0.4:0.5" (median and sigma, the long tail real API
+    latencies have).
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, kind="fixed", a=0.0, b=0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown latency distribution {kind!r}; expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec):
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("fixed", float(spec))
+        kind, *values = str(spec).split(":")
+        if not values:
+            return cls("fixed", float(kind))
+        return cls(kind, *(float(v) for v in values))
+
+    def sample(self, rng):
+        if self.kind == "uniform":
+            value = rng.uniform(self.a, self.b)
+        elif self.kind == "normal":
+            value = rng.gauss(self.a, self.b)
+        elif self.kind == "lognormal":
+            value = self.a * rng.lognormvariate(0.0, self.b) if self.a > 0 else 0.0
+        else:
+            value = self.a
+        return max(0.0, value)
+
+    def __str__(self):
+        return str(self.a) if self.kind == "fixed" else f"{self.kind}:{self.a}:{self.b}"
+
+
+def _between(text, start, end):
+    match = re.search(re.escape(start) + r"\s*(.+?)\s*" + end, text)
+    return match.group(1) if match else None
+
+
+def scenario_reply(system, user, rng):
+    """
+    The JSON story, intro and six clues that generate_story_clues_and_intro()
+    asks for, built from the murderer, weapon and rooms in its prompt.
+    """
+    murderer = _between(user, "MURDERER =", r"\n") or rng.choice(SUSPECTS)
+    weapon = _between(user, "WEAPON =", r"\n") or "Candlestick"
+    rooms = [r.strip() for r in (_between(system, "rooms in the mansion:", r"\.\s") or "").split(",") if r.strip()]
+    rooms = rooms or ROOMS
+    room, other_room = rng.choice(rooms), rng.choice(rooms)
+    fields = {
+        "murderer": murderer,
+        "weapon": weapon,
+        "room": room,
+        "other_room": other_room,
+        "herring": rng.choice([s for s in SUSPECTS if s != murderer]),
+        "initial": murderer.split()[-1],
+    }
+    return json.dumps({
+        "story": rng.choice(STORIES).format(**fields),
+        "intro": rng.choice(INTROS),
+        "clues": [c.format(**fields) for c in rng.sample(CLUES, 6)],
+    })
+
+
+def suspect_reply(name, is_murderer, question, rng):
+    """
+    An in-character answer, under 50 words, loosely matched to the question.
+    """
+    question = question.lower()
+    fields = {"room": rng.choice(ROOMS), "other": rng.choice([s for s in SUSPECTS if s != name])}
+    if "approaches you" in question:
+        reply = rng.choice(GREETINGS)
+    elif any(word in question for word in WEAPON_WORDS):
+        reply = "A weapon? I wouldn't know one end of it from the other." if is_murderer else \
+            "I saw it on the sideboard before dinner. After that, who knows?"
+    elif "who" in question or "suspect" in question or "murder" in question:
+        reply = rng.choice(DEFLECTIONS)
+    else:
+        reply = rng.choice(ALIBIS)
+    tell = rng.choice(MURDERER_TELLS if is_murderer else INNOCENT_TELLS)
+    return reply.format(**fields) + tell
+
+
+def reply_for(messages, rng):
+    """
+    What the stand-in answers: a scenario for the story prompt, an
+    in-character reply for a suspect chat, or a stock line otherwise.
+    """
+    system = " ".join(m["content"] for m in messages if m.get("role") == "system")
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    if "murder scenario" in system and "MURDERER =" in user:
+        return scenario_reply(system, user, rng)
+    name = _between(system, "You are", ", a Clue-like murder suspect")
+    if name:
+        return suspect_reply(name, "you DO know you are the murderer" in system, user, rng)
+    return "I was in the conservatory all evening, tending the orchids. Ask the butler if you doubt me, detective."
+
+
+class StandinConfig:
+    """
+    How the stand-in behaves. first_token is a Latency (or spec) for the
+    wait before the first token, token_interval the seconds between
+    streamed tokens (non-streamed replies wait for all of them). reply,
+    if set, replaces the generated content.
+
+    Faults: rate_limit, server_error and disconnect are the fractions of
+    requests answered with a 429 (with Retry-After: retry_after), a 500,
+    or by closing the connection before any response. requests_per_minute
+    enforces a limit like the real API's, answering 429 past it, and
+    max_concurrency makes requests beyond it wait for a free slot, as a
+    saturated backend would.
+    """
+
+    def __init__(self, first_token=0.4, token_interval=0.03, reply=None, rate_limit=0.0, server_error=0.0,
+                 disconnect=0.0, retry_after=None, requests_per_minute=None, max_concurrency=None, seed=None):
+        self.first_token = Latency.parse(first_token)
+        self.token_interval = token_interval
+        self.reply = reply
+        self.rate_limit = rate_limit
+        self.server_error = server_error
+        self.disconnect = disconnect
+        self.retry_after = retry_after
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrency = max_concurrency
+        self.connections_opened = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.disconnected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # One second's worth of requests, refilled continuously.
+        self._allowance = requests_per_minute / 60 if requests_per_minute else 0.0
+        self._allowance_at = time.monotonic()
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _over_limit(self):
+        if not self.requests_per_minute:
+            return False
+        now = time.monotonic()
+        per_second = self.requests_per_minute / 60
+        self._allowance = min(per_second, self._allowance + (now - self._allowance_at) * per_second)
+        self._allowance_at = now
+        if self._allowance < 1:
+            return True
+        self._allowance -= 1
+        return False
+
+    def admit(self):
+        """
+        Counts a request and picks what happens to it: None, "429",
+        "500" or "disconnect". Also returns a Random for its content.
+        """
+        with self._lock:
+            self.requests += 1
+            rng = random.Random(self._rng.getrandbits(64))
+            roll = self._rng.random()
+            if roll < self.rate_limit or self._over_limit():
+                self.rate_limited += 1
+                return "429", rng
+            roll -= self.rate_limit
+            if roll < self.server_error:
+                self.server_errors += 1
+                return "500", rng
+            if roll < self.server_error + self.disconnect:
+                self.disconnected += 1
+                return "disconnect", rng
+        return None, rng
+
+    def begin(self):
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {"connections_opened": self.connections_opened, "requests": self.requests,
+                    "rate_limited": self.rate_limited, "server_errors": self.server_errors,
+                    "disconnected": self.disconnected, "max_in_flight": self.max_in_flight}
+
+
+def _tokens(text):
+    words = text.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    config = StandinConfig()
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, a reused
+    # connection would wait out the client's delayed ACK between them.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.config._lock:
+            self.config.connections_opened += 1
+
+    def send_json(self, status, payload, headers=()):
+        payload = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status, message, error_type, headers=()):
+        self.send_json(status, {"error": {"message": message, "type": error_type, "code": None}}, headers)
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": "gpt-4o", "object": "model",
+                                                            "owned_by": "elasticlue-standin"}]})
+        else:
+            self.send_error_json(404, f"Unknown path {self.path}", "invalid_request_error")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error_json(404, f"Unknown path {self.path}", "invalid_request_error")
+            return
+        fault, rng = self.config.admit()
+        if fault == "disconnect":
+            self.close_connection = True
+            return
+        if fault == "429":
+            retry_after = self.config.retry_after
+            self.send_error_json(429, "Rate limit reached (stand-in)", "requests",
+                                 [("Retry-After", str(retry_after))] if retry_after is not None else [])
+            return
+        if fault == "500":
+            self.send_error_json(500, "The server had an error (stand-in)", "server_error")
+            return
+
+        self.config.begin()
+        try:
+            self.complete(body, rng)
+        finally:
+            self.config.end()
+
+    def complete(self, body, rng):
+        model = body.get("model", "gpt-4o")
+        messages = body.get("messages") or []
+        content = self.config.reply or reply_for(messages, rng)
+        tokens = _tokens(content)
+        first_token = self.config.first_token.sample(rng)
+
+        if not body.get("stream"):
+            time.sleep(first_token + self.config.token_interval * len(tokens))
+            prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+            self.send_json(200, {
+                "id": "chatcmpl-standin",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                          "total_tokens": prompt_tokens + len(tokens)},
+            })
+            return
+
+        # Chunked, so the connection can be reused after the stream ends.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(first_token)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.config.token_interval)
+            chunk = {
+                "id": "chatcmpl-standin",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            self.send_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.send_chunk(b"data: [DONE]\n\n")
+        self.send_chunk(b"")
+
+
+def start_standin(port=0, host="127.0.0.1", **config):
+    """
+    Starts the stand-in on a daemon thread; returns (server, api_base).
+    server.config is its StandinConfig, for the counters and to change
+    behaviour while it runs.
+    """
+    handler = type("ConfiguredStandinHandler", (StandinHandler,), {"config": StandinConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.config = handler.config
+    threading.Thread(target=server.serve_forever, name="openai-standin", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local OpenAI-compatible chat-completions server for offline play and benchmarks. "
+                    "Point the game at it with OPENAI_API_BASE=http://127.0.0.1:PORT/v1 and any OPENAI_API_KEY.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--first-token", default="lognormal:0.4:0.4",
+                        help='latency before the first token: "0.4", "uniform:A:B", "normal:MEAN:SD" '
+                             'or "lognormal:MEDIAN:SIGMA"')
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--server-error", type=float, default=0.0, help="fraction of requests answered 500")
+    parser.add_argument("--disconnect", type=float, default=0.0, help="fraction of connections dropped")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--rpm", type=int, help="requests per minute before answering 429")
+    parser.add_argument("--max-concurrency", type=int, help="requests served at once; the rest wait")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    server, api_base = start_standin(
+        args.port, args.host,
+        first_token=args.first_token,
+        token_interval=1 / args.tokens_per_second if args.tokens_per_second > 0 else 0.0,
+        rate_limit=args.rate_limit, server_error=args.server_error, disconnect=args.disconnect,
+        retry_after=args.retry_after, requests_per_minute=args.rpm,
+        max_concurrency=args.max_concurrency, seed=args.seed,
+    )
+    print(f"OpenAI stand-in listening at {api_base}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from llm import chat_completion
+from llm_scheduler import BACKGROUND, TokenBucket
+from prompts import greeting_messages, ledger
+
+
+def generate_greeting(suspect_name, is_murderer, session=None):
+    """
+    The suspect's greeting, or None if their token budget is spent.
+    """
+    messages = greeting_messages(suspect_name, is_murderer)
+    if not ledger.allow(session, suspect_name, messages, max_tokens=60):
+        return None
+    return chat_completion(messages, max_tokens=60, session=session, priority=BACKGROUND,
+                           charge=partial(ledger.record, session, suspect_name, messages))
+
+
+def manhattan(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+class Greeting:
+    """
+    One speculative greeting: in flight until future is done, then text
+    (None if the call failed) and how long it took to generate.
+    """
+    __slots__ = ("suspect", "is_murderer", "future", "started", "latency", "text")
+
+    def __init__(self, suspect, is_murderer, started):
+        self.suspect = suspect
+        self.is_murderer = is_murderer
+        self.started = started
+        self.future = None
+        self.latency = None
+        self.text = None
+
+
+class _Session:
+    __slots__ = ("greetings", "budget")
+
+    def __init__(self, greetings, budget):
+        self.greetings = greetings
+        self.budget = budget
+
+
+class GreetingPrefetcher:
+    """
+    Generates a suspect's greeting before the player opens the chat, so
+    the suspect's first line shows the moment they do.
+
+    observe() is called after every move. When the player is within
+    `radius` tiles (Manhattan) of a suspect they haven't talked to yet and
+    the move brought them closer, the nearest such suspect's greeting is
+    generated on a worker thread at BACKGROUND priority and kept in the
+    session's cache (at most `per_session` greetings, oldest dropped).
+    take() hands it over when the chat opens, waiting up to `wait`
+    seconds for one still in flight.
+
+    Guesses go wrong: a player walks past a suspect and that call is
+    wasted. Each session gets a waste budget, a token bucket holding
+    `waste_burst` calls and refilling `waste_per_minute`. Every
+    speculative call takes a token and every greeting used gives it back,
+    so a session that keeps wasting them stops speculating until the
+    bucket refills.
+    """
+
+    def __init__(self, radius=4, per_session=2, waste_per_minute=1.0, waste_burst=3,
+                 wait=1.0, workers=4, max_sessions=5000, generator=generate_greeting,
+                 clock=time.monotonic):
+        self.radius = radius
+        self.per_session = per_session
+        self.waste_per_minute = waste_per_minute
+        self.waste_burst = waste_burst
+        self.wait = wait
+        self.max_sessions = max_sessions
+        self.generator = generator
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="greeting-prefetch")
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.speculative = 0
+        self.suppressed = 0
+        self.failed = 0
+        self.wasted = 0
+        self.hits = 0
+        self.late_hits = 0
+        self.misses = 0
+        self.saved_total = 0.0
+
+    @property
+    def enabled(self):
+        return self.radius > 0
+
+    def _session(self, session):
+        entry = self._sessions.get(session)
+        if entry is None:
+            burst_seconds = self.waste_burst * 60.0 / self.waste_per_minute if self.waste_per_minute else 0
+            entry = self._sessions[session] = _Session(
+                OrderedDict(), TokenBucket(self.waste_per_minute, burst_seconds, self.clock))
+            while len(self._sessions) > self.max_sessions:
+                _, dropped = self._sessions.popitem(last=False)
+                self.wasted += len(dropped.greetings)
+        else:
+            self._sessions.move_to_end(session)
+        return entry
+
+    def observe(self, session, previous, position, suspects, murderer_name):
+        """
+        Looks at a move from previous to position (x, y tuples) and starts
+        a greeting for the nearest suspect the player is heading toward.
+        suspects should leave out anyone the player has already talked to.
+        Returns the suspect's name, or None if nothing was started.
+        """
+        if not self.enabled or previous == position:
+            return None
+        nearest = None
+        for suspect in suspects:
+            spot = (suspect["x"], suspect["y"])
+            distance = manhattan(position, spot)
+            if distance > self.radius or distance >= manhattan(previous, spot):
+                continue
+            if nearest is None or distance < nearest[0]:
+                nearest = (distance, suspect["name"])
+        if nearest is None:
+            return None
+
+        name = nearest[1]
+        with self._lock:
+            entry = self._session(session)
+            if name in entry.greetings:
+                return None
+            now = self.clock()
+            if entry.budget.wait_time(1, now) > 0:
+                self.suppressed += 1
+                return None
+            entry.budget.take(1, now)
+            while len(entry.greetings) >= self.per_session:
+                entry.greetings.popitem(last=False)
+                self.wasted += 1
+            greeting = entry.greetings[name] = Greeting(name, name == murderer_name, now)
+            self.speculative += 1
+            greeting.future = self._executor.submit(self._generate, session, greeting)
+        return name
+
+    def _generate(self, session, greeting):
+        try:
+            text = self.generator(greeting.suspect, greeting.is_murderer, session=session)
+        except Exception:
+            text = None
+        with self._lock:
+            greeting.latency = self.clock() - greeting.started
+            greeting.text = text or None
+            if greeting.text is None:
+                self.failed += 1
+                entry = self._sessions.get(session)
+                if entry is not None and entry.greetings.get(greeting.suspect) is greeting:
+                    del entry.greetings[greeting.suspect]
+        return greeting.text
+
+    def take(self, session, suspect_name, is_murderer):
+        """
+        The prefetched greeting for suspect_name, or None on a miss. A
+        greeting still being generated is waited for, up to self.wait.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._sessions.get(session)
+            greeting = entry.greetings.pop(suspect_name, None) if entry is not None else None
+            if greeting is not None and greeting.is_murderer != is_murderer:
+                # Prefetched for an earlier game in this session.
+                self.wasted += 1
+                greeting = None
+            if greeting is None:
+                self.misses += 1
+                return None
+            in_flight = not greeting.future.done()
+            opened = self.clock()
+        if in_flight:
+            try:
+                greeting.future.result(timeout=self.wait)
+            except Exception:
+                pass
+        with self._lock:
+            if greeting.text is None:
+                self.misses += 1
+                if greeting.latency is None:
+                    # Gave up waiting; the call finishes unused.
+                    self.wasted += 1
+                return None
+            # Time to the suspect's first words without the prefetch is a
+            # whole completion; with it, only what was left when the chat
+            # opened (nothing, unless it was still in flight).
+            saved = greeting.latency - max(0.0, greeting.started + greeting.latency - opened)
+            if in_flight:
+                self.late_hits += 1
+            else:
+                self.hits += 1
+            self.saved_total += saved
+            entry.budget.give_back(1, self.clock())
+            return greeting.text
+
+    def forget(self, session):
+        """
+        Drops a session's prefetched greetings, e.g. when its game is evicted.
+        """
+        with self._lock:
+            entry = self._sessions.pop(session, None)
+            if entry is not None:
+                self.wasted += len(entry.greetings)
+
+    def metrics(self):
+        with self._lock:
+            served = self.hits + self.late_hits
+            opened = served + self.misses
+            return {
+                "radius": self.radius,
+                "speculative": self.speculative,
+                "suppressed": self.suppressed,
+                "failed": self.failed,
+                "wasted": self.wasted,
+                "pending": sum(len(entry.greetings) for entry in self._sessions.values()),
+                "hits": self.hits,
+                "lateHits": self.late_hits,
+                "misses": self.misses,
+                "hitRate": served / opened if opened else None,
+                "wasteRate": self.wasted / self.speculative if self.speculative else None,
+                "saved_total_ms": self.saved_total * 1000,
+                "saved_avg_ms": self.saved_total / served * 1000 if served else None,
+            }
@@ -0,0 +1,178 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from chat_context import estimate_tokens
+
+# What a suspect says once the session or suspect token budget is spent.
+BUDGET_TEXT = "(The suspect folds their arms. They have said all they are going to say tonight.)"
+
+
+@lru_cache(maxsize=None)
+def suspect_system_prompt(suspect_name, is_murderer):
+    """
+    A suspect's system prompt, the same for both frontends. Built once per
+    suspect and role, so it is also the same string object every turn of
+    a game: every prompt to that suspect starts with an identical prefix,
+    which provider-side prompt caching can reuse.
+    """
+    system_message = (
+        f"You are {suspect_name}, a Clue-like murder suspect in a text-based game.\n"
+        "Mr. Boddy has been found murdered.\n"
+    )
+    if is_murderer:
+        system_message += (
+            "Secretly, you DO know you are the murderer. Respond in character but don't be too obvious. "
+            "When presented with enough evidence you might have to come clean.\n"
+        )
+    else:
+        system_message += (
+            "You do not know who the murderer is (because it isn't you). "
+            "Stay in character as an innocent suspect.\n"
+        )
+    system_message += "Answer the player's questions in a fun, story-driven way, under 50 words."
+    return system_message
+
+
+def greeting_messages(suspect_name, is_murderer):
+    """
+    The prompt for a suspect's opening line, said as the detective walks up.
+    It shares the chat's system prompt, so it shares its cached prefix too.
+    """
+    return [
+        {"role": "system", "content": suspect_system_prompt(suspect_name, is_murderer)},
+        {"role": "user", "content": "(The detective approaches you. Greet them in character, under 30 words.)"},
+    ]
+
+
+def message_tokens(messages):
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+class TokenLedger:
+    """
+    Local count of the tokens sent to and received from the LLM for
+    suspect chats, per session and per suspect, priced at
+    `prompt_price` / `completion_price` per 1000 tokens.
+
+    Budgets (0 means none) cap a session's total and each suspect's share
+    of it. allow() checks a call before it is made, charging its prompt
+    plus max_tokens; record() books what it really cost. At most
+    `max_sessions` sessions are tracked, least recently used dropped first.
+    """
+
+    def __init__(self, session_budget=0, suspect_budget=0, prompt_price=0.0025,
+                 completion_price=0.01, max_sessions=5000):
+        self.session_budget = session_budget
+        self.suspect_budget = suspect_budget
+        self.prompt_price = prompt_price
+        self.completion_price = completion_price
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._suspects = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.denied = 0
+
+    def cost(self, prompt_tokens, completion_tokens):
+        return (prompt_tokens * self.prompt_price + completion_tokens * self.completion_price) / 1000
+
+    def allow(self, session, suspect, messages, max_tokens=100):
+        """
+        True if the call fits the session's and the suspect's budgets.
+        """
+        if not self.session_budget and not self.suspect_budget:
+            return True
+        estimate = message_tokens(messages) + max_tokens
+        with self._lock:
+            suspects = self._sessions.get(session) or {}
+            spent = sum(row[1] + row[2] for row in suspects.values())
+            row = suspects.get(suspect)
+            spent_on_suspect = row[1] + row[2] if row else 0
+            if ((self.session_budget and spent + estimate > self.session_budget)
+                    or (self.suspect_budget and spent_on_suspect + estimate > self.suspect_budget)):
+                self.denied += 1
+                return False
+            return True
+
+    def record(self, session, suspect, messages, reply):
+        """
+        Books one call: the prompt it was sent and the reply it gave.
+        """
+        prompt_tokens = message_tokens(messages)
+        completion_tokens = estimate_tokens(reply)
+        with self._lock:
+            suspects = self._sessions.get(session)
+            if suspects is None:
+                suspects = self._sessions[session] = {}
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session)
+            for table in (suspects, self._suspects):
+                row = table.setdefault(suspect, [0, 0, 0])
+                row[0] += 1
+                row[1] += prompt_tokens
+                row[2] += completion_tokens
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def _rows(self, table):
+        return {
+            suspect: {"calls": calls, "promptTokens": sent, "completionTokens": received,
+                      "cost": self.cost(sent, received)}
+            for suspect, (calls, sent, received) in table.items()
+        }
+
+    def usage(self, session):
+        """
+        One session's counts: totals, remaining budget and per suspect.
+        """
+        with self._lock:
+            suspects = self._rows(self._sessions.get(session) or {})
+        sent = sum(row["promptTokens"] for row in suspects.values())
+        received = sum(row["completionTokens"] for row in suspects.values())
+        return {
+            "promptTokens": sent,
+            "completionTokens": received,
+            "cost": self.cost(sent, received),
+            "budget": self.session_budget or None,
+            "remaining": max(0, self.session_budget - sent - received) if self.session_budget else None,
+            "suspects": suspects,
+        }
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "calls": self.calls,
+                "promptTokens": self.prompt_tokens,
+                "completionTokens": self.completion_tokens,
+                "cost": self.cost(self.prompt_tokens, self.completion_tokens),
+                "denied": self.denied,
+                "sessionBudget": self.session_budget or None,
+                "suspectBudget": self.suspect_budget or None,
+                "suspects": self._rows(self._suspects),
+            }
+
+
+def _make_ledger():
+    """
+    ELASTICLUE_SESSION_TOKEN_BUDGET and ELASTICLUE_SUSPECT_TOKEN_BUDGET cap
+    the chat tokens a session, and one suspect within it, may use (0 for
+    no cap). ELASTICLUE_LLM_PROMPT_PRICE / COMPLETION_PRICE are dollars
+    per 1000 tokens, for the cost metrics.
+    """
+    return TokenLedger(
+        session_budget=int(os.getenv("ELASTICLUE_SESSION_TOKEN_BUDGET", "200000")),
+        suspect_budget=int(os.getenv("ELASTICLUE_SUSPECT_TOKEN_BUDGET", "50000")),
+        prompt_price=float(os.getenv("ELASTICLUE_LLM_PROMPT_PRICE", "0.0025")),
+        completion_price=float(os.getenv("ELASTICLUE_LLM_COMPLETION_PRICE", "0.01")),
+    )
+
+
+ledger = _make_ledger()
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+
+class PushHub:
+    """
+    Server-Sent Events hub for streaming game events to browsers.
+
+    All connections are served by one asyncio event loop on a background
+    thread, so thousands of idle EventSource clients cost a socket and a
+    small queue each rather than a thread each. Flask handlers publish from
+    any thread with publish(); delivery is handed to the loop with
+    call_soon_threadsafe.
+
+    Clients connect to GET /events?token=<push token>. Every connection
+    subscribed to a token gets every event published to that token.
+    """
+
+    def __init__(self, host="127.0.0.1", port=5002, queue_size=256, heartbeat=15.0):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.loop = None
+        self._server = None
+        self._subscribers = {}
+        self._handlers = set()
+        self._thread = None
+        self._started = threading.Event()
+        self._start_lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def running(self):
+        return self._started.is_set()
+
+    @property
+    def connection_count(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def start(self):
+        """
+        Starts the event loop thread and binds the listening socket.
+        Safe to call more than once.
+        """
+        with self._start_lock:
+            if self._started.is_set():
+                return self
+            errors = []
+            self._thread = threading.Thread(target=self._run, args=(errors,), name="push-hub", daemon=True)
+            self._thread.start()
+            self._started.wait()
+            if errors:
+                self._started.clear()
+                raise errors[0]
+        return self
+
+    def stop(self):
+        """
+        Closes the listening socket and every open connection, then stops the loop.
+        """
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        self._thread.join()
+        self.loop = None
+        self._started.clear()
+
+    async def _shutdown(self):
+        self._server.close()
+        for task in list(self._handlers):
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        asyncio.get_running_loop().stop()
+
+    def _run(self, errors):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+            )
+        except OSError as e:
+            errors.append(e)
+            self._started.set()
+            return
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.loop = loop
+        self._started.set()
+        loop.run_forever()
+        loop.close()
+
+    def submit(self, coro):
+        """
+        Runs a coroutine on the hub's event loop from any thread and returns
+        a concurrent.futures.Future for its result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def publish(self, token, event, data):
+        """
+        Queues an event for every connection subscribed to token.
+        Thread-safe; a no-op until the hub has been started.
+        """
+        if self.loop is None:
+            return
+        payload = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+        self.loop.call_soon_threadsafe(self._fanout, token, payload)
+
+    def _fanout(self, token, payload):
+        self.published += 1
+        for queue in self._subscribers.get(token, ()):
+            if queue.full():
+                # Slow reader: drop its oldest event rather than grow without bound.
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(payload)
+
+    async def _handle(self, reader, writer):
+        token = None
+        queue = None
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            request_line = await reader.readline()
+            while True:
+                line = await reader.readline()
+                if not line or line in (b"\r\n", b"\n"):
+                    break
+
+            parts = request_line.decode("latin-1").split()
+            url = urlsplit(parts[1]) if len(parts) >= 2 else None
+            if url is not None and url.path == "/events":
+                token = parse_qs(url.query).get("token", [None])[0]
+            if not token:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                return
+
+            queue = asyncio.Queue(self.queue_size)
+            self._subscribers.setdefault(token, set()).add(queue)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Access-Control-Allow-Origin: *\r\n"
+                b"Connection: keep-alive\r\n\r\n"
+                b"retry: 2000\n\n"
+            )
+            await writer.drain()
+
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    payload = b": ping\n\n"
+                writer.write(payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Hub shutdown; let the connection close quietly.
+            pass
+        finally:
+            self._handlers.discard(task)
+            if queue is not None:
+                queues = self._subscribers.get(token)
+                if queues is not None:
+                    queues.discard(queue)
+                    if not queues:
+                        del self._subscribers[token]
+            writer.close()
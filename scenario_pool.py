@@ -0,0 +1,191 @@
+import random
+import threading
+import time
+from collections import deque
+
+from logic import suspects_data, weapons_data, generate_story_clues_and_intro
+from llm_scheduler import BACKGROUND
+
+
+def generate_scenario(room_names):
+    """
+    Picks a murderer and weapon and asks the LLM for the story, intro and
+    clues. Returns None if the LLM gave us nothing usable (no API key,
+    request failure or unparseable JSON), so the pool can back off.
+    """
+    murderer = random.choice(suspects_data)["name"]
+    weapon = random.choice(weapons_data)["name"]
+    # Pool refills yield to players' chats in the LLM scheduler.
+    story, intro, clues = generate_story_clues_and_intro(murderer, weapon, room_names, priority=BACKGROUND)
+    if not clues:
+        return None
+    return {
+        "murderer": murderer,
+        "weapon": weapon,
+        "story": story,
+        "intro": intro,
+        "clues": clues,
+        "room_names": list(room_names),
+        "source": "llm",
+    }
+
+
+def fallback_scenario(room_names):
+    """
+    A scenario built from local templates, for when the pool is empty.
+    Costs nothing and never blocks.
+    """
+    murderer = random.choice(suspects_data)["name"]
+    weapon = random.choice(weapons_data)["name"]
+    rooms = list(room_names) or ["Hall"]
+    room = random.choice(rooms)
+    others = [s["name"] for s in suspects_data if s["name"] != murderer]
+    herring = random.choice(others)
+    clues = [
+        f"A smear of something near the {room} door",
+        f"The {weapon} was moved from its usual place",
+        f"{herring} claims they heard a scream upstairs",
+        f"Muddy footprints lead away from the {room}",
+        f"Someone saw {murderer.split()[-1]}'s shadow around midnight",
+        f"A torn invitation lies in the {random.choice(rooms)}",
+    ]
+    return {
+        "murderer": murderer,
+        "weapon": weapon,
+        "story": f"{murderer} lured Mr. Boddy into the {room} and struck with the {weapon}, "
+                 f"then slipped back to the party before anyone noticed.",
+        "intro": "The storm has cut the lines. Someone in this house is lying.",
+        "clues": clues,
+        "room_names": rooms,
+        "source": "fallback",
+    }
+
+
+class ScenarioPool:
+    """
+    Keeps up to `size` LLM-generated scenarios ready so starting a game is a
+    deque pop, never an OpenAI round trip.
+
+    Worker threads refill the pool in the background. Refilling starts when
+    depth drops to `low_water` and runs until the pool is full again, so
+    LLM calls come in bursts rather than one after every game. take() never
+    blocks: when the pool is empty it hands out a fallback_scenario().
+    """
+
+    def __init__(self, room_names, size=8, low_water=3, workers=2,
+                 generator=generate_scenario, fallback=fallback_scenario,
+                 max_backoff=60.0):
+        self.room_names = list(room_names)
+        self.size = size
+        self.low_water = low_water
+        self.workers = workers
+        self.generator = generator
+        self.fallback = fallback
+        self.max_backoff = max_backoff
+
+        self._ready = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._refilling = True
+        self._threads = []
+        self._stopped = threading.Event()
+
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+        self.refill_latency_total = 0.0
+        self.refill_latency_max = 0.0
+        self.last_refill_latency = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return self
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"scenario-pool-{i}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped.set()
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._ready)
+
+    def take(self):
+        """
+        Returns a ready scenario in O(1), or a local fallback if none is ready.
+        """
+        with self._cond:
+            scenario = self._ready.popleft() if self._ready else None
+            if scenario is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if len(self._ready) <= self.low_water and not self._refilling:
+                self._refilling = True
+                self._cond.notify_all()
+        if scenario is None:
+            scenario = self.fallback(self.room_names)
+        return scenario
+
+    def metrics(self):
+        with self._cond:
+            refills = self.generated
+            return {
+                "depth": len(self._ready),
+                "size": self.size,
+                "low_water": self.low_water,
+                "in_flight": self._in_flight,
+                "refilling": self._refilling,
+                "hits": self.hits,
+                "misses": self.misses,
+                "generated": self.generated,
+                "failures": self.failures,
+                "refill_latency_avg_ms": (self.refill_latency_total / refills * 1000) if refills else None,
+                "refill_latency_max_ms": self.refill_latency_max * 1000,
+                "refill_latency_last_ms": self.last_refill_latency * 1000,
+            }
+
+    def _worker(self):
+        consecutive_failures = 0
+        while True:
+            with self._cond:
+                while not self._stopped.is_set() and not self._refilling:
+                    self._cond.wait()
+                if self._stopped.is_set():
+                    return
+                if len(self._ready) + self._in_flight >= self.size:
+                    # Full (or about to be); stop refilling until the next low-water dip.
+                    self._refilling = False
+                    continue
+                self._in_flight += 1
+
+            start = time.monotonic()
+            try:
+                scenario = self.generator(self.room_names)
+            except Exception:
+                scenario = None
+            elapsed = time.monotonic() - start
+
+            with self._cond:
+                self._in_flight -= 1
+                if scenario is None:
+                    self.failures += 1
+                else:
+                    self._ready.append(scenario)
+                    self.generated += 1
+                    self.refill_latency_total += elapsed
+                    self.refill_latency_max = max(self.refill_latency_max, elapsed)
+                    self.last_refill_latency = elapsed
+
+            if scenario is None:
+                consecutive_failures += 1
+                self._stopped.wait(min(self.max_backoff, 2 ** consecutive_failures))
+            else:
+                consecutive_failures = 0
@@ -0,0 +1,178 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import GameEngine
+from logic import generate_tile_grid, place_entities, suspects_data, weapons_data, clues_data
+from navigation import Navigator
+
+# Games handed to a worker process at a time: big enough that pickling
+# the task and its result is noise next to playing the games.
+DEFAULT_CHUNK = 2000
+
+
+def random_policy(engine, rng):
+    """
+    Plays by the curses rules without reading the clues: standing on a
+    suspect while holding a weapon it hasn't tried on them, it accuses;
+    otherwise it walks to a random suspect, weapon still lying around or clue.
+    """
+    entities = engine.entities
+    suspect = entities.suspect_at(engine.player_x, engine.player_y)
+    if suspect is not None:
+        untried = [w for w in engine.inventory if (suspect["name"], w) not in engine.accused]
+        if untried:
+            return ("accuse", suspect["name"], rng.choice(untried))
+    targets = list(entities.suspects)
+    targets += entities.weapons
+    targets += entities.clues
+    return ("walk", rng.choice(targets))
+
+
+def sweep_policy(engine, rng):
+    """
+    Collects the nearest remaining weapon or clue until it holds the murder
+    weapon, then accuses the murderer. This knows the answer, so the moves
+    it takes measure how well hidden the solution is by the layout alone.
+    """
+    if engine.murder_weapon["name"] in engine.inventory:
+        return ("accuse", engine.murderer["name"], engine.murder_weapon["name"])
+    start = (engine.player_x, engine.player_y)
+    targets = list(engine.entities.weapons)
+    targets += engine.entities.clues
+    return ("walk", engine.navigator.nearest(start, targets))
+
+
+POLICIES = {
+    "random": random_policy,
+    "sweep": sweep_policy,
+}
+
+
+def play(engine, policy, seed, max_actions=200):
+    """
+    Plays one game to a correct accusation or max_actions, whichever
+    comes first. Returns (solved, actions, moves, accusations).
+    """
+    # One generator per game drives both the deal and the policy, so a
+    # seed replays the same game; seeding one costs more than a step.
+    rng = random.Random(seed)
+    engine.reset(rng=rng)
+    step = engine.step
+    actions = 0
+    while not engine.solved and actions < max_actions:
+        action = policy(engine, rng)
+        if action[0] == "walk" and action[1] is None:
+            break
+        step(action)
+        actions += 1
+    return engine.solved, actions, engine.moves, engine.accusations
+
+
+def build_layout(num_rooms=6, width=40, height=15, seed=None):
+    """
+    A generated map with the suspects, weapons and clues placed in it, as
+    plain data that can be sent to worker processes: (rows, suspects,
+    weapons, clues). The module-level entity lists are left untouched.
+    """
+    grid, rooms, _ = generate_tile_grid(num_rooms, width, height, seed=seed)
+    suspects = [dict(s) for s in suspects_data]
+    weapons = [dict(w) for w in weapons_data]
+    clues = [dict(c) for c in clues_data]
+    place_entities(rooms, suspects, weapons, clues)
+    return grid.to_strings(), suspects, weapons, clues
+
+
+_engine = None
+
+
+def _init_worker(layout):
+    global _engine
+    rows, suspects, weapons, clues = layout
+    _engine = GameEngine(rows, suspects, weapons, clues, navigator=Navigator(rows))
+
+
+def _play_chunk(policy_name, first_seed, count, max_actions):
+    """
+    Plays count games in this worker. Returns the chunk's totals and the
+    per-game move counts (for percentiles).
+    """
+    policy = POLICIES[policy_name]
+    solved = actions = accusations = 0
+    moves = []
+    for seed in range(first_seed, first_seed + count):
+        won, n_actions, n_moves, n_accusations = play(_engine, policy, seed, max_actions)
+        solved += won
+        actions += n_actions
+        accusations += n_accusations
+        moves.append(n_moves)
+    return solved, actions, accusations, moves
+
+
+def run_batch(layout, games, policy="random", workers=None, seed=0,
+              max_actions=200, chunk=DEFAULT_CHUNK):
+    """
+    Plays games games on layout (see build_layout) across a pool of worker
+    processes, seeds seed .. seed + games - 1, and returns summary stats.
+    No LLM is involved: the engine picks the murderer and weapon from the
+    seed and clue texts are whatever the layout holds.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; expected one of {', '.join(POLICIES)}")
+    workers = workers or os.cpu_count() or 1
+    chunks = [(policy, first, min(chunk, seed + games - first), max_actions)
+              for first in range(seed, seed + games, chunk)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(layout)
+        results = [_play_chunk(*c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(layout,)) as pool:
+            results = list(pool.map(_play_chunk, *zip(*chunks)))
+    elapsed = time.perf_counter() - start
+
+    moves = sorted(m for r in results for m in r[3])
+    played = len(moves)
+    return {
+        "games": played,
+        "policy": policy,
+        "workers": workers,
+        "seconds": elapsed,
+        "gamesPerSecond": played / elapsed if elapsed else 0.0,
+        "solvedRate": sum(r[0] for r in results) / played if played else 0.0,
+        "meanActions": sum(r[1] for r in results) / played if played else 0.0,
+        "meanAccusations": sum(r[2] for r in results) / played if played else 0.0,
+        "moves": {
+            "mean": sum(moves) / played if played else 0.0,
+            "p50": moves[played // 2] if played else 0,
+            "p95": moves[min(played - 1, int(played * 0.95))] if played else 0,
+            "max": moves[-1] if played else 0,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play headless games in parallel to compare layouts.")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--rooms", type=int, default=6)
+    parser.add_argument("--size", default="40x15", help="map WIDTHxHEIGHT")
+    parser.add_argument("--map-seed", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0, help="first game seed")
+    parser.add_argument("--max-actions", type=int, default=200)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    layout = build_layout(args.rooms, width, height, seed=args.map_seed)
+    stats = run_batch(layout, args.games, args.policy, args.workers, args.seed, args.max_actions)
+    print(f"{stats['games']} games ({stats['policy']}) on {stats['workers']} worker(s) "
+          f"in {stats['seconds']:.2f}s: {stats['gamesPerSecond']:.0f} games/s, "
+          f"{stats['gamesPerSecond'] / stats['workers']:.0f} per worker")
+    print(f"solved {stats['solvedRate']:.1%}, {stats['meanActions']:.1f} actions, "
+          f"{stats['meanAccusations']:.1f} accusations per game")
+    print(f"moves: mean {stats['moves']['mean']:.1f}, p50 {stats['moves']['p50']}, "
+          f"p95 {stats['moves']['p95']}, max {stats['moves']['max']}")
@@ -0,0 +1,321 @@
+// Canvas client for the main page. The page template defines gameData
+// (this session's state) and TILES (map/entity characters) before loading
+// this file and map_renderer.js.
+var TILE_SIZE = 32;
+
+// The static map is painted once into an offscreen layer; moves
+// only repaint the tiles they touch (see static/map_renderer.js).
+var renderer = new MapRenderer(document.getElementById("gameCanvas"), gameData, {
+  tileSize: TILE_SIZE,
+  wallChar: TILES.wall,
+  doorChar: TILES.door,
+  floorChar: TILES.floor,
+  clueChar: TILES.clue,
+  playerChar: TILES.player
+});
+renderer.drawAll();
+
+// Deltas arrive both as the /api/move response and on the push
+// channel; whichever comes second is skipped by its seq.
+function applyMoveDelta(delta) {
+  if (delta.seq <= gameData.seq) return;
+  gameData.seq = delta.seq;
+  renderer.applyMoveDelta(delta);
+  gameData.message = delta.message;
+  document.getElementById("gameMessage").textContent = delta.message;
+}
+
+// A walk is a list of move deltas, applied in order.
+function applyWalk(data) {
+  for (var i = 0; i < data.steps.length; i++) {
+    applyMoveDelta(data.steps[i]);
+  }
+  fillWalkTargets();
+}
+
+// Suspects, weapons still lying around and the nearest clue.
+function fillWalkTargets() {
+  var select = document.getElementById("walkTarget");
+  var chosen = select.value;
+  var options = [["clue", "Nearest clue"]];
+  gameData.suspects.forEach(function (s) { options.push([s.name, s.emoji + " " + s.name]); });
+  gameData.weapons.forEach(function (w) {
+    if (!w.collected) options.push([w.name, w.emoji + " " + w.name]);
+  });
+  select.innerHTML = "";
+  options.forEach(function (o) {
+    var option = document.createElement("option");
+    option.value = o[0];
+    option.textContent = o[1];
+    select.appendChild(option);
+  });
+  if (chosen) select.value = chosen;
+}
+fillWalkTargets();
+
+function sendWalk() {
+  var target = document.getElementById("walkTarget").value;
+  fetch("/api/walk_to?target=" + encodeURIComponent(target))
+    .then(resp => resp.json())
+    .then(data => {
+      if (data.error) {
+        document.getElementById("gameMessage").textContent = data.error;
+      } else {
+        applyWalk(data);
+      }
+    });
+}
+
+document.getElementById("walkForm").addEventListener("submit", function(e) {
+  e.preventDefault();
+  sendWalk();
+});
+
+// Arrow keys are buffered and numbered, and sent to /api/inputs as one
+// batch per round trip: keys pressed while a batch is in flight go out
+// together in the next one. The server applies them in number order and
+// skips numbers it has already seen, so a failed batch can be resent.
+var pendingInputs = [];
+var inputInFlight = false;
+var nextInput = gameData.inputSeq + 1;
+
+function queueMove(dx, dy) {
+  pendingInputs.push({n: nextInput++, dx: dx, dy: dy});
+  flushInputs();
+}
+
+function flushInputs() {
+  if (inputInFlight || !pendingInputs.length) return;
+  var batch = pendingInputs;
+  pendingInputs = [];
+  inputInFlight = true;
+  fetch("/api/inputs", {
+    method: "POST",
+    headers: {"Content-Type": "application/json"},
+    body: JSON.stringify({inputs: batch})
+  })
+    .then(resp => resp.json())
+    .then(data => {
+      inputInFlight = false;
+      applyWalk(data);
+      flushInputs();
+    })
+    .catch(() => {
+      inputInFlight = false;
+      pendingInputs = batch.concat(pendingInputs);
+      setTimeout(flushInputs, 1000);
+    });
+}
+
+// Push channel: the server streams game events here instead of us
+// reloading the page to find out what changed.
+var pushSource = null;
+if (gameData.push && window.EventSource) {
+  pushSource = new EventSource(
+    "//" + location.hostname + ":" + gameData.push.port + "/events?token=" + gameData.push.token);
+  pushSource.addEventListener("move", function(e) {
+    applyMoveDelta(JSON.parse(e.data));
+  });
+  pushSource.addEventListener("walk", function(e) {
+    applyWalk(JSON.parse(e.data));
+  });
+}
+
+// Movement + Chat
+window.addEventListener("keydown", function(e) {
+  // Leave keys alone while typing in the chat box or picking a walk target.
+  if (e.target.tagName === "INPUT" || e.target.tagName === "SELECT") return;
+  var key = e.key;
+  if (key === "ArrowLeft") {
+    e.preventDefault();
+    queueMove(-1, 0);
+  } else if (key === "ArrowRight") {
+    e.preventDefault();
+    queueMove(1, 0);
+  } else if (key === "ArrowUp") {
+    e.preventDefault();
+    queueMove(0, -1);
+  } else if (key === "ArrowDown") {
+    e.preventDefault();
+    queueMove(0, 1);
+  } else if (key === "w" || key === "W") {
+    e.preventDefault();
+    sendWalk();
+  } else if (key === "c" || key === "C") {
+    e.preventDefault();
+    openChatIfSuspect();
+  }
+});
+
+// Each suspect's conversation has its own element in the chat log, so
+// reopening a chat or getting a reply only appends the new messages:
+// {name: {log, lastId, ids}}, ids being the message ids already shown.
+var conversations = {};
+var activeSuspect = null;
+
+function conversation(name) {
+  var c = conversations[name];
+  if (!c) {
+    var log = document.createElement("div");
+    document.getElementById("chatLog").appendChild(log);
+    c = conversations[name] = {log: log, lastId: 0, ids: {}};
+  }
+  return c;
+}
+
+function chatLine(role, content) {
+  var line = document.createElement("div");
+  var speaker = document.createElement("b");
+  speaker.textContent = role.charAt(0).toUpperCase() + role.slice(1) + ": ";
+  line.appendChild(speaker);
+  var text = document.createElement("span");
+  text.textContent = content;
+  line.appendChild(text);
+  return line;
+}
+
+// Adds the messages of a chat response the conversation doesn't show yet,
+// at the end or before the given element (a reply still streaming in).
+function appendMessages(name, data, before) {
+  var c = conversation(name);
+  data.messages.forEach(function (m) {
+    if (c.ids[m.id]) return;
+    c.ids[m.id] = true;
+    c.log.insertBefore(chatLine(m.role, m.content), before || null);
+  });
+  c.lastId = Math.max(c.lastId, data.lastId);
+  var chatLog = document.getElementById("chatLog");
+  chatLog.scrollTop = chatLog.scrollHeight;
+}
+
+function openChatIfSuspect() {
+  var seen = Object.keys(conversations).map(function (name) {
+    return "seen=" + encodeURIComponent(name + ":" + conversations[name].lastId);
+  });
+  fetch("/check_suspect?" + seen.join("&"))
+    .then(resp => resp.json())
+    .then(data => {
+      if (data.hasSuspect) {
+        showChat(data.suspectName, data);
+      } else {
+        alert("No suspect here to chat with!");
+      }
+    });
+}
+
+// show/hide chat overlay
+function showChat(suspectName, data) {
+  document.getElementById("chatTitle").textContent = "Chat with " + suspectName;
+  activeSuspect = suspectName;
+  var active = conversation(suspectName);
+  Object.keys(conversations).forEach(function (name) {
+    conversations[name].log.style.display = conversations[name] === active ? "" : "none";
+  });
+  document.getElementById("chatOverlay").style.display = "flex";
+  appendMessages(suspectName, data);
+}
+function hideChat() {
+  document.getElementById("chatOverlay").style.display = "none";
+}
+
+// How long a streaming reply may wait for its chat_done before the
+// stored reply is fetched instead.
+var REPLY_TIMEOUT_MS = 30000;
+
+function pushConnected() {
+  return pushSource !== null && pushSource.readyState === EventSource.OPEN;
+}
+
+// An empty reply line that chat_token events fill in; the player's own
+// line goes in front of it when /api/chat answers.
+function beginStreamingReply(name) {
+  var previous = document.getElementById("streamingReply");
+  if (previous) previous.removeAttribute("id");
+  var replyLine = chatLine("assistant", "");
+  replyLine.lastChild.id = "streamingReply";
+  replyLine.timer = setTimeout(function () { recoverReply(name, replyLine); }, REPLY_TIMEOUT_MS);
+  conversation(name).log.appendChild(replyLine);
+  return replyLine;
+}
+
+// Stops a reply line from waiting for more tokens; removes it too if
+// nothing reached it.
+function endStreamingReply(replyLine, remove) {
+  clearTimeout(replyLine.timer);
+  replyLine.lastChild.removeAttribute("id");
+  if (remove && replyLine.parentNode) replyLine.parentNode.removeChild(replyLine);
+}
+
+// chat_done never came (push channel dropped): swap the partial line for
+// whatever the server has stored since.
+function recoverReply(name, replyLine) {
+  endStreamingReply(replyLine, true);
+  fetch("/api/chat_messages?suspect=" + encodeURIComponent(name) + "&after=" + conversation(name).lastId)
+    .then(resp => resp.json())
+    .then(data => {
+      if (!data.error) appendMessages(name, data);
+    })
+    .catch(() => {});
+}
+
+// handle chat form submission via AJAX
+var chatForm = document.getElementById("chatForm");
+chatForm.addEventListener("submit", function(e) {
+  e.preventDefault();
+  var userMsg = document.getElementById("chatInput").value.trim();
+  if (!userMsg || !activeSuspect) return;
+  var name = activeSuspect;
+  // With the push channel connected, the reply streams in as chat_token
+  // events; otherwise /chat_ajax answers with the whole reply.
+  var streaming = pushConnected();
+  var url = streaming ? "/api/chat" : "/chat_ajax";
+  var replyLine = streaming ? beginStreamingReply(name) : null;
+  document.getElementById("chatInput").value = "";
+  fetch(url, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json"
+    },
+    body: JSON.stringify({user_msg: userMsg, after: conversation(name).lastId})
+  })
+  .then(resp => resp.json())
+  .then(data => {
+    if (data.error) {
+      if (replyLine) {
+        replyLine.lastChild.textContent = data.error;
+        endStreamingReply(replyLine, false);
+      } else {
+        alert(data.error);
+      }
+    } else if (replyLine && !data.streaming) {
+      // The server answered in full after all.
+      endStreamingReply(replyLine, true);
+    }
+    appendMessages(name, data, data.streaming ? replyLine : null);
+  })
+  .catch(() => {
+    if (replyLine) endStreamingReply(replyLine, true);
+    alert("Couldn't reach the server, try again.");
+  });
+});
+
+if (pushSource) {
+  pushSource.addEventListener("chat_token", function(e) {
+    var reply = document.getElementById("streamingReply");
+    if (reply) reply.textContent += JSON.parse(e.data).text;
+  });
+  pushSource.addEventListener("chat_done", function(e) {
+    var data = JSON.parse(e.data);
+    var c = conversation(data.suspect);
+    var reply = document.getElementById("streamingReply");
+    if (reply && !c.ids[data.message.id]) {
+      reply.textContent = data.message.content;
+      endStreamingReply(reply.parentNode, false);
+      c.ids[data.message.id] = true;
+      c.lastId = Math.max(c.lastId, data.message.id);
+    } else {
+      // Its line already gave up waiting.
+      appendMessages(data.suspect, {messages: [data.message], lastId: data.message.id});
+    }
+  });
+}
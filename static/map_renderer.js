@@ -0,0 +1,146 @@
+// Canvas renderer for the mansion map.
+//
+// The static map (walls, doors, floors, room-name letters) is painted once
+// into an offscreen canvas. Frames are composed by blitting that layer and
+// drawing entities on top, and a move only re-blits and repaints the tiles
+// that changed, found through a per-tile entity index instead of scanning
+// every entity.
+(function (root) {
+  var TILE_COLORS = {wall: "darkgray", door: "brown", floor: "lightgray", label: "white"};
+
+  function MapRenderer(canvas, gameData, opts) {
+    this.canvas = canvas;
+    this.ctx = canvas.getContext("2d");
+    this.data = gameData;
+    this.tile = opts.tileSize || 32;
+    this.chars = opts;
+    this.width = gameData.mapWidth;
+    this.height = gameData.mapHeight;
+    canvas.width = this.width * this.tile;
+    canvas.height = this.height * this.tile;
+    this.ctx.font = "16px sans-serif";
+    this.staticLayer = this.buildStaticLayer(opts.createCanvas);
+    this.reindex();
+  }
+
+  MapRenderer.prototype.tileKind = function (ch) {
+    if (ch === this.chars.wallChar) return "wall";
+    if (ch === this.chars.doorChar) return "door";
+    if (ch === this.chars.floorChar) return "floor";
+    return "label";
+  };
+
+  // Paints the map once. Horizontal runs of the same tile kind become one
+  // fillRect, so a wall row is a single draw call rather than one per tile.
+  MapRenderer.prototype.buildStaticLayer = function (createCanvas) {
+    var layer = createCanvas ? createCanvas() : document.createElement("canvas");
+    layer.width = this.canvas.width;
+    layer.height = this.canvas.height;
+    var ctx = layer.getContext("2d");
+    ctx.font = "16px sans-serif";
+    var T = this.tile, rows = this.data.gameMap;
+    for (var row = 0; row < this.height; row++) {
+      var line = rows[row], col = 0;
+      while (col < this.width) {
+        var kind = this.tileKind(line[col]), start = col;
+        while (col < this.width && this.tileKind(line[col]) === kind) col++;
+        ctx.fillStyle = TILE_COLORS[kind];
+        ctx.fillRect(start * T, row * T, (col - start) * T, T);
+        if (kind === "label") {
+          ctx.fillStyle = "black";
+          for (var c = start; c < col; c++) ctx.fillText(line[c], c * T + 8, row * T + 20);
+        }
+      }
+    }
+    return layer;
+  };
+
+  // tile key -> entities drawn on that tile, in paint order.
+  MapRenderer.prototype.reindex = function () {
+    var index = {}, d = this.data, w = this.width;
+    function add(x, y, item) {
+      var key = y * w + x;
+      (index[key] || (index[key] = [])).push(item);
+    }
+    // The victim is drawn offset upward, across its own tile and the one above.
+    add(d.victim.x, d.victim.y, {kind: "victim", ref: d.victim});
+    add(d.victim.x, d.victim.y - 1, {kind: "victim", ref: d.victim});
+    for (var i = 0; i < d.suspects.length; i++) add(d.suspects[i].x, d.suspects[i].y, {kind: "suspect", ref: d.suspects[i]});
+    for (var i = 0; i < d.weapons.length; i++) add(d.weapons[i].x, d.weapons[i].y, {kind: "weapon", ref: d.weapons[i]});
+    for (var i = 0; i < d.clues.length; i++) add(d.clues[i].x, d.clues[i].y, {kind: "clue", ref: d.clues[i]});
+    this.entities = index;
+  };
+
+  MapRenderer.prototype.drawEntity = function (item, px, py) {
+    var ctx = this.ctx, e = item.ref, T = this.tile;
+    if (item.kind === "victim") {
+      ctx.fillStyle = "red";
+      ctx.fillText(e.emoji, e.x * T + 8, e.y * T - 10);
+    } else if (item.kind === "suspect") {
+      ctx.fillStyle = "blue";
+      ctx.fillText(e.emoji, px + 8, py + 20);
+    } else if (item.kind === "weapon" && !e.collected) {
+      ctx.fillStyle = "green";
+      ctx.fillText(e.emoji, px + 8, py + 20);
+    } else if (item.kind === "clue" && !e.found) {
+      ctx.fillStyle = "purple";
+      ctx.fillText(this.chars.clueChar, px + 8, py + 20);
+    }
+  };
+
+  MapRenderer.prototype.drawPlayer = function () {
+    var T = this.tile, p = this.data.player;
+    this.ctx.fillStyle = "black";
+    this.ctx.fillText(this.chars.playerChar, p.x * T + 8, p.y * T + 20);
+  };
+
+  MapRenderer.prototype.drawAll = function () {
+    this.ctx.drawImage(this.staticLayer, 0, 0);
+    var T = this.tile;
+    for (var key in this.entities) {
+      var items = this.entities[key];
+      for (var i = 0; i < items.length; i++) {
+        // The victim is indexed twice; paint it once.
+        if (items[i].kind === "victim" && (key | 0) !== items[i].ref.y * this.width + items[i].ref.x) continue;
+        this.drawEntity(items[i], items[i].ref.x * T, items[i].ref.y * T);
+      }
+    }
+    this.drawPlayer();
+  };
+
+  MapRenderer.prototype.redrawTile = function (col, row) {
+    if (col < 0 || row < 0 || col >= this.width || row >= this.height) return;
+    var T = this.tile, px = col * T, py = row * T;
+    this.ctx.drawImage(this.staticLayer, px, py, T, T, px, py, T, T);
+    var items = this.entities[row * this.width + col];
+    if (items) {
+      for (var i = 0; i < items.length; i++) this.drawEntity(items[i], px, py);
+    }
+    var p = this.data.player;
+    if (p.x === col && p.y === row) this.drawPlayer();
+  };
+
+  // Applies a move delta to gameData and repaints only the tiles it touched.
+  MapRenderer.prototype.applyMoveDelta = function (delta) {
+    var d = this.data, dirty = [[d.player.x, d.player.y]];
+    d.player = delta.player;
+    dirty.push([delta.player.x, delta.player.y]);
+    if (delta.weapon) {
+      for (var i = 0; i < d.weapons.length; i++) {
+        if (d.weapons[i].name === delta.weapon.name) d.weapons[i].collected = true;
+      }
+    }
+    if (delta.clue) {
+      for (var i = 0; i < d.clues.length; i++) {
+        if (d.clues[i].x === delta.clue.x && d.clues[i].y === delta.clue.y) d.clues[i].found = true;
+      }
+    }
+    for (var i = 0; i < dirty.length; i++) this.redrawTile(dirty[i][0], dirty[i][1]);
+  };
+
+  if (typeof module !== "undefined" && module.exports) {
+    module.exports = MapRenderer;
+  } else {
+    root.MapRenderer = MapRenderer;
+  }
+})(this);
@@ -0,0 +1,214 @@
+import logging
+import os
+import time
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# ELASTICLUE_OTEL selects the exporter: "off" (default), "console" (spans
+# and metrics printed to stdout), "otlp" (gRPC to a local collector; the
+# standard OTEL_EXPORTER_OTLP_ENDPOINT variable overrides localhost:4317)
+# or "memory" (kept in-process, for benchmarks and debugging).
+MODE = os.getenv("ELASTICLUE_OTEL", "off").strip().lower()
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "elasticlue")
+
+enabled = False
+_trace = None
+_tracer = None
+_instruments = {}
+
+
+class _NoopSpan:
+    """
+    Stands in for a span when telemetry is off: entering, leaving and
+    setting attributes all do nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _setup(mode):
+    """
+    Installs the SDK tracer and meter providers for mode. Returns False
+    (telemetry stays off) if the opentelemetry packages aren't installed.
+    """
+    global _trace, _tracer
+    try:
+        from opentelemetry import trace, metrics
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+        from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        if mode == "otlp":
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+    except ImportError as e:
+        logger.warning("ELASTICLUE_OTEL=%s but OpenTelemetry isn't installed (%s); telemetry disabled", mode, e)
+        return False
+
+    if mode == "otlp":
+        span_exporter = OTLPSpanExporter()
+        metric_reader = PeriodicExportingMetricReader(OTLPMetricExporter())
+    elif mode == "memory":
+        span_exporter, metric_reader = InMemorySpanExporter(), InMemoryMetricReader()
+    else:
+        span_exporter = ConsoleSpanExporter()
+        metric_reader = PeriodicExportingMetricReader(ConsoleMetricExporter())
+
+    resource = Resource.create({"service.name": SERVICE_NAME})
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[metric_reader]))
+
+    _trace = trace
+    _tracer = trace.get_tracer("elasticlue")
+    meter = metrics.get_meter("elasticlue")
+    _instruments.update({
+        "http.server.duration": meter.create_histogram(
+            "http.server.duration", unit="ms", description="Flask request latency"),
+        "llm.duration": meter.create_histogram(
+            "elasticlue.llm.duration", unit="ms", description="LLM call latency"),
+        "llm.prompt_tokens": meter.create_histogram(
+            "elasticlue.llm.prompt_tokens", unit="{token}", description="Estimated prompt size"),
+        "llm.cache_hit": meter.create_histogram(
+            "elasticlue.llm.cache_hit", description="1 for a response-cache hit, 0 for a miss; the mean is the hit rate"),
+        "moves": meter.create_counter("elasticlue.moves", description="Player moves"),
+        "pickups": meter.create_counter("elasticlue.pickups", description="Weapons and clues picked up"),
+        "accusations": meter.create_counter("elasticlue.accusations", description="Accusations made"),
+    })
+    return True
+
+
+if MODE not in ("", "off", "0", "false", "none"):
+    enabled = _setup(MODE)
+
+
+def span(name, attributes=None, current=True):
+    """
+    Context manager for a span named name. With current=False the span
+    isn't made the active context, which is what async generators need
+    (they can resume in a different context than they started in).
+    A no-op when telemetry is off.
+    """
+    if not enabled:
+        return _NOOP_SPAN
+    if current:
+        return _tracer.start_as_current_span(name, attributes=attributes)
+    return _DetachedSpan(_tracer.start_span(name, attributes=attributes))
+
+
+class _DetachedSpan:
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.span.record_exception(exc)
+        self.span.end()
+        return False
+
+
+def traced(name):
+    """
+    Decorator: runs the function inside a span. When telemetry is off the
+    function is returned unchanged, so there is no per-call cost at all.
+    """
+    def decorate(fn):
+        if not enabled:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tracer.start_as_current_span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, amount=1, attributes=None):
+    """
+    Adds to one of the game counters: "moves", "pickups", "accusations".
+    """
+    if enabled:
+        _instruments[name].add(amount, attributes)
+
+
+def record_llm_call(model, seconds, prompt_tokens, cached=False, kind="completion"):
+    """
+    Records one LLM call's latency, prompt size and cache outcome.
+    """
+    if not enabled:
+        return
+    attributes = {"llm.model": model, "llm.kind": kind}
+    _instruments["llm.duration"].record(seconds * 1000, attributes)
+    _instruments["llm.prompt_tokens"].record(prompt_tokens, attributes)
+    _instruments["llm.cache_hit"].record(1 if cached else 0, attributes)
+
+
+def instrument_flask(app):
+    """
+    One SERVER span per request, named after the matched route, plus the
+    request latency histogram. Registers nothing when telemetry is off.
+    """
+    if not enabled:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_span():
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        g._otel_start = time.perf_counter()
+        g._otel_route = rule
+        g._otel_span = _tracer.start_as_current_span(
+            f"{request.method} {rule}",
+            kind=_trace.SpanKind.SERVER,
+            attributes={"http.method": request.method, "http.route": rule, "http.target": request.full_path},
+        )
+        g._otel_span.__enter__()
+
+    @app.after_request
+    def _tag_response(response):
+        g._otel_status = response.status_code
+        if "_otel_span" in g:
+            _trace.get_current_span().set_attribute("http.status_code", response.status_code)
+        return response
+
+    @app.teardown_request
+    def _end_request_span(exc):
+        span_cm = g.pop("_otel_span", None)
+        if span_cm is None:
+            return
+        if exc is not None:
+            _trace.get_current_span().record_exception(exc)
+        span_cm.__exit__(type(exc) if exc else None, exc, None)
+        _instruments["http.server.duration"].record(
+            (time.perf_counter() - g._otel_start) * 1000,
+            {"http.route": g._otel_route, "http.method": request.method,
+             "http.status_code": g.get("_otel_status", 500)},
+        )
@@ -0,0 +1,15 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import GameEngine
+from simulate import build_layout
+
+
+def test_zero_step_is_not_a_move():
+    rows, suspects, weapons, clues = build_layout(seed=1)
+    engine = GameEngine(rows, suspects, weapons, clues, seed=1)
+    event = engine.move(0, 0)
+    assert not event["moved"] and engine.moves == 0
+    assert event["player"] == event["from"]
@@ -0,0 +1,21 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_state import SessionStore
+
+
+def test_on_evict_sees_capped_and_idle_sessions():
+    evicted = []
+    store = SessionStore(SimpleNamespace, max_sessions=2, on_evict=evicted.append)
+    first, _ = store.get_or_create(None)
+    second, _ = store.get_or_create(None)
+    third, _ = store.get_or_create(None)
+    assert evicted == [first]
+
+    store.idle_timeout = -1
+    assert store.get(second) is None
+    assert evicted == [first, second, third]
+    assert store.evicted == 3 and len(store) == 0
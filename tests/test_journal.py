@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import GameJournal
+
+
+def test_prune_drops_sessions_idle_past_max_age(tmp_path):
+    now = [1000.0]
+    journal = GameJournal(str(tmp_path / "games.sqlite"), max_age=60, prune_every=3600, clock=lambda: now[0])
+    try:
+        for session in ("idle", "playing", "snapshotted"):
+            journal.snapshot(session, 0, {"session": session})
+        journal.record("idle", 1, "move", {"dx": 1, "dy": 0})
+        journal.flush()
+
+        now[0] += 50
+        journal.record("playing", 1, "move", {"dx": 1, "dy": 0})
+        journal.snapshot("snapshotted", 1, {"session": "snapshotted"})
+        journal.flush()
+
+        now[0] += 30
+        journal.prune()
+        journal.flush()
+        assert journal.load("idle") is None
+        assert journal.load("playing") == ({"session": "playing"}, [(1, "move", {"dx": 1, "dy": 0})])
+        assert journal.load("snapshotted") == ({"session": "snapshotted"}, [])
+        assert journal.metrics()["pruned"] == 1
+        assert journal._db.execute("SELECT COUNT(*) FROM events WHERE session = 'idle'").fetchone()[0] == 0
+    finally:
+        journal.close()
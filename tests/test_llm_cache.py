@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import ResponseCache
+
+
+def table_totals(cache):
+    return cache._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+
+def test_tracked_totals_match_the_table(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_entries=50, max_bytes=2000)
+    for i in range(200):
+        cache.put(f"k{i % 80}", "gpt", "x" * (i % 37 + 1))
+        stats = cache.stats()
+        assert (stats["entries"], stats["bytes"]) == tuple(table_totals(cache))
+        assert stats["entries"] <= 50 and stats["bytes"] <= 2000
+    assert cache.stats()["evictions"] > 0
+
+    reopened = ResponseCache(path, max_entries=50, max_bytes=2000)
+    assert (reopened.stats()["entries"], reopened.stats()["bytes"]) == tuple(table_totals(cache))
+
+    expired = ResponseCache(path, ttl=-1)
+    key = next(iter(expired._db.execute("SELECT key FROM responses")))[0]
+    assert expired.get(key) is None
+    assert (expired.stats()["entries"], expired.stats()["bytes"]) == tuple(table_totals(expired))
+    expired.clear()
+    assert expired.stats()["entries"] == expired.stats()["bytes"] == 0
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import generate_tile_grid, place_entities, suspects_data, weapons_data, clues_data
+
+
+@pytest.mark.parametrize("num_rooms, width, height", [(6, 24, 10), (6, 40, 15), (6, 200, 100)])
+def test_place_entities_never_stacks_entities(num_rooms, width, height):
+    for seed in range(200):
+        grid, rooms, _ = generate_tile_grid(num_rooms, width, height, seed=seed)
+        suspects = [dict(s) for s in suspects_data]
+        weapons = [dict(w) for w in weapons_data]
+        clues = [dict(c) for c in clues_data]
+        place_entities(rooms, suspects, weapons, clues)
+        tiles = [(e["x"], e["y"]) for e in suspects + weapons + clues]
+        assert len(set(tiles)) == len(tiles), f"seed {seed}: two entities share a tile"
+        assert all(grid.is_walkable(x, y) for x, y in tiles), f"seed {seed}: entity on a wall"
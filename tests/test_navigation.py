@@ -0,0 +1,76 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import EntityIndex, generate_tile_grid, place_entities, suspects_data, weapons_data, clues_data
+from navigation import Navigator, resolve_target
+
+
+def make_game(seed):
+    grid, rooms, _ = generate_tile_grid(6, 80, 40, seed=seed)
+    suspects = [dict(s) for s in suspects_data]
+    weapons = [dict(w) for w in weapons_data]
+    clues = [dict(c) for c in clues_data]
+    place_entities(rooms, suspects, weapons, clues)
+    return grid, EntityIndex(suspects, weapons, clues)
+
+
+def floor_tiles(navigator, rng, count):
+    tiles = []
+    while len(tiles) < count:
+        x, y = rng.randrange(navigator.width), rng.randrange(navigator.height)
+        if navigator.mask[y * navigator.width + x]:
+            tiles.append((x, y))
+    return tiles
+
+
+def test_nearest_path_same_with_and_without_cached_fields():
+    rng = random.Random(0)
+    for seed in range(20):
+        grid, index = make_game(seed)
+        targets = list(index.clues)
+        cold, warm = Navigator(grid, eager_cells=0), Navigator(grid)
+        for target in targets:
+            warm.field(*target)
+        for start in floor_tiles(cold, rng, 10):
+            goal, path = cold.nearest_path(start, targets)
+            assert goal == warm.nearest_path(start, targets)[0]
+            assert len(path) == min(warm.distance(start, t) for t in targets)
+            assert path == [] or path[-1] == goal
+            steps = [start] + path
+            assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 for a, b in zip(steps, steps[1:]))
+            assert all(cold.mask[y * cold.width + x] for x, y in path)
+        assert cold.metrics()["fields"] == 0
+
+
+def test_nearest_path_caches_fields_on_small_maps():
+    grid, index = make_game(2)
+    navigator = Navigator(grid)
+    targets = list(index.clues)
+    start = next(iter(index.suspects))
+    goal, path = navigator.nearest_path(start, targets)
+    assert navigator.metrics()["fields"] == len(targets)
+    assert navigator.nearest_path(start, targets) == (goal, path)
+    assert navigator.metrics()["misses"] == len(targets)
+
+
+def test_resolve_target_only_accepts_entity_tiles():
+    grid, index = make_game(1)
+    navigator = Navigator(grid)
+    start = next(iter(index.suspects))
+    clue = next(iter(index.clues))
+    goal, path = resolve_target(f"{clue[0]},{clue[1]}", start, navigator, index)
+    assert goal == clue and path[-1] == clue
+    floor = next(t for t in floor_tiles(navigator, random.Random(1), 500)
+                 if not any(t in table for table in (index.suspects, index.weapons, index.clues)))
+    assert resolve_target(f"{floor[0]},{floor[1]}", start, navigator, index) == (None, None)
+    assert resolve_target("nobody", start, navigator, index) == (None, None)
+    assert navigator.metrics()["fields"] == 1
+
+
+def test_field_cache_is_capped_by_map_size():
+    grid, _, _ = generate_tile_grid(6, 1000, 1000, seed=0)
+    assert Navigator(grid).max_fields == 16
+    assert Navigator(grid, max_cells=1).max_fields == 1